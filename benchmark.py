@@ -0,0 +1,459 @@
+# -*- coding:utf-8 -*-
+# benchmark.py
+
+"""
+    Benchmark of politeWordToAssertiveOne.py.
+    [politeWordToAssertiveOne.py のベンチマーク。]
+
+    Synthetic corpora of 1 KB to 100 MB are made by replicating and
+    mutating polite.txt, and the following phases are timed separately,...
+        setup         ToneRules() and building the rules (no rule cache)
+        setup_cached  ToneRules() and loading the rules from the rule cache
+        cnvForced     forced conversion
+        cnvCoditional kanji-conditional conversion
+        cnvTone       whole conversion (ToneConverter.convert, no clipboard)
+    The memory held by one built ToneRules instance is reported as well.
+    [
+    polite.txt を複製・変異させて 1 KB から 100 MB の合成コーパスを作り、
+    上記の各フェーズを個別に計測する。
+    構築済みのToneRulesインスタンス一つが保持するメモリも報告する。
+    ]
+
+    Dense corpora, where every line holds several keys of the rules, time 
+    the texts on which many rules fire (reported as dense-1M, ...),...
+        benchmark.py --sizes 1M --dense-sizes 1M,10M
+    [全ての行がルールのキーを複数含む密なコーパスで、多くのルールが適用されるテキストを
+     計測する（dense-1M等として報告する）。]
+
+    Usage,
+        benchmark.py --sizes 1K,1M,10M -o baseline.json
+        benchmark.py --sizes 1K,1M,10M --compare baseline.json --threshold 0.2
+
+    The comparison fails (exit status 1) when a phase is slower than the
+    baseline by more than the threshold.
+    [比較では、いずれかのフェーズが基準値より閾値を超えて遅い場合に失敗（終了コード1）とする。]
+
+    One corpus is converted by ToneConverter.cnvParallel on 1, 2, 4 and 8
+    workers, and the speedup over one worker is reported,...
+        benchmark.py --sizes '' --workers 1,2,4,8 --parallel-size 100M
+    [一つのコーパスをToneConverter.cnvParallelにより1、2、4、8ワーカーで変換し、
+     1ワーカーに対する速度向上を報告する。]
+
+    JSON Lines records, one corpus line in the text field of each, are 
+    converted by ToneConverter.cnvJsonl on the same workers,...
+        benchmark.py --sizes '' --workers 1,4 --records 1000000
+    [コーパスの一行をtextフィールドに持つJSON Linesのレコードを、同じワーカー数で
+     ToneConverter.cnvJsonlにより変換する。]
+
+    The import and first conversion of a one-line input are timed in a fresh 
+    interpreter (-X importtime), without the conversion phases,...
+        benchmark.py --sizes '' --dense-sizes '' --workers '' --startup-budget 150
+    CI checks the same budget by StartupTest of test_politeWordToAssertiveOne.py.
+    [一行の入力のインポートと最初の変換を新しいインタープリタで計測する（-X importtime）。
+     変換フェーズ無しには上記とする。CIはtest_politeWordToAssertiveOne.pyのStartupTestで
+     同じ予算を確認する。]
+"""
+
+import argparse
+import gc
+import io
+import json
+import os
+import platform
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import politeWordToAssertiveOne
+
+
+# directory of the sample texts
+# [サンプルテキストのディレクトリ]
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# polite endings swapped by the mutation
+# [変異で入れ替える丁寧語尾]
+POLITE_ENDS = ['です', 'ます', 'ました', 'ません', 'ませんでした', 'ましょう',
+               'でしょう', 'して下さい', 'ください']
+
+# phases in the order of the report
+# [報告するフェーズの順]
+PHASES = ['setup', 'setup_cached', 'cnvForced', 'cnvCoditional', 'cnvTone']
+
+# fresh interpreter of the startup measurement, prints the seconds of the import 
+# and the first conversion of a one-line input, and whether pyperclip was imported
+# [起動の計測用の新しいインタープリタ。インポートと一行の入力の最初の変換の秒数、
+#  及びpyperclipをインポートしたかを出力する]
+STARTUP_CODE = '''
+import sys, time
+w_start = time.perf_counter()
+import politeWordToAssertiveOne
+politeWordToAssertiveOne.convert('この設定を確認して下さい。')
+print(time.perf_counter() - w_start, 'pyperclip' in sys.modules)
+'''
+
+
+def parseSize(size):
+    """
+        '1K', '10M', ... to bytes
+        ['1K'、'10M'、... をバイト数にする]
+    """
+    m = re.fullmatch(r'(\d+)([KMG]?)B?', size.upper())
+    if not m:
+        raise argparse.ArgumentTypeError('bad size: {}'.format(size))
+    return(int(m.group(1)) * {'': 1, 'K': 1 << 10, 'M': 1 << 20, 'G': 1 << 30}[m.group(2)])
+
+
+def makeCorpus(size, seed=0):
+    """
+        text of about size bytes in UTF-8, replicated and mutated from polite.txt
+        [polite.txt を複製・変異させた、UTF-8で約sizeバイトのテキスト]
+    """
+    with open(os.path.join(BASE_DIR, 'polite.txt'), encoding='utf-8') as f:
+        w_lines = [w for w in f.read().splitlines() if w]
+    w_random = random.Random(seed)
+    w_pattern = re.compile('|'.join(sorted(POLITE_ENDS, key=len, reverse=True)))
+
+    w_parts = []
+    w_size = 0
+    while w_size < size:
+        # swap the polite endings of a random line
+        # [無作為に選んだ行の丁寧語尾を入れ替える]
+        w_line = w_pattern.sub(lambda m: w_random.choice(POLITE_ENDS), w_random.choice(w_lines))
+        w_line += '\n'
+        w_parts.append(w_line)
+        w_size += len(w_line.encode('utf-8'))
+    return(''.join(w_parts))
+
+
+def makeDenseCorpus(size, seed=0):
+    """
+        text of about size bytes in UTF-8, every line holds keys of dct_fchg, 
+        of the stems of dct_wgrp1 and of dct_tail
+        [UTF-8で約sizeバイトのテキスト。全ての行がdct_fchg、dct_wgrp1の語幹、
+         及びdct_tailのキーを含む]
+    """
+    rules = politeWordToAssertiveOne.ToneRules.shared()
+    w_stems = []
+    for k_wgrp in rules.dct_wgrp1:
+        w_schg = rules.dct_wgrp1[k_wgrp]['語変']
+        w_ends = list(rules.dct_wchg[rules.dct_wgrp1[k_wgrp]['変化']])
+        w_stems += [w_stem + w_schg + w_end 
+                    for w_stem in rules.dct_wgrp1[k_wgrp]['語幹'] for w_end in w_ends]
+    w_others = list(rules.dct_fchg) + list(rules.dct_tail)
+    w_random = random.Random(seed)
+
+    w_parts = []
+    w_size = 0
+    while w_size < size:
+        w_line = '説明の通り{}。{}と{}\n'.format(
+            w_random.choice(w_stems), w_random.choice(w_stems), w_random.choice(w_others))
+        w_parts.append(w_line)
+        w_size += len(w_line.encode('utf-8'))
+    return(''.join(w_parts))
+
+
+def runPhases(text, measure):
+    """
+        run each phase once, measure(func) returns the measurement of a phase
+        [各フェーズを一回実行する。measure(関数)がフェーズの計測値を返す]
+    """
+    w_result = {}
+    w_cache = politeWordToAssertiveOne.RULE_CACHE_FILE
+
+    # setup without and with the rule cache
+    # [ルールキャッシュ無し、及び有りのセットアップ]
+    def setup():
+        rules = politeWordToAssertiveOne.ToneRules()
+        rules.makeRules()
+        rules.makeCondRules()
+        rules.makeStopChrs()
+    w_result['setup'] = measure(setup)
+
+    def setupCached():
+        rules = politeWordToAssertiveOne.ToneRules()
+        if not rules.loadRules():
+            raise RuntimeError('rule cache not written: {}'.format(w_cache))
+        rules.build()
+    w_result['setup_cached'] = measure(setupCached)
+
+    # conversion phases, the rules are loaded beforehand
+    # [変換フェーズ。ルールは事前に読み込む]
+    converter = politeWordToAssertiveOne.ToneConverter(politeWordToAssertiveOne.ToneRules())
+    w_forced = converter.cnvForced(text)
+    w_result['cnvForced'] = measure(lambda: converter.cnvForced(text))
+    w_result['cnvCoditional'] = measure(lambda: converter.cnvCoditional(w_forced))
+    w_result['cnvTone'] = measure(lambda: converter.convert(text))
+    return(w_result)
+
+
+def rulesMemory():
+    """
+        bytes held by one built ToneRules instance, without and with the rule cache
+        [構築済みのToneRulesインスタンス一つが保持するバイト数。ルールキャッシュ無し、及び有り]
+    """
+    w_result = {}
+    for (phase, w_cached) in (('rules_bytes', False), ('rules_bytes_cached', True)):
+        gc.collect()
+        tracemalloc.start()
+        try:
+            rules = politeWordToAssertiveOne.ToneRules()
+            if not (w_cached and rules.loadRules()):
+                rules.makeRules()
+            rules.build()
+            gc.collect()
+            w_result[phase] = tracemalloc.get_traced_memory()[0]
+        finally:
+            tracemalloc.stop()
+        del rules
+    return(w_result)
+
+
+def startup(repeat):
+    """
+        seconds of the import and the first conversion (best of repeat), seconds of 
+        the import alone by -X importtime, and whether pyperclip was imported
+        [インポートと最初の変換の秒数（repeat回の最良値）、-X importtimeによるインポートのみの秒数、
+         及びpyperclipをインポートしたか]
+        
+        The first run is not counted, it writes the rule cache.
+        [初回はルールキャッシュを書き込むので数えない。]
+    """
+    w_env = dict(os.environ, POLITE_TO_ASSERTIVE_CACHE=politeWordToAssertiveOne.RULE_CACHE_FILE)
+    w_result = None
+    for i in range(repeat + 1):
+        w_proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', STARTUP_CODE], 
+                                cwd=BASE_DIR, env=w_env, capture_output=True, 
+                                encoding='utf-8', check=True)
+        (w_secs, w_clip) = w_proc.stdout.split()
+        m = re.search(r'^import time:\s*\d+ \|\s*(\d+) \| politeWordToAssertiveOne$', 
+                      w_proc.stderr, re.MULTILINE)
+        if i == 0:
+            continue
+        if w_result is None or float(w_secs) < w_result['seconds']:
+            w_result = {'seconds': float(w_secs), 'import_seconds': int(m.group(1)) / 1e6, 
+                        'pyperclip': w_clip == 'True'}
+    return(w_result)
+
+
+def benchWorkers(size, workers, repeat):
+    """
+        seconds (best of repeat) and speedup of ToneConverter.cnvParallel on each number of workers
+        [各ワーカー数でのToneConverter.cnvParallelの秒数（repeat回の最良値）と速度向上]
+    """
+    text = makeCorpus(size)
+    converter = politeWordToAssertiveOne.ToneConverter()
+    w_expect = converter.convert(text)
+
+    w_result = {}
+    for jobs in workers:
+        w_best = None
+        for i in range(repeat):
+            f_out = io.StringIO()
+            w_start = time.perf_counter()
+            converter.cnvParallel(io.StringIO(text), f_out, jobs)
+            w_secs = time.perf_counter() - w_start
+            if f_out.getvalue() != w_expect:
+                raise RuntimeError('parallel result differs on {} workers'.format(jobs))
+            w_best = w_secs if w_best is None else min(w_best, w_secs)
+        w_result[str(jobs)] = {'seconds': w_best}
+    w_first = w_result[str(workers[0])]['seconds']
+    for jobs in workers:
+        w_result[str(jobs)]['speedup'] = w_first / w_result[str(jobs)]['seconds']
+    return({'bytes': len(text.encode('utf-8')), 'cpus': os.cpu_count(), 'workers': w_result})
+
+
+def benchSize(size, repeat, corpus=makeCorpus):
+    """
+        seconds (best of repeat), MB/s and peak memory of each phase, 
+        on the text of corpus(size)
+        [corpus(size)のテキストでの各フェーズの秒数（repeat回の最良値）、MB/s、及びピークメモリ]
+    """
+    text = corpus(size)
+    w_mb = len(text.encode('utf-8')) / 1e6
+
+    def timeIt(func):
+        w_best = None
+        for i in range(repeat):
+            w_start = time.perf_counter()
+            func()
+            w_secs = time.perf_counter() - w_start
+            w_best = w_secs if w_best is None else min(w_best, w_secs)
+        return(w_best)
+
+    def peakOf(func):
+        tracemalloc.start()
+        try:
+            func()
+            return(tracemalloc.get_traced_memory()[1])
+        finally:
+            tracemalloc.stop()
+
+    w_secs = runPhases(text, timeIt)
+    w_peaks = runPhases(text, peakOf)
+
+    w_result = {}
+    for phase in PHASES:
+        w_result[phase] = {'seconds': w_secs[phase], 'peak_bytes': w_peaks[phase]}
+        if not phase.startswith('setup'):
+            w_result[phase]['mb_per_s'] = w_mb / w_secs[phase] if w_secs[phase] else None
+    return({'bytes': len(text.encode('utf-8')), 'phases': w_result})
+
+
+def compare(results, baseline, threshold, min_seconds):
+    """
+        list of the phases slower than the baseline by more than the threshold
+        [基準値より閾値を超えて遅いフェーズのリスト]
+
+        Phases faster than min_seconds in the baseline are too noisy to compare.
+        [基準値でmin_secondsより速いフェーズは揺らぎが大きいので比較しない。]
+    """
+    w_regressions = []
+    for (size, w_result) in results.items():
+        if size not in baseline:
+            continue
+        for phase in PHASES:
+            w_base = baseline[size]['phases'].get(phase)
+            if not w_base or w_base['seconds'] < min_seconds:
+                continue
+            w_ratio = w_result['phases'][phase]['seconds'] / w_base['seconds']
+            if w_ratio > 1.0 + threshold:
+                w_regressions.append((size, phase, w_ratio))
+    return(w_regressions)
+
+
+def benchRecords(count, workers, repeat):
+    """
+        seconds (best of repeat) and records per second of ToneConverter.cnvJsonl 
+        on each number of workers
+        [各ワーカー数でのToneConverter.cnvJsonlの秒数（repeat回の最良値）と毎秒のレコード数]
+    """
+    w_lines = makeCorpus(count * 64).splitlines()
+    text = ''.join(json.dumps({'id': i, 'text': w_lines[i % len(w_lines)]}, 
+                              ensure_ascii=False) + '\n' for i in range(count))
+    converter = politeWordToAssertiveOne.ToneConverter()
+
+    w_result = {}
+    w_expect = None
+    for jobs in workers:
+        w_best = None
+        for i in range(repeat):
+            f_out = io.StringIO()
+            w_start = time.perf_counter()
+            converter.cnvJsonl(io.StringIO(text), f_out, [('text',)], jobs)
+            w_secs = time.perf_counter() - w_start
+            if w_expect is None:
+                w_expect = f_out.getvalue()
+            elif f_out.getvalue() != w_expect:
+                raise RuntimeError('record result differs on {} workers'.format(jobs))
+            w_best = w_secs if w_best is None else min(w_best, w_secs)
+        w_result[str(jobs)] = {'seconds': w_best, 'records_per_s': count / w_best}
+    return({'records': count, 'cpus': os.cpu_count(), 'workers': w_result})
+
+
+def main(argv=None):
+    """
+        run the benchmark, write and/or compare the results
+        [ベンチマークを実行し、結果を書き出す、ないし比較する]
+    """
+    parser = argparse.ArgumentParser(description='benchmark of politeWordToAssertiveOne.py')
+    parser.add_argument('--sizes', default='1K,10K,100K,1M,10M',
+                        help='corpus sizes, up to 100M (default: %(default)s)')
+    parser.add_argument('--dense-sizes', default='1M',
+                        help='dense corpus sizes, empty to skip (default: %(default)s)')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='runs per phase, the best is taken (default: %(default)s)')
+    parser.add_argument('-o', '--output', help='write the results to this JSON file')
+    parser.add_argument('--compare', metavar='BASELINE', help='compare with a JSON baseline')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='allowed slowdown against the baseline (default: %(default)s)')
+    parser.add_argument('--min-seconds', type=float, default=0.001,
+                        help='phases faster than this are not compared (default: %(default)s)')
+    parser.add_argument('--workers', default='1,2,4,8',
+                        help='workers of the parallel conversion, empty to skip (default: %(default)s)')
+    parser.add_argument('--parallel-size', type=parseSize, default='10M',
+                        help='corpus size of the parallel conversion (default: %(default)s)')
+    parser.add_argument('--records', type=int, default=100000,
+                        help='JSON Lines records of the record conversion, 0 to skip (default: %(default)s)')
+    parser.add_argument('--startup-budget', type=float, metavar='MS',
+                        help='fail when the import and first conversion take longer')
+    args = parser.parse_args(argv)
+
+    # a private rule cache, written by the first setup
+    # [専用のルールキャッシュ。最初のセットアップで書き込む]
+    w_tmp = tempfile.TemporaryDirectory()
+    politeWordToAssertiveOne.RULE_CACHE_FILE = os.path.join(w_tmp.name, 'rules.marshal')
+    politeWordToAssertiveOne.ToneRules().build()
+
+    results = {}
+    w_sizes = [(size, size, makeCorpus) for size in filter(None, args.sizes.split(','))]
+    w_sizes += [('dense-' + size, size, makeDenseCorpus) 
+                for size in filter(None, args.dense_sizes.split(','))]
+    for (w_name, size, w_corpus) in w_sizes:
+        w_result = benchSize(parseSize(size), args.repeat, w_corpus)
+        results[w_name] = w_result
+        for phase in PHASES:
+            w_phase = w_result['phases'][phase]
+            print('{:>6} {:<14} {:9.4f} s {:>10} {:12,d} B peak'.format(
+                w_name, phase, w_phase['seconds'],
+                '{:.2f} MB/s'.format(w_phase['mb_per_s']) if w_phase.get('mb_per_s') else '',
+                w_phase['peak_bytes']))
+    w_parallel = None
+    w_workers = [int(w) for w in args.workers.split(',') if w]
+    if w_workers:
+        w_parallel = benchWorkers(args.parallel_size, w_workers, args.repeat)
+        for (jobs, w_jobs) in w_parallel['workers'].items():
+            print('{:>6} {:<14} {:9.4f} s {:5.2f}x ({} CPUs)'.format(
+                '', 'workers ' + jobs, w_jobs['seconds'], w_jobs['speedup'], w_parallel['cpus']))
+    w_records = None
+    if w_workers and args.records:
+        w_records = benchRecords(args.records, w_workers, args.repeat)
+        for (jobs, w_jobs) in w_records['workers'].items():
+            print('{:>6} {:<14} {:9.4f} s {:,.0f} records/s ({} CPUs)'.format(
+                '', 'records ' + jobs, w_jobs['seconds'], w_jobs['records_per_s'], w_records['cpus']))
+    w_memory = rulesMemory()
+    for phase in w_memory:
+        print('{:>6} {:<18} {:12,d} B'.format('', phase, w_memory[phase]))
+    w_startup = startup(args.repeat)
+    print('{:>6} {:<14} {:9.4f} s (import {:.4f} s){}'.format(
+        '', 'startup', w_startup['seconds'], w_startup['import_seconds'], 
+        ', pyperclip imported' if w_startup['pyperclip'] else ''))
+    w_tmp.cleanup()
+
+    w_report = {'python': sys.version.split()[0], 'platform': platform.platform(),
+                'results': results, 'parallel': w_parallel, 'records': w_records, 
+                'memory': w_memory, 
+                'startup': w_startup}
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(w_report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)['results']
+        w_regressions = compare(results, baseline, args.threshold, args.min_seconds)
+        for (size, phase, w_ratio) in w_regressions:
+            print('regression: {} {} {:.2f}x of baseline'.format(size, phase, w_ratio))
+        if w_regressions:
+            return(1)
+    
+    # the conversion path must not touch the clipboard
+    # [変換の経路ではクリップボードに触れないこと]
+    if args.startup_budget is not None:
+        if w_startup['pyperclip']:
+            print('startup: pyperclip is imported without the clipboard')
+            return(1)
+        if w_startup['seconds'] * 1000 > args.startup_budget:
+            print('startup: {:.1f} ms over the budget of {:.1f} ms'.format(
+                w_startup['seconds'] * 1000, args.startup_budget))
+            return(1)
+    return(0)
+
+
+if __name__ == '__main__':
+
+    exit(main())
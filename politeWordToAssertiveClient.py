@@ -0,0 +1,82 @@
+# -*- coding:utf-8 -*-
+# politeWordToAssertiveClient.py
+
+"""
+    Tiny client of the server mode of politeWordToAssertiveOne.py.
+    [politeWordToAssertiveOne.py のサーバーモードの小さなクライアント。]
+
+    The text is read from stdin and the converted text is written to stdout.
+    Without a running server the text is converted locally.
+    [テキストを標準入力から読み、変換結果を標準出力に書く。
+     サーバーが動いていなければローカルで変換する。]
+
+    Usage,
+        politeWordToAssertiveOne.py serve &
+        politeWordToAssertiveClient.py < polite.txt > assertive.txt
+"""
+
+import os
+import socket
+import struct
+import sys
+import tempfile
+
+
+def serverSocket():
+    """
+        default socket of the server mode (same as politeWordToAssertiveOne.py)
+        [サーバーモードの既定のソケット（politeWordToAssertiveOne.py と同じ）]
+    """
+    return(os.environ.get('POLITE_TO_ASSERTIVE_SOCKET') or os.path.join(
+        os.environ.get('XDG_RUNTIME_DIR') or tempfile.gettempdir(),
+        'politeWordToAssertiveOne-{}.sock'.format(getattr(os, 'getuid', lambda: 0)())))
+
+
+def recvExactly(sock, size):
+    """
+        receive exactly size bytes
+        [ちょうどsizeバイトを受信する]
+    """
+    w_data = bytearray()
+    while len(w_data) < size:
+        w_chunk = sock.recv(size - len(w_data))
+        if not w_chunk:
+            raise ConnectionError('connection closed by the server')
+        w_data += w_chunk
+    return(bytes(w_data))
+
+
+def convert(text, path=None):
+    """
+        convert the text on the server
+        [サーバーでテキストを変換する]
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(path or serverSocket())
+        w_data = text.encode('utf-8')
+        sock.sendall(struct.pack('>I', len(w_data)) + w_data)
+        (w_len,) = struct.unpack('>I', recvExactly(sock, 4))
+        return(recvExactly(sock, w_len).decode('utf-8'))
+
+
+def main():
+    """
+        convert stdin to stdout, on the server if it is running
+        [標準入力を標準出力に変換する。サーバーが動いていればサーバーで]
+    """
+    text = sys.stdin.buffer.read().decode('utf-8')
+    try:
+        w_text = convert(text)
+    except (OSError, AttributeError):
+        # no server (AttributeError: no AF_UNIX on this OS), convert locally
+        # [サーバー無し（AttributeError: このOSにAF_UNIXが無い）。ローカルで変換する]
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        import politeWordToAssertiveOne
+        w_text = politeWordToAssertiveOne.convert(text)
+    sys.stdout.buffer.write(w_text.encode('utf-8'))
+    return(0)
+
+
+if __name__ == '__main__':
+
+    exit(main())
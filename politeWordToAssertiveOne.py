@@ -72,6 +72,110 @@
               (Use diff etc.)the results of tone conversion
             ⑦ If the target vocabulary needs to be modified or added, 
               reflect in dict on the script and operate again.
+              The expanded dicts are cached in 
+              ~/.cache/politeWordToAssertiveOne (or $POLITE_TO_ASSERTIVE_CACHE), 
+              and the cache is rebuilt automatically after the dicts change.
+
+        (2) Files and pipes are converted without the clipboard,...
+                politeWordToAssertiveOne.py -i polite.txt -o assertive.txt
+                cat polite.txt | politeWordToAssertiveOne.py -i - > assertive.txt
+              (-i / -o default to stdin / stdout when only one is given.)
+              The input is streamed, so memory does not grow with its size.
+
+        (3) Directory trees are converted on all CPU cores,...
+                politeWordToAssertiveOne.py batch docs/ 'man/**/*.txt' -o out/
+              The tree is mirrored into out/, without -o each result is 
+              written next to its input as *.assertive.txt. 
+              The timing of each file and the throughput are reported.
+
+        (4) From python, without the clipboard,...
+                import politeWordToAssertiveOne
+                converter = politeWordToAssertiveOne.ToneConverter()
+                converter.convert(text)         # thread safe, reusable
+                politeWordToAssertiveOne.convert(text)
+
+        (5) For editor hooks, a server keeps the rules loaded,...
+                politeWordToAssertiveOne.py serve &
+                politeWordToAssertiveClient.py < polite.txt > assertive.txt
+              The client converts locally when no server is running.
+
+        (6) Documents re-run after small edits are converted incrementally,...
+                converter = politeWordToAssertiveOne.IncrementalConverter()
+                converter.convert(text)         # only changed sentences
+                politeWordToAssertiveOne.py serve --incremental &
+              The sentences (split after 。 and newlines) are cached, 
+              and the text around the edit is taken from the previous result.
+
+        (7) Very large files are memory-mapped and converted as bytes,...
+                politeWordToAssertiveOne.py --mmap -i huge.txt -o assertive.txt
+              Only the lines with polite words are decoded and converted, 
+              the rest is copied as is and the pages written are released.
+
+        (8) A single large document is converted on all CPU cores,...
+                politeWordToAssertiveOne.py -j 0 -i manual.txt -o assertive.txt
+              The text is cut where no rule can match across (e.g. 。 and 
+              newlines), the chunks are converted on a process pool and 
+              written in order. The result is the same as on one core.
+
+        (9) To prune the dicts, count which rules fire on a corpus,...
+                politeWordToAssertiveOne.py --hits hits.json batch corpus/ -o out/
+              hits.json has the hits by source (dct_fchg, dct_wgrp1, dct_tail, 
+              kanji-conditional) and by group of dct_wgrp1, the hottest rules, 
+              and the rules that never matched.
+
+        (10) Phase latency and memory are recorded for monitoring,...
+                politeWordToAssertiveOne.py --metrics /var/lib/node_exporter/polite.prom
+              The rule construction, cnvForced, cnvCoditional and the reading 
+              and writing are timed by input size into an OpenMetrics textfile 
+              for the node exporter, the counts accumulate over the runs. 
+              The peak allocation of each phase needs python -X tracemalloc.
+
+        (11) To review the conversion, the edits are kept while converting,...
+                politeWordToAssertiveOne.py -i polite.txt -o assertive.txt --diff -
+                politeWordToAssertiveOne.py --diff review.txt --side-by-side
+                converter.convert(text, edits=politeWordToAssertiveOne.EditLog(text))
+              EditLog.edits() lists (offset, original, replacement, rules) in 
+              the input text, the diff is rendered from them without comparing 
+              the whole texts again.
+
+        (12) Sentences repeated over runs are kept in an on-disk cache,...
+                politeWordToAssertiveOne.py --cache-file sentences.sqlite3 batch docs/ -o out/
+                politeWordToAssertiveOne.py --cache --cache-size 64 -i polite.txt
+              The converted sentences are kept in SQLite (WAL mode, shared by 
+              the workers) under a hash of the rules, the cache is cleared when 
+              the dicts change and the least recently used sentences are evicted.
+
+        (13) For a CI gate, the polite forms left in files are reported,...
+                politeWordToAssertiveOne.py check docs/ -p '*.md'
+                politeWordToAssertiveOne.py check --all 'man/**/*.txt'
+              Nothing is converted, the first polite form of each file (every 
+              one with --all) is reported as file:line:column, on all CPU cores. 
+              The exit code is 1 when polite forms are left, 2 on unreadable files.
+
+        (14) JSON Lines records are converted field by field, streamed,...
+                politeWordToAssertiveOne.py --jsonl text --jsonl meta.title -j 0 \
+                    -i records.jsonl -o assertive.jsonl
+              The records are read in batches, converted on all CPU cores and 
+              written in order, the records without a change are kept as read.
+
+        (15) HTML and Markdown, only the text outside the markup is converted,...
+                politeWordToAssertiveOne.py --markup html -i page.html -o assertive.html
+              Tags, entities, comments, script/style/pre/code elements, and the 
+              code spans, fenced and indented code and link targets of Markdown 
+              are written as read, the text between them is converted on its own.
+
+        (16) User dictionaries are layered over the built-in rules,...
+                politeWordToAssertiveOne.py --overlay terms.tsv --overlay project.tsv serve
+              One "key<TAB>replacement" per line, a later file takes precedence, 
+              and a key is replaced before the built-in rules and kept as it is 
+              then. Only the overlay is compiled, a running process reloads it 
+              within milliseconds of a change.
+
+        (17) Machines sharing a file system convert a spool directory together,...
+                politeWordToAssertiveOne.py spool /shared/spool -j 4
+              A file moved into spool/new/ is claimed by one worker with a rename, 
+              its output and the marker <name>.done are written to spool/out/. 
+              The claims of a crashed or silent (--stale) worker are converted again.
         
         [
 　　　　　　　使用方法は、
@@ -86,6 +190,94 @@
 　　　　　　　　　　　⑤　語調変換結果がクリップボード上に貼り付けられているので使用する。
 　　　　　　　　　　　⑥　語調変換結果と変換前のものと比較レビューする。（diff等を使用する）。
 　　　　　　　　　　　⑦　対象語彙はの修正または追加が必要な場合はスクリプト上のdictに反映し、再操作する。
+　　　　　　　　　　　　　展開したdictは ~/.cache/politeWordToAssertiveOne（または$POLITE_TO_ASSERTIVE_CACHE）に
+　　　　　　　　　　　　　キャッシュされ、dictの変更後に自動的に再作成される。
+
+　　　　　　　（２）　ファイルやパイプはクリップボードを使わずに変換する。
+　　　　　　　　　　　　　　politeWordToAssertiveOne.py -i polite.txt -o assertive.txt
+　　　　　　　　　　　　　　cat polite.txt | politeWordToAssertiveOne.py -i - > assertive.txt
+　　　　　　　　　　　（-i / -o の片方のみ指定時、他方は標準入力 / 標準出力となる。）
+　　　　　　　　　　　入力はストリームで処理するので、メモリはその大きさに依存しない。
+
+　　　　　　　（３）　ディレクトリツリーは全CPUコアで変換する。
+　　　　　　　　　　　　　　politeWordToAssertiveOne.py batch docs/ 'man/**/*.txt' -o out/
+　　　　　　　　　　　ツリーは out/ に同じ構成で出力し、-o が無ければ入力の隣に *.assertive.txt として出力する。
+　　　　　　　　　　　各ファイルの所要時間とスループットを報告する。
+
+　　　　　　　（４）　pythonからはクリップボードを使わずに変換する。
+　　　　　　　　　　　　　　converter = politeWordToAssertiveOne.ToneConverter()
+　　　　　　　　　　　　　　converter.convert(text)         # スレッドセーフで再利用可能
+　　　　　　　　　　　　　　politeWordToAssertiveOne.convert(text)
+
+　　　　　　　（５）　エディタのフックには、ルールを読み込んだままのサーバーを使う。
+　　　　　　　　　　　　　　politeWordToAssertiveOne.py serve &
+　　　　　　　　　　　　　　politeWordToAssertiveClient.py < polite.txt > assertive.txt
+　　　　　　　　　　　サーバーが動いていなければ、クライアントはローカルで変換する。
+
+　　　　　　　（６）　小さな編集の後に再実行する文書はインクリメンタルに変換する。
+　　　　　　　　　　　　　　converter = politeWordToAssertiveOne.IncrementalConverter()
+　　　　　　　　　　　　　　converter.convert(text)         # 変更された文のみ
+　　　　　　　　　　　　　　politeWordToAssertiveOne.py serve --incremental &
+　　　　　　　　　　　文（「。」と改行の後で分割）はキャッシュし、編集箇所の周りのテキストは前回の結果から取る。
+
+　　　　　　　（７）　非常に大きいファイルはメモリマップしてバイト列として変換する。
+　　　　　　　　　　　　　　politeWordToAssertiveOne.py --mmap -i huge.txt -o assertive.txt
+　　　　　　　　　　　丁寧語を含む行のみをデコードして変換し、他はそのままコピーして書き終えたページは解放する。
+
+　　　　　　　（８）　一つの大きい文書は全CPUコアで変換する。
+　　　　　　　　　　　　　　politeWordToAssertiveOne.py -j 0 -i manual.txt -o assertive.txt
+　　　　　　　　　　　テキストはルールが跨いで一致しない箇所（「。」や改行等）で切り、
+　　　　　　　　　　　チャンクをプロセスプールで変換して順に書き出す。結果は一コアの場合と同じである。
+
+　　　　　　　（９）　dictを整理するため、コーパスで適用されるルールを数える。
+　　　　　　　　　　　　　　politeWordToAssertiveOne.py --hits hits.json batch corpus/ -o out/
+　　　　　　　　　　　hits.json には出所（dct_fchg、dct_wgrp1、dct_tail、漢字条件）毎、及びdct_wgrp1のグループ毎の一致数、
+　　　　　　　　　　　最も一致したルール、及び一度も一致しなかったルールを出力する。
+
+　　　　　　　（１０）　監視のため、フェーズ毎の所要時間とメモリを記録する。
+　　　　　　　　　　　　　　politeWordToAssertiveOne.py --metrics /var/lib/node_exporter/polite.prom
+　　　　　　　　　　　ルール構築、cnvForced、cnvCoditional、及び読み書きの所要時間を入力の大きさ毎に
+　　　　　　　　　　　node exporter用のOpenMetricsテキストファイルに記録し、計数は実行を跨いで累積する。
+　　　　　　　　　　　各フェーズのピーク割り当て量には python -X tracemalloc が必要である。
+
+　　　　　　　（１１）　変換結果のレビューのため、変換中に編集を記録する。
+　　　　　　　　　　　　　　politeWordToAssertiveOne.py -i polite.txt -o assertive.txt --diff -
+　　　　　　　　　　　　　　politeWordToAssertiveOne.py --diff review.txt --side-by-side
+　　　　　　　　　　　　　　converter.convert(text, edits=politeWordToAssertiveOne.EditLog(text))
+　　　　　　　　　　　EditLog.edits() は入力テキスト上の（位置、元、置換、ルール）を列挙し、
+　　　　　　　　　　　差分はテキスト全体を再比較せずにこれらから作成する。
+
+　　　　　　　（１２）　実行を跨いで繰り返す文はディスク上のキャッシュに保持する。
+　　　　　　　　　　　　　　politeWordToAssertiveOne.py --cache-file sentences.sqlite3 batch docs/ -o out/
+　　　　　　　　　　　　　　politeWordToAssertiveOne.py --cache --cache-size 64 -i polite.txt
+　　　　　　　　　　　変換した文はルールのハッシュ値の下でSQLite（WALモード、ワーカーで共有）に保持し、
+　　　　　　　　　　　dictの変更時にキャッシュを消去し、最も使われていない文を追い出す。
+
+　　　　　　　（１３）　CIでの検査には、ファイルに残る丁寧語形を報告する。
+　　　　　　　　　　　　　　politeWordToAssertiveOne.py check docs/ -p '*.md'
+　　　　　　　　　　　　　　politeWordToAssertiveOne.py check --all 'man/**/*.txt'
+　　　　　　　　　　　何も変換せず、各ファイルの最初の丁寧語形（--allなら全て）をファイル:行:桁として
+　　　　　　　　　　　全CPUコアで報告する。終了コードは丁寧語形が残れば1、読めないファイルがあれば2とする。
+
+　　　　　　　（１４）　JSON Linesのレコードはストリームでフィールド毎に変換する。
+　　　　　　　　　　　　　　politeWordToAssertiveOne.py --jsonl text --jsonl meta.title -j 0 \
+　　　　　　　　　　　　　　　　-i records.jsonl -o assertive.jsonl
+　　　　　　　　　　　レコードはバッチ毎に読んで全CPUコアで変換して順に書き出し、変更の無いレコードは読んだままとする。
+
+　　　　　　　（１５）　HTMLとMarkdownはマークアップの外のテキストのみを変換する。
+　　　　　　　　　　　　　　politeWordToAssertiveOne.py --markup html -i page.html -o assertive.html
+　　　　　　　　　　　タグ、実体参照、コメント、script/style/pre/code要素と、Markdownのコードスパン、
+　　　　　　　　　　　フェンスと字下げのコード、リンク先は読んだまま書き出し、その間のテキストは単独で変換する。
+
+　　　　　　　（１６）　ユーザー辞書を組み込みルールの上に重ねる。
+　　　　　　　　　　　　　　politeWordToAssertiveOne.py --overlay terms.tsv --overlay project.tsv serve
+　　　　　　　　　　　一行に一つの「キー<TAB>置換後」で、後のファイルが優先し、キーは組み込みルールより先に置き換えてそのまま残す。
+　　　　　　　　　　　オーバーレイのみをコンパイルし、動作中のプロセスは変更から数ミリ秒以内に読み直す。
+
+　　　　　　　（１７）　ファイルシステムを共有するマシンでスプールディレクトリを共に変換する。
+　　　　　　　　　　　　　　politeWordToAssertiveOne.py spool /shared/spool -j 4
+　　　　　　　　　　　spool/new/に移したファイルは一つのワーカーが名前変更で確保し、出力と目印<名前>.doneをspool/out/に書く。
+　　　　　　　　　　　異常終了した、ないし応答の無い（--stale）ワーカーの確保は再び変換する。
         ]
 
 History
@@ -99,10 +291,55 @@ History
      
 """
 
+import argparse
+import array
+import bisect
+import collections
+import fnmatch
+import glob
+import hashlib
+import heapq
+import io
+import itertools
+import json
+import marshal
+import mmap
+import operator
 import os
 import re
+import shutil
+import sys
+import tempfile
+import threading
+import time
 
-import pyperclip
+
+# format version of the rule cache file
+# [ルールキャッシュファイルの形式の版]
+RULE_CACHE_VERSION = 4
+
+# rule cache file, the factored rules and the compiled matcher
+# [ルールキャッシュファイル。因数分解したルールとコンパイル済みの照合器]
+RULE_CACHE_FILE = os.environ.get(
+    'POLITE_TO_ASSERTIVE_CACHE',
+    os.path.join(os.path.expanduser('~'), '.cache', 'politeWordToAssertiveOne',
+                 'rules.v{}.marshal'.format(RULE_CACHE_VERSION)))
+
+# sentence cache database, the converted sentences shared by the runs (see SentenceCache)
+# [文キャッシュのデータベース。実行間で共有する変換済みの文（SentenceCache参照）]
+SENTENCE_CACHE_FILE = os.environ.get(
+    'POLITE_TO_ASSERTIVE_SENTENCES',
+    os.path.join(os.path.dirname(RULE_CACHE_FILE), 'sentences.sqlite3'))
+
+
+# continuation bytes of UTF-8, every other byte starts a character
+# [UTF-8の継続バイト。それ以外のバイトは文字の始まり]
+UTF8_CONTINUATION = bytes(range(0x80, 0xC0))
+
+# rules shared by the converters of the process (see ToneRules.shared)
+# [プロセス内の変換器で共有するルール（ToneRules.shared参照）]
+_shared_rules = None
+_shared_lock = threading.Lock()
 
 
 class ClipBoard():
@@ -112,26 +349,965 @@ class ClipBoard():
         [現在のクリップボードのテキスト内容を読む、ないし新たなテキスト内容を貼り付け内容を更新する。]
     """
     
+    def clip(self):
+        """
+            the pyperclip module, imported on the first use of the clipboard
+            [pyperclipモジュール。クリップボードの初回使用時にインポートする]
+            
+            pyperclip looks for the clipboard commands when it is imported, 
+            so conversions of strings and files do not import it.
+            [pyperclipはインポート時にクリップボードのコマンドを探すので、
+             文字列やファイルの変換ではインポートしない。]
+        """
+        import pyperclip
+        return(pyperclip)
+    
     def get(self):
         """
             Contents of current clipboard.
             [現在クリップボードの内容を取得する。]
         """
-        return (str(pyperclip.paste()))
+        return (str(self.clip().paste()))
     
     def set(self, past_text):
         """
             Rewrite the clipboard to this content.
             [この内容に、クリップボードを書き換える。]
         """
-        pyperclip.copy(past_text)
+        self.clip().copy(past_text)
         return (past_text)
 
 
-class CnvTone():
+class Tracer():
+    """
+        append the conversion rules that fired to a file as JSON lines.
+        [適用された変換ルールをJSON Linesとしてファイルに追記する。]
+        
+        One record per rule and conversion: 
+            {"source", "phase", "rule", "key", "value", "count", "offsets"}
+        The offsets are character offsets into the source (see EditLog.sourceOffsets), 
+        a match in text inserted by an earlier rule takes the offset of that edit, 
+        so they do not depend on how the source is cut into chunks.
+        [ルールと変換毎に一行。オフセットはソース上の文字位置で（EditLog.sourceOffsets参照）、
+         前のルールが挿入したテキスト中の一致はその編集の位置とするので、ソースのチャンクへの
+         切り方に依らない。]
+    """
+    
+    def __init__(self, path):
+        """
+            open the trace file, each record is a single append
+            [トレースファイルを開く。各レコードは一回の追記とする]
+        """
+        self.fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o666)
+        self.path = path
+        self.source = None
+    
+    def rule(self, phase, rule_id, key, value, offsets):
+        """
+            write the record of a rule that fired
+            [適用されたルールのレコードを書き出す]
+        """
+        w_rec = {'source': self.source, 'phase': phase, 'rule': rule_id, 
+                 'key': key, 'value': value, 'count': len(offsets), 
+                 'offsets': offsets}
+        w_line = (json.dumps(w_rec, ensure_ascii=False) + '\n').encode('utf-8')
+        while w_line:
+            w_line = w_line[os.write(self.fd, w_line):]
+    
+    def close(self):
+        """
+            close the trace file
+            [トレースファイルを閉じる]
+        """
+        os.close(self.fd)
+
+
+class HitCounter():
+    """
+        count the hits of each conversion rule, to find the hot and the dead rules.
+        [各変換ルールの一致数を数え、よく使うルールと使われないルールを見つける。]
+        
+        A hit is one replacement. The converter adds the hits of a conversion 
+        at once, so the counters cost one dict update per rule that fired.
+        The counts of other processes are added by merge(take()).
+        [一致は一回の置換。変換器は一回の変換の一致をまとめて加えるので、
+         カウンタの費用は適用されたルール毎に一回のdict更新である。
+         他プロセスの計数はmerge(take())で加える。]
+    """
+    
+    # sources of the rules in the order of the report
+    # [報告するルールの出所の順]
+    SOURCES = ('forced', 'stem', 'tail', 'conditional')
+    
+    def __init__(self, rules):
+        """
+            counters of the rules (ToneRules, built)
+            [ルール（構築済みのToneRules）のカウンタ]
+        """
+        self.rules = rules
+        self.lock = threading.Lock()
+        self.hits = {'forced': array.array('Q', bytes(8 * rules.rule_count)), 
+                     'conditional': array.array('Q', bytes(8 * len(rules.dct_cnv2)))}
+    
+    def add(self, phase, hits):
+        """
+            add the hits of one conversion, phase is 'forced' or 'conditional', 
+            hits is {rule id: count}
+            [一回の変換の一致を加える。phaseは'forced'ないし'conditional'、hitsは{ルールID: 回数}]
+        """
+        w_counts = self.hits[phase]
+        with self.lock:
+            for (rule_id, w_count) in hits.items():
+                w_counts[rule_id] += w_count
+    
+    def take(self):
+        """
+            the counts as {phase: {rule id: count}}, the counters are reset
+            [計数を{phase: {ルールID: 回数}}として返し、カウンタをリセットする]
+        """
+        w_state = {}
+        with self.lock:
+            for (phase, w_counts) in self.hits.items():
+                w_state[phase] = {i: n for (i, n) in enumerate(w_counts) if n}
+                self.hits[phase] = array.array('Q', bytes(8 * len(w_counts)))
+        return(w_state)
+    
+    def merge(self, state):
+        """
+            add the counts of take()
+            [take()の計数を加える]
+        """
+        for (phase, hits) in state.items():
+            self.add(phase, hits)
+    
+    def entries(self):
+        """
+            (source, group, rule id, key, value, hits) of every rule
+            [全ルールの（出所、グループ、ルールID、キー、値、一致数）]
+        """
+        w_forced = self.hits['forced']
+        for rule_id in range(len(w_forced)):
+            (w_source, w_group, key, value) = self.rules.ruleEntry(rule_id)
+            yield((w_source, w_group, rule_id, key, value, w_forced[rule_id]))
+        w_conditional = self.hits['conditional']
+        for (rule_id, particle) in enumerate(self.rules.dct_cnv2):
+            yield(('conditional', None, rule_id, particle, 
+                   self.rules.dct_cnv2[particle], w_conditional[rule_id]))
+    
+    def report(self, top=50):
+        """
+            the hits by source and by group of dct_wgrp1, the top hottest rules, 
+            and the rules that never matched
+            [出所毎、及びdct_wgrp1のグループ毎の一致数、最も一致した上位top個のルール、
+             及び一度も一致しなかったルール]
+        """
+        w_sources = {w: {'rules': 0, 'hits': 0, 'dead': 0} for w in self.SOURCES}
+        w_groups = {}
+        w_rules = []
+        with self.lock:
+            for w_entry in self.entries():
+                (w_source, w_group, rule_id, key, value, w_hits) = w_entry
+                w_rules.append({'source': w_source, 'group': w_group, 'rule': rule_id, 
+                                'key': key, 'value': value, 'hits': w_hits})
+                w_sums = [w_sources[w_source]]
+                if w_group is not None:
+                    w_sums.append(w_groups.setdefault(w_group, {'rules': 0, 'hits': 0, 'dead': 0}))
+                for w_sum in w_sums:
+                    w_sum['rules'] += 1
+                    w_sum['hits'] += w_hits
+                    w_sum['dead'] += not w_hits
+        
+        w_hot = sorted((w for w in w_rules if w['hits']), key=lambda w: -w['hits'])
+        return({'rules': len(w_rules), 
+                'hits': sum(w['hits'] for w in w_rules), 
+                'sources': w_sources, 
+                'groups': w_groups, 
+                'hot': w_hot[:top], 
+                'dead': [w for w in w_rules if not w['hits']]})
+    
+    def write(self, path, top=50):
+        """
+            write the report as JSON
+            [報告をJSONとして書き出す]
+        """
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.report(top), f, ensure_ascii=False, indent=1)
+            f.write('\n')
+
+
+class Metrics():
+    """
+        latency and memory of the conversion phases, written as an OpenMetrics textfile.
+        [変換の各フェーズの所要時間とメモリ。OpenMetricsのテキストファイルとして書き出す。]
+        
+        Each phase ('rules', 'cnvForced', 'cnvCoditional', 'read', 'write') is 
+        timed into a histogram by input size (characters, classes up to SIZES). 
+        The peak allocation of a phase is recorded only when tracemalloc is 
+        tracing (python -X tracemalloc), the peak RSS of the process always. 
+        A phase costs two clock reads and a few list updates, so the metrics 
+        may stay on. The counts of a previous textfile are carried over, so 
+        one-shot runs accumulate as a node exporter expects.
+        [各フェーズ（'rules'、'cnvForced'、'cnvCoditional'、'read'、'write'）の所要時間を
+         入力の大きさ（文字数、SIZESまでの区分）毎のヒストグラムに記録する。フェーズのピーク
+         割り当て量はtracemallocが追跡中（python -X tracemalloc）の場合のみ、プロセスの
+         ピークRSSは常に記録する。フェーズ毎の費用は時計の読み取り二回と数回のリスト更新なので、
+         常に有効にしてよい。以前のテキストファイルの計数は引き継ぐので、単発の実行は
+         node exporterの想定通りに累積する。]
+    """
+    
+    # prefix of the metric names
+    # [メトリクス名の接頭辞]
+    PREFIX = 'polite_to_assertive'
+    
+    # upper bounds of the latency buckets in seconds
+    # [所要時間のバケットの上限（秒）]
+    BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+    
+    # upper bounds of the input size classes in characters, and the labels of the classes
+    # [入力の大きさの区分の上限（文字数）、及び区分のラベル]
+    SIZES = (1 << 10, 1 << 16, 1 << 20, 1 << 24)
+    SIZE_LABELS = ('1K', '64K', '1M', '16M', '+Inf')
+    
+    def __init__(self, path=None, interval=10.0):
+        """
+            textfile (None: not written) and the seconds between the writes of flush
+            [テキストファイル（None: 書き出さない）、及びflushの書き出しの間隔（秒）]
+        """
+        self.path = path
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.written = time.monotonic()
+        
+        # (phase, size label or None) : [counts of BUCKETS and above, sum of the seconds]
+        # [(フェーズ, 大きさのラベルないしNone) : [BUCKETS毎及びそれ以上の回数, 秒数の合計]]
+        self.phases = {}
+        
+        # phase : characters, phase : peak bytes allocated
+        # [フェーズ : 文字数、フェーズ : ピーク割り当てバイト数]
+        self.chars = {}
+        self.peaks = {}
+        
+        self.tracemalloc = None
+        if ('tracemalloc' in sys.modules or 'tracemalloc' in sys._xoptions 
+                or os.environ.get('PYTHONTRACEMALLOC')):
+            import tracemalloc
+            if tracemalloc.is_tracing():
+                self.tracemalloc = tracemalloc
+        if path is not None and os.path.exists(path):
+            self.load()
+    
+    def start(self):
+        """
+            mark of the start of a phase, for stop
+            [フェーズの開始の目印。stop用]
+        """
+        if self.tracemalloc is None:
+            return((time.perf_counter(), None))
+        self.tracemalloc.reset_peak()
+        return((time.perf_counter(), self.tracemalloc.get_traced_memory()[0]))
+    
+    def stop(self, mark, phase, size=None):
+        """
+            record a phase started at mark, size is the input in characters
+            [markで開始したフェーズを記録する。sizeは入力の文字数]
+        """
+        w_secs = time.perf_counter() - mark[0]
+        w_peak = None
+        if mark[1] is not None:
+            w_peak = self.tracemalloc.get_traced_memory()[1] - mark[1]
+        self.observe(phase, w_secs, size, w_peak)
+    
+    def observe(self, phase, seconds, size=None, peak=None):
+        """
+            record one run of a phase
+            [フェーズの一回の実行を記録する]
+        """
+        w_label = None if size is None else self.SIZE_LABELS[bisect.bisect_left(self.SIZES, size)]
+        w_bucket = bisect.bisect_left(self.BUCKETS, seconds)
+        with self.lock:
+            w_hist = self.phases.get((phase, w_label))
+            if w_hist is None:
+                w_hist = self.phases[(phase, w_label)] = [0] * (len(self.BUCKETS) + 1) + [0.0]
+            w_hist[w_bucket] += 1
+            w_hist[-1] += seconds
+            if size is not None:
+                self.chars[phase] = self.chars.get(phase, 0) + size
+            if peak is not None and peak > self.peaks.get(phase, -1):
+                self.peaks[phase] = peak
+    
+    def take(self):
+        """
+            the records as a state for merge, the records are reset
+            [記録をmerge用の状態として返し、記録をリセットする]
+        """
+        with self.lock:
+            w_state = (self.phases, self.chars, self.peaks)
+            (self.phases, self.chars, self.peaks) = ({}, {}, {})
+        return(w_state)
+    
+    def merge(self, state):
+        """
+            add the records of take()
+            [take()の記録を加える]
+        """
+        (w_phases, w_chars, w_peaks) = state
+        with self.lock:
+            for (k, w_hist) in w_phases.items():
+                w_mine = self.phases.setdefault(k, [0] * (len(self.BUCKETS) + 1) + [0.0])
+                for i in range(len(w_hist)):
+                    w_mine[i] += w_hist[i]
+            for (phase, w_count) in w_chars.items():
+                self.chars[phase] = self.chars.get(phase, 0) + w_count
+            for (phase, w_peak) in w_peaks.items():
+                self.peaks[phase] = max(self.peaks.get(phase, 0), w_peak)
+    
+    def load(self):
+        """
+            carry over the records of the textfile written before
+            [以前に書き出したテキストファイルの記録を引き継ぐ]
+        """
+        w_phases = {}
+        w_chars = {}
+        w_peaks = {}
+        w_bounds = {repr(w): i for (i, w) in enumerate(self.BUCKETS)}
+        w_bounds['+Inf'] = len(self.BUCKETS)
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                for w_line in f:
+                    m = re.match(r'(\w+)\{([^}]*)\} (\S+)$', w_line)
+                    if m is None or not m.group(1).startswith(self.PREFIX + '_phase_'):
+                        continue
+                    (w_name, w_value) = (m.group(1)[len(self.PREFIX) + 7:], float(m.group(3)))
+                    w_labels = dict(re.findall(r'(\w+)="([^"]*)"', m.group(2)))
+                    k = (w_labels['phase'], w_labels.get('size'))
+                    if w_name in ('seconds_bucket', 'seconds_sum'):
+                        w_hist = w_phases.setdefault(k, [0] * (len(self.BUCKETS) + 1) + [0.0])
+                        if w_name == 'seconds_sum':
+                            w_hist[-1] = w_value
+                        elif w_labels.get('le') in w_bounds:
+                            w_hist[w_bounds[w_labels['le']]] = int(w_value)
+                    elif w_name == 'chars_total':
+                        w_chars[k[0]] = int(w_value)
+                    elif w_name == 'peak_bytes':
+                        w_peaks[k[0]] = int(w_value)
+        except (OSError, ValueError, KeyError):
+            # a broken textfile is started over
+            # [壊れたテキストファイルは最初からやり直す]
+            return(False)
+        
+        # the buckets of the textfile are cumulative
+        # [テキストファイルのバケットは累積値]
+        for w_hist in w_phases.values():
+            for i in range(len(self.BUCKETS), 0, -1):
+                w_hist[i] -= w_hist[i - 1]
+        self.merge((w_phases, w_chars, w_peaks))
+        return(True)
+    
+    def text(self):
+        """
+            the records in the OpenMetrics text format
+            [OpenMetricsテキスト形式の記録]
+        """
+        w_name = self.PREFIX + '_phase_seconds'
+        w_lines = ['# HELP {} wall time of the conversion phases by input size in characters'.format(w_name), 
+                   '# TYPE {} histogram'.format(w_name), 
+                   '# UNIT {} seconds'.format(w_name)]
+        with self.lock:
+            for (phase, w_label) in sorted(self.phases, key=lambda k: (k[0], k[1] or '')):
+                w_hist = self.phases[(phase, w_label)]
+                w_labels = 'phase="{}"'.format(phase)
+                if w_label is not None:
+                    w_labels += ',size="{}"'.format(w_label)
+                w_count = 0
+                for (i, w_le) in enumerate(list(map(repr, self.BUCKETS)) + ['+Inf']):
+                    w_count += w_hist[i]
+                    w_lines.append('{}_bucket{{{},le="{}"}} {}'.format(w_name, w_labels, w_le, w_count))
+                w_lines.append('{}_sum{{{}}} {!r}'.format(w_name, w_labels, w_hist[-1]))
+                w_lines.append('{}_count{{{}}} {}'.format(w_name, w_labels, w_count))
+            
+            w_name = self.PREFIX + '_phase_chars'
+            w_lines += ['# HELP {} characters of the input of the phases'.format(w_name), 
+                        '# TYPE {} counter'.format(w_name)]
+            for phase in sorted(self.chars):
+                w_lines.append('{}_total{{phase="{}"}} {}'.format(w_name, phase, self.chars[phase]))
+            
+            w_name = self.PREFIX + '_phase_peak_bytes'
+            w_lines += ['# HELP {} peak allocation of a phase (python -X tracemalloc)'.format(w_name), 
+                        '# TYPE {} gauge'.format(w_name), 
+                        '# UNIT {} bytes'.format(w_name)]
+            for phase in sorted(self.peaks):
+                w_lines.append('{}{{phase="{}"}} {}'.format(w_name, phase, self.peaks[phase]))
+        
+        try:
+            import resource
+            w_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            w_name = self.PREFIX + '_max_rss_bytes'
+            w_lines += ['# HELP {} peak resident memory of the process'.format(w_name), 
+                        '# TYPE {} gauge'.format(w_name), 
+                        '# UNIT {} bytes'.format(w_name), 
+                        '{} {}'.format(w_name, w_rss if sys.platform == 'darwin' else w_rss * 1024)]
+        except ImportError:
+            # no resource module on Windows
+            # [Windowsにはresourceモジュールが無い]
+            pass
+        w_lines.append('# EOF')
+        return('\n'.join(w_lines) + '\n')
+    
+    def write(self):
+        """
+            replace the textfile atomically, so the exporter never reads a partial one
+            [エクスポーターが書きかけを読まないよう、テキストファイルを不可分に置き換える]
+        """
+        w_dir = os.path.dirname(self.path) or '.'
+        (fd, w_tmp) = tempfile.mkstemp(dir=w_dir, prefix='.' + os.path.basename(self.path) + '.')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(self.text())
+            os.chmod(w_tmp, 0o644)
+            os.replace(w_tmp, self.path)
+        except BaseException:
+            os.unlink(w_tmp)
+            raise
+        self.written = time.monotonic()
+        return(True)
+    
+    def flush(self):
+        """
+            write the textfile if interval seconds have passed since the last write
+            [前回の書き出しからinterval秒経っていればテキストファイルを書き出す]
+        """
+        if self.path is None or time.monotonic() - self.written < self.interval:
+            return(False)
+        return(self.write())
+
+
+class EditLog():
+    """
+        edits of one conversion against its source text, collected during the pass.
+        [一回の変換の元テキストに対する編集。変換の走査中に集める。]
+        
+        An edit is (offset, original, replacement, rules), the offset is in the 
+        source and rules are the (phase, rule id) that made it. A rule may match 
+        text inserted by an earlier one, such edits are merged, so the edits never 
+        overlap and applying them to the source gives the converted text. 
+        The renderers read only the lines around the edits.
+        [編集は（位置、元の文字列、置換後の文字列、ルール）。位置は元テキスト上、
+         ルールはそれを行った（フェーズ, ルールID）。ルールは前のルールが挿入したテキストに
+         一致し得るが、そのような編集はまとめるので、編集は重ならず、元テキストに適用すると
+         変換結果となる。表示は編集の周りの行のみを読む。]
+    """
+    
+    def __init__(self, text):
+        """
+            the source text of the conversion
+            [変換の元テキスト]
+        """
+        self.text = text
+        
+        # the edits in order, by start and end in the source, replacement, 
+        # rules, and change of the length
+        # [順に並べた編集。元テキスト上の開始・終了、置換後の文字列、ルール、長さの変化]
+        self.starts = []
+        self.ends = []
+        self.news = []
+        self.rules = []
+        self.deltas = []
+    
+    def apply(self, text, matches):
+        """
+            record replacements made in text (the source with the edits so far applied), 
+            matches are (position in text, length, replacement, (phase, rule id)) in order
+            [text（これまでの編集を適用した元テキスト）での置換を記録する。
+             matchesは順に並んだ（text上の位置、長さ、置換後の文字列、（フェーズ, ルールID））]
+        """
+        # the edits in the coordinates of text
+        # [text上の座標での編集]
+        w_shift = [0] + list(itertools.accumulate(self.deltas))
+        w_cstarts = list(map(operator.add, self.starts, w_shift))
+        w_cends = list(map(operator.add, w_cstarts, map(len, self.news)))
+        
+        # new edits, [start, end, start in text, end in text, matches, rules]
+        # [新しい編集。[開始, 終了, text上の開始, text上の終了, 一致, ルール]]
+        w_out = []
+        last = 0
+        for w_match in matches:
+            (pos, w_len) = w_match[:2]
+            end = pos + w_len
+            
+            # the edits overlapping the match, an edit may span several matches
+            # [一致に重なる編集。一つの編集が複数の一致に跨る場合がある]
+            i = bisect.bisect_right(w_cends, pos)
+            j = max(i, last)
+            while j < len(w_cstarts) and w_cstarts[j] < end:
+                j += 1
+            if i < last:
+                w_edit = w_out[-1]
+            else:
+                if last < i:
+                    w_out.append((last, i))
+                w_edit = [pos - w_shift[i], None, pos, None, [], []]
+                if i < j and w_cstarts[i] <= pos:
+                    (w_edit[0], w_edit[2]) = (self.starts[i], w_cstarts[i])
+                w_out.append(w_edit)
+            for k in range(i if i >= last else last, j):
+                w_edit[5].extend(self.rules[k])
+            w_edit[4].append(w_match)
+            w_edit[5].append(w_match[3])
+            if j > i and w_cends[j - 1] >= end:
+                (w_edit[1], w_edit[3]) = (self.ends[j - 1], w_cends[j - 1])
+            elif w_edit[3] is None or w_edit[3] < end:
+                (w_edit[1], w_edit[3]) = (end - w_shift[j], end)
+            last = j
+        if last < len(self.starts):
+            w_out.append((last, len(self.starts)))
+        
+        (w_starts, w_ends, w_news, w_rules, w_deltas) = ([], [], [], [], [])
+        for w_edit in w_out:
+            if len(w_edit) == 2:
+                # a run of edits that the matches do not touch
+                # [一致が触れない編集の連続]
+                (i, j) = w_edit
+                w_starts += self.starts[i:j]
+                w_ends += self.ends[i:j]
+                w_news += self.news[i:j]
+                w_rules += self.rules[i:j]
+                w_deltas += self.deltas[i:j]
+                continue
+            
+            # the text of the edit with its matches replaced
+            # [一致を置き換えたその編集のテキスト]
+            (start, end, cstart, cend, w_matches, rules) = w_edit
+            w_parts = []
+            pos = cstart
+            for (w_pos, w_len, w_value, rule) in w_matches:
+                w_parts.append(text[pos:w_pos])
+                w_parts.append(w_value)
+                pos = w_pos + w_len
+            w_parts.append(text[pos:cend])
+            w_starts.append(start)
+            w_ends.append(end)
+            w_news.append(''.join(w_parts))
+            w_rules.append(tuple(rules))
+            w_deltas.append(len(w_news[-1]) - (end - start))
+        (self.starts, self.ends, self.news, self.rules, self.deltas) = (
+            w_starts, w_ends, w_news, w_rules, w_deltas)
+    
+    def sourceOffsets(self, positions):
+        """
+            offsets in the source of positions in the text with the edits so far applied, 
+            a position in a replacement takes the start of its edit
+            [これまでの編集を適用したテキスト上の位置の、元テキスト上の位置。
+             置換後の文字列の中の位置はその編集の開始位置とする]
+        """
+        w_shift = [0] + list(itertools.accumulate(self.deltas))
+        w_cstarts = list(map(operator.add, self.starts, w_shift))
+        w_offsets = []
+        for pos in positions:
+            i = bisect.bisect_right(w_cstarts, pos) - 1
+            if i >= 0 and pos < w_cstarts[i] + len(self.news[i]):
+                w_offsets.append(self.starts[i])
+            else:
+                w_offsets.append(pos - w_shift[i + 1])
+        return(w_offsets)
+    
+    def extend(self, edits, offset):
+        """
+            add the edits of an EditLog of the text at offset, after the edits so far
+            [offsetの位置のテキストのEditLogの編集を、これまでの編集の後に加える]
+        """
+        self.starts += [w + offset for w in edits.starts]
+        self.ends += [w + offset for w in edits.ends]
+        self.news += edits.news
+        self.rules += edits.rules
+        self.deltas += edits.deltas
+    
+    def edits(self):
+        """
+            the edits, [(offset, original, replacement, ((phase, rule id), ...)), ...]
+            [編集。[(位置, 元の文字列, 置換後の文字列, ((フェーズ, ルールID), ...)), ...]]
+        """
+        return([(s, self.text[s:e], w, r) 
+                for (s, e, w, r) in zip(self.starts, self.ends, self.news, self.rules)])
+    
+    def blocks(self):
+        """
+            (start, end, replacement) of the changed lines, the edits sharing a line are joined
+            [変更された行の（開始、終了、置換後の文字列）。行を共有する編集はまとめる]
+        """
+        text = self.text
+        i = 0
+        while i < len(self.starts):
+            start = text.rfind('\n', 0, self.starts[i]) + 1
+            w_parts = []
+            pos = start
+            end = None
+            while i < len(self.starts) and (end is None or self.starts[i] < end):
+                w_parts.append(text[pos:self.starts[i]])
+                w_parts.append(self.news[i])
+                pos = self.ends[i]
+                end = text.find('\n', max(pos - 1, start))
+                end = len(text) if end < 0 else end + 1
+                i += 1
+            w_parts.append(text[pos:end])
+            yield((start, end, ''.join(w_parts)))
+    
+    def hunks(self, context=3):
+        """
+            (first line before, first line after, [(old lines, new lines, changed), ...]) 
+            of the changed lines with context lines around them, line numbers from 1
+            [前後にcontext行を付けた変更された行の（変換前の最初の行番号、変換後の最初の行番号、
+             [(旧行, 新行, 変更されたか), ...]）。行番号は1から]
+        """
+        text = self.text
+        w_line = 1              # line number at w_pos
+        w_pos = 0
+        w_shift = 0             # lines added by the blocks before
+        hunk = None
+        for (start, end, w_new) in self.blocks():
+            w_line += text.count('\n', w_pos, start)
+            w_pos = start
+            w_old = text[start:end].splitlines(True)
+            w_new = w_new.splitlines(True)
+            
+            # lines before, up to context lines, or all since the previous block
+            # [前の行。context行まで、ないし前の変更ブロック以降の全て]
+            w_before = start
+            for k in range(2 * context if hunk is not None else context):
+                if w_before == 0 or (hunk is not None and w_before <= hunk[3]):
+                    break
+                w_before = text.rfind('\n', 0, w_before - 1) + 1
+            if hunk is not None and w_before > hunk[3]:
+                yield(self.closeHunk(hunk, context))
+                hunk = None
+            if hunk is None:
+                w_before = start
+                for k in range(context):
+                    if w_before == 0:
+                        break
+                    w_before = text.rfind('\n', 0, w_before - 1) + 1
+                w_gap = text[w_before:start].splitlines(True)
+                hunk = [w_line - len(w_gap), w_line - len(w_gap) + w_shift, [], None]
+            else:
+                w_gap = text[hunk[3]:start].splitlines(True)
+            if w_gap:
+                hunk[2].append((w_gap, w_gap, False))
+            if hunk[2] and hunk[2][-1][2]:
+                # adjacent changed lines are one run
+                # [隣接する変更された行は一続きとする]
+                hunk[2][-1][0].extend(w_old)
+                hunk[2][-1][1].extend(w_new)
+            else:
+                hunk[2].append((w_old, w_new, True))
+            hunk[3] = end
+            w_shift += len(w_new) - len(w_old)
+        if hunk is not None:
+            yield(self.closeHunk(hunk, context))
+    
+    def closeHunk(self, hunk, context):
+        """
+            a hunk of hunks with the context lines after it
+            [後のcontext行を付けたhunksのハンク]
+        """
+        w_after = hunk[3]
+        for k in range(context):
+            if w_after >= len(self.text):
+                break
+            w_after = self.text.find('\n', w_after)
+            w_after = len(self.text) if w_after < 0 else w_after + 1
+        w_tail = self.text[hunk[3]:w_after].splitlines(True)
+        if w_tail:
+            hunk[2].append((w_tail, w_tail, False))
+        return((hunk[0], hunk[1], hunk[2]))
+    
+    def unified(self, names=('polite', 'assertive'), context=3):
+        """
+            lines of the unified diff of the conversion
+            [変換のunified diffの行]
+        """
+        w_first = True
+        for (w_line, w_new_line, w_segments) in self.hunks(context):
+            if w_first:
+                yield('--- {}\n'.format(names[0]))
+                yield('+++ {}\n'.format(names[1]))
+                w_first = False
+            yield('@@ -{} +{} @@\n'.format(
+                self.lineRange(w_line, sum(len(w[0]) for w in w_segments)), 
+                self.lineRange(w_new_line, sum(len(w[1]) for w in w_segments))))
+            for (w_old, w_new, w_changed) in w_segments:
+                if not w_changed:
+                    for w in w_old:
+                        yield(self.diffLine(' ', w))
+                    continue
+                for w in w_old:
+                    yield(self.diffLine('-', w))
+                for w in w_new:
+                    yield(self.diffLine('+', w))
+    
+    @staticmethod
+    def lineRange(line, count):
+        """
+            range of a hunk header, as diff -u writes it
+            [diff -u と同じハンクヘッダーの範囲]
+        """
+        if count == 1:
+            return('{}'.format(line))
+        return('{},{}'.format(line if count else line - 1, count))
+    
+    @staticmethod
+    def diffLine(mark, line):
+        """
+            a line of the diff, a last line without newline is marked as diff -u does
+            [差分の一行。改行の無い最終行は diff -u と同様に示す]
+        """
+        if line.endswith('\n'):
+            return(mark + line)
+        return(mark + line + '\n\\ No newline at end of file\n')
+    
+    def sideBySide(self, width=60, context=3):
+        """
+            lines of the changed lines and the context lines, before and after side by side, 
+            the width is in display columns (East Asian wide characters are 2)
+            [変更された行とcontext行の変換前後を左右に並べた行。幅は表示桁数（東アジアの全角文字は2）]
+        """
+        import unicodedata
+        
+        def pad(line):
+            w_cols = sum(2 if unicodedata.east_asian_width(ch) in 'WF' else 1 for ch in line)
+            return(line + ' ' * max(width - w_cols, 0))
+        
+        w_first = True
+        for (w_line, w_new_line, w_segments) in self.hunks(context):
+            if not w_first:
+                yield('{:>6} {}\n'.format('', '-' * width))
+            w_first = False
+            for (w_old, w_new, w_changed) in w_segments:
+                for n in range(max(len(w_old), len(w_new))):
+                    w_left = w_old[n].rstrip('\r\n') if n < len(w_old) else ''
+                    w_right = w_new[n].rstrip('\r\n') if n < len(w_new) else ''
+                    yield('{:>6} {} {} {}\n'.format(w_line, pad(w_left), '|' if w_changed else ' ', w_right))
+                    w_line += 1
+
+
+class AnchorMatcher():
+    """
+        multi-pattern matcher that only inspects the text around polite markers.
+        [丁寧語の目印の周辺のみを調べる複数パターン照合器。]
+        
+        The keys are given as plain keys, and as stems and suffixes of groups 
+        that are composed at match time (stem + suffix of the same group, see 
+        ToneRules.resolve), so the product of stems and suffixes is never stored.
+        Every key or suffix is anchored on the rightmost marker in it 
+        (one without a marker is its own marker). The markers are found 
+        with one regular expression, and from each possible end after a 
+        marker the text is matched backwards against the trie of the 
+        reversed keys and suffixes, then before each suffix against the 
+        trie of the reversed stems. findKeys reads only the text around the 
+        markers, and ToneConverter.cnvForced applies the rules only to the 
+        pieces around them (see ToneConverter.cutPiece), the text between is 
+        passed over by the expression alone.
+        [キーは単純なキー、及び照合時に合成するグループの語幹と接尾部（同じグループの語幹 + 接尾部、
+         ToneRules.resolve参照）として与えるので、語幹と接尾部の積は保持しない。
+         各キーないし接尾部はその中の最も右の目印に固定する（目印を含まないものはそれ自体を目印とする）。
+         目印は一つの正規表現で見つけ、目印の後の終わり得る各位置から、逆順のキーと接尾部の
+         トライ木とテキストを後ろ向きに照合し、各接尾部の前を逆順の語幹のトライ木と照合する。
+         findKeysは目印の周りのテキストのみを読み、ToneConverter.cnvForcedは目印の周りの断片
+         （ToneConverter.cutPiece参照）のみにルールを適用する。その間のテキストは正規表現が
+         通過するのみである。]
+        
+        Both tries are kept in one flat dict, (state << 21 | character code) : 
+        next state, and a group set is an int with one bit per group.
+        [両トライ木は一つの平坦なdict（(状態 << 21 | 文字コード) : 次の状態）に保持し、
+         グループの集合はグループ毎に1ビットのintとする。]
+    """
+    
+    # polite markers, the endings of dct_wchg, dct_tail and dct_fchg
+    # [丁寧語の目印。dct_wchg、dct_tail及びdct_fchgの語尾]
+    MARKERS = ('ます', 'ません', 'ました', 'ましょう', 'です', 'でしょう', 
+               '下さい', 'ください', 'ござい')
+    
+    # root states of the key and suffix trie, and of the stem trie
+    # [キーと接尾部のトライ木、及び語幹のトライ木の根の状態]
+    KEY_ROOT = 0
+    STEM_ROOT = 1
+    
+    def __init__(self, keys, stems=None, suffixes=None):
+        """
+            build the reversed tries and the markers, 
+            stems and suffixes are {stem or suffix: bits of the groups}
+            [逆順のトライ木と目印を構築する。stemsとsuffixesは{語幹ないし接尾部: グループのビット}]
+        """
+        # transitions, whether a key ends at the state (key_end), and the groups 
+        # of the suffix or the stem that ends at the state (grps, 0 if none)
+        # [遷移、その状態でキーが終わるか（key_end）、及びその状態で終わる接尾部ないし
+        #  語幹のグループ（grps、無ければ0）]
+        self.goto = {}
+        w_key_end = bytearray(2)
+        self.grps = [0, 0]
+        stems = stems or {}
+        suffixes = suffixes or {}
+        
+        # characters after the marker to the end of the key, by marker
+        # [目印毎の、目印の後からキーの終わりまでの文字数]
+        self.tails = {}
+        
+        for key in keys:
+            state = self.addReversed(self.KEY_ROOT, key, w_key_end)
+            w_key_end[state] = 1
+            self.addAnchor(key)
+        for w_suffix in suffixes:
+            state = self.addReversed(self.KEY_ROOT, w_suffix, w_key_end)
+            self.grps[state] = suffixes[w_suffix]
+            self.addAnchor(w_suffix)
+        for w_stem in stems:
+            state = self.addReversed(self.STEM_ROOT, w_stem, w_key_end)
+            self.grps[state] = stems[w_stem]
+        self.key_end = bytes(w_key_end)
+        
+        self.max_stem = max(map(len, stems), default=0)
+        self.max_len = max(max(map(len, keys), default=0),
+                           self.max_stem + max(map(len, suffixes), default=0))
+        self.compile()
+    
+    def addReversed(self, root, key, key_end):
+        """
+            add the reversed key to the trie of the root, returns its last state
+            [逆順のキーを根のトライ木に加え、その最後の状態を返す]
+        """
+        state = root
+        for ch in reversed(key):
+            nxt = self.goto.get(state << 21 | ord(ch))
+            if nxt is None:
+                nxt = len(self.grps)
+                self.goto[state << 21 | ord(ch)] = nxt
+                self.grps.append(0)
+                key_end.append(0)
+            state = nxt
+        return(state)
+    
+    def addAnchor(self, key):
+        """
+            anchor the key on its rightmost marker, the longest one of those ending there
+            [キーをその最も右の目印に固定する。そこで終わるものの内で最長のもの]
+        """
+        w_anchor = (0, 0, key)
+        for marker in self.MARKERS:
+            end = key.rfind(marker) + len(marker)
+            if end >= len(marker):
+                w_anchor = max(w_anchor, (end, len(marker), marker))
+        (end, w_len, marker) = w_anchor
+        if not end:
+            end = len(key)
+        w_tails = self.tails.setdefault(sys.intern(marker), [])
+        if len(key) - end not in w_tails:
+            w_tails.append(len(key) - end)
+    
+    def compile(self):
+        """
+            compile the expression that finds the markers
+            [目印を見つける正規表現をコンパイルする]
+        """
+        self.markers = sorted(self.tails, key=len, reverse=True)
+        self.pattern = re.compile('|'.join(map(re.escape, self.markers)))
+        
+        # markers by first character, to find the markers overlapping a match
+        # [先頭文字毎の目印。一致と重なる目印を見つけるため]
+        self.by_first = {}
+        for marker in self.markers:
+            self.by_first.setdefault(marker[0], []).append(marker)
+    
+    @classmethod
+    def fromState(cls, state):
+        """
+            restore the matcher saved by getState.
+            [getStateで保存した照合器を復元する。]
+        """
+        matcher = cls.__new__(cls)
+        (matcher.goto, matcher.key_end, matcher.grps, 
+         matcher.tails, matcher.max_stem, matcher.max_len) = state
+        matcher.tails = {sys.intern(marker): matcher.tails[marker] for marker in matcher.tails}
+        matcher.compile()
+        return(matcher)
+    
+    def getState(self):
+        """
+            state of the matcher that marshal can serialize.
+            [marshalで直列化できる照合器の状態。]
+        """
+        return((self.goto, self.key_end, self.grps, 
+                self.tails, self.max_stem, self.max_len))
+    
+    def stemGroups(self, stem):
+        """
+            bits of the groups of the stem, 0 if it is no stem
+            [語幹のグループのビット。語幹でなければ0]
+        """
+        state = self.STEM_ROOT
+        for ch in reversed(stem):
+            state = self.goto.get(state << 21 | ord(ch))
+            if state is None:
+                return(0)
+        return(self.grps[state])
+    
+    def findKeys(self, text):
+        """
+            set of the keys in the text
+            [テキスト中のキーの集合]
+        """
+        goto = self.goto
+        key_end = self.key_end
+        grps = self.grps
+        tails = self.tails
+        by_first = self.by_first
+        found = set()
+        ends = set()
+        for m in self.pattern.finditer(text):
+            # every marker starting in the match, they may overlap
+            # [一致範囲内で始まる全ての目印。目印は重なり得る]
+            for start in range(m.start(), m.end()):
+                for marker in by_first.get(text[start], ()):
+                    if text.startswith(marker, start):
+                        pos = start + len(marker)
+                        for tail in tails[marker]:
+                            if pos + tail <= len(text):
+                                ends.add(pos + tail)
+        
+        # match backwards from each end, and from each suffix the stems
+        # [各終わりの位置から後ろ向きに照合し、各接尾部からは語幹を照合する]
+        for end in ends:
+            state = self.KEY_ROOT
+            for i in range(end - 1, max(end - self.max_len, 0) - 1, -1):
+                state = goto.get(state << 21 | ord(text[i]))
+                if state is None:
+                    break
+                if key_end[state]:
+                    found.add(text[i:end])
+                w_grps = grps[state]
+                if not w_grps:
+                    continue
+                
+                # stems of a group of the suffix
+                # [接尾部のグループの語幹]
+                if w_grps & grps[self.STEM_ROOT]:
+                    found.add(text[i:end])
+                w_stem = self.STEM_ROOT
+                for k in range(i - 1, max(i - self.max_stem, 0) - 1, -1):
+                    w_stem = goto.get(w_stem << 21 | ord(text[k]))
+                    if w_stem is None:
+                        break
+                    if w_grps & grps[w_stem]:
+                        found.add(text[k:end])
+        return(found)
+
+
+class ToneRules():
     """
-        convert tone.
-        [語調変換を行う。]
+        rule definitions of the tone conversion, and their compiled form.
+        [語調変換のルール定義、及びそのコンパイル結果。]
+        
+        The rules are not modified after build(), so one instance is shared 
+        by every converter of the process (see shared()).
+        [build()以降ルールは変更しないので、一つのインスタンスをプロセス内の
+         全変換器で共有する（shared()参照）。]
     """
     
     def __init__(self):
@@ -140,22 +1316,21 @@ class CnvTone():
             [語調変換の定義。]
         """
         
-        # debug option
-        self.debug = True
-        
         # dict for converting polite tone into assertive one
         # [丁寧語調を断定語調に変換するdict]
         self.dct_cnv = {
             # Beware of enumeration of dictionaries
             # [辞書の列挙順には要注意]
             
-            # Note. automatically generated inside the script
-            # [注.　スクリプト内部において自動的に生成する]
+            # Note. not expanded, the rules are kept factored (see makeRules)
+            # [注.　展開せず、ルールは因数分解して保持する（makeRules参照）]
             }
         
         self.dct_cnv2 = {
             # convert a pattern following a specific letter into an assertion word
             # [特定の一字に続くパターンを断定語に変換する]
+            # particle : assertive ending following the kanji
+            # [助詞 : 漢字に続く断定語尾]
             
             # Note. automatically generated inside the script
             # [注.　スクリプト内部において自動的に生成する]
@@ -619,93 +1794,315 @@ class CnvTone():
                 
         }
         
-        # used class
-        self.clip_board = ClipBoard()
+        # compiled rules, made by build()
+        # [コンパイル済みルール。build()で作成する]
+        self.rule_flat = None
+        self.rule_tables = None
+        self.grp_base = None
+        self.grp_table = None
+        self.grp_schg = None
+        self.grp_chg = None
+        self.grp_stems = None
+        self.stem_offs = None
+        self.stem_buf = None
+        self.rule_ends = None
+        self.rule_count = 0
+        self.rule_keys = {}
+        self.matcher = None
+        self.cond_pattern = None
+        self.hit_pattern = None
+        self.hit_len = 0
+        self.stop_chrs = None
+        self.rule_hash = None
+    
+    @classmethod
+    def shared(cls):
+        """
+            rules built once per process and shared by the converters
+            [プロセス毎に一度だけ構築し、変換器で共有するルール]
+        """
+        global _shared_rules
+        with _shared_lock:
+            if _shared_rules is None:
+                _shared_rules = cls().build()
+        return(_shared_rules)
+    
+    def build(self):
+        """
+            expand and compile the rules, from the rule cache if they are unchanged
+            [ルールを展開・コンパイルする。変更が無ければルールキャッシュから]
+        """
+        if self.stop_chrs is not None:
+            return(self)
         
-        # read clipping content of machine translation result at startup
-        self.clip_str = self.clip_board.get()
+        # factored rules and matcher
+        # [因数分解したルールと照合器]
+        if self.matcher is None and not self.loadRules():
+            if not self.makeRules():
+                raise ValueError('invalid rule definitions')
+            self.saveRules()
+        
+        # kanji-conditional pattern
+        # [漢字条件パターン]
+        if not self.makeCondRules():
+            raise ValueError('invalid rule definitions')
+        
+        (self.hit_pattern, self.hit_len) = self.makeHitPattern()
+        self.stop_chrs = self.makeStopChrs()
+        return(self)
     
-    def cnvForced(self):
+    def ruleHash(self):
         """
-            forcibly convert tones with a certain vocabulary pattern
-            [一定の語彙パターンでトーンを強制的に変換する]
+            hash of the rule definitions, the key of the rule cache
+            [ルール定義のハッシュ値。ルールキャッシュのキー]
         """
-        # forcibly change such as non-polite words (e.g.　more and more)
-        # [丁寧語でない益々（ますます）等を強制的に置き換える]
-        for k_fchg in self.dct_fchg:
-            self.dct_cnv[k_fchg] = self.dct_fchg[k_fchg]
+        if self.rule_hash is None:
+            w_rules = (RULE_CACHE_VERSION, self.dct_fchg, self.dct_wgrp1,
+                       self.dct_tail, self.dct_wgrp2, self.dct_wchg)
+            self.rule_hash = hashlib.sha1(repr(w_rules).encode('utf-8')).hexdigest()
+        return(self.rule_hash)
+    
+    def loadRules(self):
+        """
+            load the factored rules and the matcher from the rule cache
+            [ルールキャッシュから因数分解したルールと照合器を読み込む]
+        """
+        try:
+            with open(RULE_CACHE_FILE, 'rb') as f:
+                (w_hash, w_rules, state) = marshal.loads(f.read())
+        except (OSError, EOFError, ValueError, TypeError):
+            return(False)
         
-        # create conversion dict
-        # [変換dictを作成]
+        # the rules have changed since the cache was written
+        # [キャッシュ作成後にルールが変更された]
+        if w_hash != self.ruleHash():
+            return(False)
         
-        # extract approximate stems in order
-        # [近似語幹を順に取り出す]
-        for k_wgrp in self.dct_wgrp1:
-            w_stem_lst = self.dct_wgrp1[k_wgrp]['語幹']
-            w_schg = self.dct_wgrp1[k_wgrp]['語変']
+        (self.rule_flat, self.rule_tables, w_base, w_table, self.grp_schg, self.grp_chg, 
+         w_stems, w_offs, self.stem_buf, self.rule_ends, self.rule_count) = w_rules
+        self.grp_base = array.array('I', w_base)
+        self.grp_table = array.array('H', w_table)
+        self.grp_stems = array.array('I', w_stems)
+        self.stem_offs = array.array('I', w_offs)
+        self.matcher = AnchorMatcher.fromState(state)
+        return(True)
+    
+    def saveRules(self):
+        """
+            write the factored rules and the matcher to the rule cache
+            [因数分解したルールと照合器をルールキャッシュに書き込む]
+        """
+        w_dir = os.path.dirname(RULE_CACHE_FILE)
+        try:
+            os.makedirs(w_dir, exist_ok=True)
+            (fd, w_tmp) = tempfile.mkstemp(dir=w_dir)
+            with os.fdopen(fd, 'wb') as f:
+                w_rules = (self.rule_flat, self.rule_tables, self.grp_base.tobytes(), 
+                           self.grp_table.tobytes(), self.grp_schg, self.grp_chg, 
+                           self.grp_stems.tobytes(), self.stem_offs.tobytes(), self.stem_buf, 
+                           self.rule_ends, self.rule_count)
+                marshal.dump((self.ruleHash(), w_rules, self.matcher.getState()), f)
+            os.replace(w_tmp, RULE_CACHE_FILE)
+        except OSError:
+            # a cache that can not be written only costs the rebuild
+            # [キャッシュが書けなくても再構築の時間が掛かるのみ]
+            return(False)
+        return(True)
+    
+    def makeRules(self):
+        """
+            compile the rule definitions into the factored rules and the matcher
+            [ルール定義を因数分解したルールと照合器にコンパイルする]
+            
+            The conversion dict is not expanded, the stems and the polite endings 
+            are kept apart and composed at match time (see resolve). The rule id 
+            is the position in the order of the expansion, dct_fchg, then the 
+            stems × polite endings of dct_wgrp1, then dct_tail.
+            [変換dictは展開せず、語幹と丁寧語尾を別々に保持して照合時に合成する（resolve参照）。
+             ルールIDは展開順（dct_fchg、dct_wgrp1の語幹 × 丁寧語尾、dct_tail）での位置とする。]
+            
+            The strings are interned, the conjugation tables are stored once by id, 
+            and the groups are kept in arrays with their stems in one string.
+            [文字列はインターンし、活用表はIDで一度だけ保持し、グループは語幹を一つの文字列として配列に保持する。]
+        """
+        w_intern = sys.intern
+        
+        # plain key : ((rule id, value), ...)
+        # [単純なキー : ((ルールID, 値), ...)]
+        self.rule_flat = {}
+        w_id = 0
+        
+        # forcibly change such as non-polite words (e.g.　more and more)
+        # [丁寧語でない益々（ますます）等を強制的に置き換える]
+        for k_fchg in self.dct_fchg:
+            w_key = w_intern(k_fchg)
+            self.rule_flat[w_key] = self.rule_flat.get(w_key, ()) + ((w_id, w_intern(self.dct_fchg[k_fchg])),)
+            w_id += 1
+        
+        # conjugation tables by id, ((polite endings), (assertive endings))
+        # [IDで引く活用表。((丁寧語尾), (断定語尾))]
+        self.rule_tables = []
+        dct_table_id = {}
+        
+        # groups by index, first rule id, table id, '語変', whether the stem changes, 
+        # and their stems, stems of group g are stem_buf[stem_offs[i]:stem_offs[i + 1]] 
+        # for grp_stems[g] <= i < grp_stems[g + 1]
+        # [インデックスで引くグループ。最初のルールID、活用表ID、'語変'、語幹が変わるか、
+        #  及びその語幹。グループgの語幹は grp_stems[g] <= i < grp_stems[g + 1] の
+        #  stem_buf[stem_offs[i]:stem_offs[i + 1]]]
+        self.grp_base = array.array('I')
+        self.grp_table = array.array('H')
+        self.grp_schg = []
+        self.grp_chg = bytearray()
+        self.grp_stems = array.array('I', [0])
+        self.stem_offs = array.array('I', [0])
+        w_stem_buf = []
+        
+        # bits of the groups by stem and by suffix ('語変' + polite ending)
+        # [語幹毎、及び接尾部（'語変' + 丁寧語尾）毎のグループのビット]
+        dct_stem_grps = {}
+        self.rule_ends = {}
+        
+        # extract approximate stems in order
+        # [近似語幹を順に取り出す]
+        for k_wgrp in self.dct_wgrp1:
+            w_stem_lst = self.dct_wgrp1[k_wgrp]['語幹']
+            w_schg = self.dct_wgrp1[k_wgrp]['語変']
             w_endp = self.dct_wgrp1[k_wgrp]['変化']
+            if not w_stem_lst:
+                continue
+            
+            # polite to assertive
+            if not w_endp in self.dct_wchg:
+                print('not specifid -{}'.format(w_endp))
+                return(False)
+            if w_endp not in dct_table_id:
+                endp_dct = self.dct_wchg[w_endp]
+                dct_table_id[w_endp] = len(self.rule_tables)
+                self.rule_tables.append((tuple(map(w_intern, endp_dct)), 
+                                         tuple(map(w_intern, endp_dct.values()))))
+            (w_polite, w_assert) = self.rule_tables[dct_table_id[w_endp]]
+            
+            w_bit = 1 << len(self.grp_base)
+            self.grp_base.append(w_id)
+            self.grp_table.append(dct_table_id[w_endp])
+            self.grp_schg.append(w_intern(w_schg))
             
             # 語幹が変わる場合
-            if '変語幹' in self.dct_wgrp1[k_wgrp]:
-                w_chg_stem = True
-            else:
-                w_chg_stem = False
+            self.grp_chg.append('変語幹' in self.dct_wgrp1[k_wgrp])
             
-            # extract the stem from the list
-            # [リストより語幹を取り出す]
             for w_stem in w_stem_lst:
-                
-                # extract polite change dict
-                # [丁寧語尾変化dictを取り出す]
-                
-                # polite to assertive
-                if not w_endp in self.dct_wchg:
-                    print('not specifid -{}'.format(w_endp))
-                    return(False)
-                else:
-                    endp_dct = self.dct_wchg[w_endp]
-                
-                # take polite endings in order
-                # [丁寧語尾を順に取り出す]
-                for polite_end in endp_dct:
-                    
-                    # extract the corresponding asserted endings
-                    # [丁寧語尾に対応する断定語尾を取り出す]
-                    assert_end = endp_dct[polite_end]
-                    
-                    # add to conversion dict
-                    # [変換dictに加える]
-                    # '語幹' + '語変' + '丁寧語尾' : '語幹'+'断定語尾'
-                    
-                    # 語幹が変わる場合
-                    if w_chg_stem:
-                        w_polite_end = w_stem + w_schg + polite_end 
-                        w_assert_end = assert_end
-                    else:
-                        w_polite_end = w_stem + w_schg + polite_end
-                        w_assert_end = w_stem + assert_end
-                    self.dct_cnv[w_polite_end] = w_assert_end
-                    
+                w_stem_buf.append(w_stem)
+                self.stem_offs.append(self.stem_offs[-1] + len(w_stem))
+                dct_stem_grps[w_stem] = dct_stem_grps.get(w_stem, 0) | w_bit
+            self.grp_stems.append(len(self.stem_offs) - 1)
+            
+            # '語幹' + '語変' + '丁寧語尾' : '語幹' + '断定語尾'
+            for polite_end in w_polite:
+                w_suffix = w_intern(w_schg + polite_end)
+                self.rule_ends[w_suffix] = self.rule_ends.get(w_suffix, 0) | w_bit
+            w_id += len(w_stem_lst) * len(w_polite)
+        
+        self.rule_tables = tuple(self.rule_tables)
+        self.grp_schg = tuple(self.grp_schg)
+        self.grp_chg = bytes(self.grp_chg)
+        self.stem_buf = ''.join(w_stem_buf)
+        
         # register the leaked polite tone that should be interpreted at the very end
         # [一番最後になって解釈すべき漏れた敬語表現を登録する]
         for k_tail in self.dct_tail:
-            self.dct_cnv[k_tail] = self.dct_tail[k_tail]
+            w_key = w_intern(k_tail)
+            self.rule_flat[w_key] = self.rule_flat.get(w_key, ()) + ((w_id, w_intern(self.dct_tail[k_tail])),)
+            w_id += 1
+        
+        # compile the matcher
+        # [照合器をコンパイルする]
+        self.rule_count = w_id
+        self.matcher = AnchorMatcher(
+            list(self.rule_flat), 
+            {w_stem: dct_stem_grps[w_stem] for w_stem in sorted(dct_stem_grps)}, 
+            self.rule_ends)
         
-        # convert polite tone to assertive one
-        # [丁寧語（「です・ます」調）を断定語（「だ・である」調）に変換]
-        for k in self.dct_cnv:
-            self.clip_str = self.clip_str.replace(k, self.dct_cnv[k])
-            
-            if self.debug:
-                print(k + ' : ' + self.dct_cnv[k])
-            
         return(True)
     
-    def cnvCoditional(self):
+    def resolve(self, key):
         """
-            # convert a pattern following a specific letter into an assertion word
-            # [特定の一字に続くパターンを断定語に変換する]
+            (rule id, value) of the key, None if it is no key
+            [キーの（ルールID, 値）。キーでなければNone]
+            
+            The same key may come from several entries, as in the expanded dict 
+            it takes the position of the first entry and the value of the last one.
+            [同じキーが複数の項目から生じ得る。展開したdictと同じく、最初の項目の位置と最後の項目の値を取る。]
+        """
+        w_rule = self.rule_keys.get(key)
+        if w_rule is not None:
+            return(w_rule)
+        
+        w_entries = list(self.rule_flat.get(key, ()))
+        for i in range(len(key) + 1):
+            w_grps = self.rule_ends.get(key[i:], 0)
+            w_stem = key[:i]
+            if w_grps:
+                w_grps &= self.matcher.stemGroups(w_stem)
+            while w_grps:
+                # each group of the suffix, lowest bit first
+                # [接尾部の各グループ。下位ビットから]
+                w_low = w_grps & -w_grps
+                w_grps ^= w_low
+                g = w_low.bit_length() - 1
+                
+                (w_polite, w_assert) = self.rule_tables[self.grp_table[g]]
+                j = w_polite.index(key[i + len(self.grp_schg[g]):])
+                w_value = w_assert[j] if self.grp_chg[g] else w_stem + w_assert[j]
+                for n in range(self.grp_stems[g], self.grp_stems[g + 1]):
+                    if self.stem_buf[self.stem_offs[n]:self.stem_offs[n + 1]] == w_stem:
+                        w_pos = n - self.grp_stems[g]
+                        w_entries.append((self.grp_base[g] + w_pos * len(w_polite) + j, w_value))
+        if not w_entries:
+            return(None)
+        
+        w_rule = (min(w_entries)[0], max(w_entries)[1])
+        self.rule_keys[sys.intern(key)] = w_rule
+        return(w_rule)
+    
+    def ruleEntry(self, rule_id):
+        """
+            (source, group, key, value) of a rule id of cnvForced, the source is 'forced' 
+            (dct_fchg), 'stem' (dct_wgrp1, the group is its word) or 'tail' (dct_tail)
+            [cnvForcedのルールIDの（出所、グループ、キー、値）。出所は'forced'（dct_fchg）、
+             'stem'（dct_wgrp1。グループはその語）ないし'tail'（dct_tail）]
+        """
+        w_tail = self.rule_count - len(self.dct_tail)
+        if rule_id < len(self.dct_fchg):
+            (key, value) = list(self.dct_fchg.items())[rule_id]
+            return(('forced', None, key, value))
+        if rule_id >= w_tail:
+            (key, value) = list(self.dct_tail.items())[rule_id - w_tail]
+            return(('tail', None, key, value))
+        
+        # the stem and the polite ending of the id, as in resolve
+        # [IDの語幹と丁寧語尾。resolveと同様]
+        g = bisect.bisect_right(self.grp_base, rule_id) - 1
+        (w_polite, w_assert) = self.rule_tables[self.grp_table[g]]
+        (n, j) = divmod(rule_id - self.grp_base[g], len(w_polite))
+        n += self.grp_stems[g]
+        w_stem = self.stem_buf[self.stem_offs[n]:self.stem_offs[n + 1]]
+        w_value = w_assert[j] if self.grp_chg[g] else w_stem + w_assert[j]
+        w_group = [k for k in self.dct_wgrp1 if self.dct_wgrp1[k]['語幹']][g]
+        return(('stem', w_group, w_stem + self.grp_schg[g] + w_polite[j], w_value))
+    
+    def makeCondRules(self):
+        """
+            compile the kanji-conditional rules into one pattern
+            [漢字条件のルールを一つのパターンにコンパイルする]
+            
+            The particles are tried in the order of dct_wgrp2 and dct_wchg, 
+            and each is resolved to the assertive ending of its '漢字' table.
+            [助詞はdct_wgrp2とdct_wchgの順に照合し、各々を'漢字'の表の断定語尾に解決する。]
         """
+        # particle : assertive ending following the kanji
+        # [助詞 : 漢字に続く断定語尾]
+        dct_particle = {}
         
         for k_wgrp in self.dct_wgrp2:
             w_stem_lst = self.dct_wgrp2[k_wgrp]['語幹']
@@ -716,103 +2113,2852 @@ class CnvTone():
                 print('not specifid -{}'.format('漢字'))
                 return(False)
             w_endp2 = self.dct_wgrp2[k_wgrp]['漢字']['変化']
+            
+            # polite to assertive
+            if not w_endp in self.dct_wchg:
+                print('not specifid -{}'.format(w_endp))
+                return(False)
             if not w_endp2 in self.dct_wchg:
                 print('not specifid -{}'.format(w_endp2))
-                return (False)
-            
-            # 語幹が変わる場合
-            if '変語幹' in self.dct_wgrp2[k_wgrp]:
-                w_chg_stem = True
-            else:
-                w_chg_stem = False
+                return(False)
+            endp_dct = self.dct_wchg[w_endp]
+            endp_dct2 = self.dct_wchg[w_endp2]
             
             # extract the stem from the list
             # [リストより語幹を取り出す]
             for w_stem in w_stem_lst:
-                    
-                # extract polite change dict
-                # [丁寧語尾変化dictを取り出す]
-                
-                # polite to assertive
-                if not w_endp in self.dct_wchg:
-                    print('not specifid -{}'.format(w_endp))
-                    return(False)
-                else:
-                    endp_dct = self.dct_wchg[w_endp]
-                
-                # polite to assertive
-                if not w_endp2 in self.dct_wchg:
-                    print('not specifid -{}'.format(w_endp2))
-                    return(False)
-                else:
-                    endp_dct2 = self.dct_wchg[w_endp2]
                 
                 # take polite endings in order
                 # [丁寧語尾を順に取り出す]
                 for polite_end in endp_dct:
                     
-                    # extract the corresponding asserted endings
-                    # [丁寧語尾に対応する断定語尾を取り出す]
-                    assert_end = endp_dct[polite_end]
-                    
-                    # add to conversion dict
-                    # [変換dictに加える]
-                    # '語幹' + '語変' + '丁寧語尾' : '語幹'+'断定語尾'
-                    
-                    # 語幹が変わる場合
-                    if w_chg_stem:
-                        w_polite_end = w_stem + w_schg + polite_end
-                    else:
-                        w_polite_end = w_stem + w_schg + polite_end
-                    
-                    # pattern of particle following one word of kanji
-                    # [一語の漢字に続く助詞のパターン]
-                    w_pattern = re.compile('([\u4E00-\u9FD0])' + '(' + w_polite_end + ')')
-                    m_list = re.findall(w_pattern, self.clip_str)
-                    if (m_list):
-                        for m_item in m_list:
-                            (kanji, particle) = m_item
-                            polite_word = kanji + particle
-                            
-                            # register the target polite word in dict
-                            # [対象の丁寧語をdictに登録する]
-                            self.dct_cnv2[polite_word] = kanji + endp_dct2[polite_end]
-                    
-            # convert polite tone to assertive one
-            # [丁寧語（「です・ます」調）を断定語（「だ・である」調）に変換]
-            for k in self.dct_cnv2:
-                self.clip_str = self.clip_str.replace(k, self.dct_cnv2[k])
-            
-                if self.debug:
-                    print(k + ' : ' + self.dct_cnv2[k])
-                    
-                        
+                    # '語幹' + '語変' + '丁寧語尾' : '漢字'の断定語尾
+                    dct_particle[w_stem + w_schg + polite_end] = endp_dct2[polite_end]
+        
+        if dct_particle:
+            self.cond_pattern = re.compile('([\u4E00-\u9FD0])(' + '|'.join(map(re.escape, dct_particle)) + ')')
+        self.dct_cnv2 = dct_particle
         return(True)
     
-    def cnvTone(self):
+    def makeHitPattern(self):
         """
-            convert polite tone to assertive one
-            [丁寧語（「です・ます」調）を断定語（「だ・である」調）に変換]
+            pattern of the UTF-8 bytes of the markers and the kanji-conditional particles, 
+            every match of a rule contains one of them, and the longest in bytes
+            [目印と漢字条件の助詞のUTF-8バイト列のパターン（全てのルールの一致はそのいずれかを含む）、
+             及びその最長のバイト数]
+        """
+        w_hits = sorted({w.encode('utf-8') for w in self.matcher.markers} 
+                        | {w.encode('utf-8') for w in self.dct_cnv2}, key=len, reverse=True)
+        return((re.compile(self.trieRegex(w_hits)), len(w_hits[0])))
+    
+    @staticmethod
+    def trieRegex(words):
+        """
+            regular expression of the strings (or the byte strings) with their common 
+            prefixes factored, it matches the longest word at a position
+            [共通の接頭部を括り出した文字列（ないしバイト列）の正規表現。ある位置で最長の語に一致する]
+            
+            A plain alternation is tried word by word at every position, 
+            the factored one byte by byte (about 4 times faster on UTF-8).
+            [単純な選択は各位置で語毎に試すが、括り出したものはバイト毎に試す（UTF-8で約4倍速い）。]
+        """
+        words = list(words)
+        if words and isinstance(words[0], bytes):
+            # one character per byte
+            # [一バイトを一文字として]
+            return(ToneRules.trieRegex([w.decode('latin-1') for w in words]).encode('latin-1'))
+        
+        w_trie = {}
+        for w in words:
+            node = w_trie
+            for ch in w:
+                node = node.setdefault(ch, {})
+            node[None] = None
+        
+        def expr(node):
+            w_alts = [re.escape(ch) + expr(node[ch]) 
+                      for ch in sorted(k for k in node if k is not None)]
+            if not w_alts:
+                return('')
+            if len(w_alts) == 1 and None not in node:
+                return(w_alts[0])
+            return('(?:' + '|'.join(w_alts) + (')?' if None in node else ')'))
+        
+        return(expr(w_trie))
+    
+    def makeStopChrs(self):
+        """
+            characters that are in no key, nor in the kanji-conditional patterns
+            [どのキーにも漢字条件パターンにも含まれない文字]
         """
+        w_chrs = set(''.join(self.rule_flat))
+        for k_wgrp in self.dct_wgrp1:
+            w_chrs.update(''.join(self.dct_wgrp1[k_wgrp]['語幹']))
+            w_chrs.update(self.dct_wgrp1[k_wgrp]['語変'])
+        for k_wgrp in self.dct_wgrp2:
+            w_chrs.update(''.join(self.dct_wgrp2[k_wgrp]['語幹']))
+            w_chrs.update(self.dct_wgrp2[k_wgrp]['語変'])
+        for w_endp in self.dct_wchg:
+            w_chrs.update(''.join(self.dct_wchg[w_endp]))
+        return(frozenset(w_chrs))
+
+
+class UserOverlay():
+    """
+        user dictionaries layered over the built-in rules, reloaded when a file changes.
+        [組み込みルールの上に重ねるユーザー辞書。ファイルが変われば読み直す。]
+        
+        A file has one entry per line, the key and its replacement separated by
+        a tab, lines starting with # are comments. An entry of a later file takes
+        precedence over the same key of an earlier one, and the keys over the
+        built-in rules: the leftmost longest key is replaced as it is, its value
+        is not converted again, and the text between the keys is converted by
+        the built-in rules (see ToneConverter.cnvOverlay). An entry whose value
+        is its key keeps the text unconverted.
+        [ファイルは一行に一項目で、キーと置換後の文字列をタブで区切る。#で始まる行は
+         コメントとする。後のファイルの項目は前のファイルの同じキーに、キーは組み込みルールに
+         優先する。最も左の最長のキーをそのまま置き換え、その値は再変換しない。キーの間の
+         テキストは組み込みルールで変換する（ToneConverter.cnvOverlay参照）。
+         値がキーと同じ項目はテキストを変換せずに残す。]
+        
+        Only the overlay is compiled, into one regular expression of its keys,
+        the rules of ToneRules are neither rebuilt nor reloaded. The files are
+        checked at most every CHECK_INTERVAL seconds, and a changed overlay
+        replaces the compiled one as a whole.
+        [オーバーレイのみをそのキーの一つの正規表現にコンパイルし、ToneRulesのルールは
+         再構築も再読み込みもしない。ファイルは高々CHECK_INTERVAL秒毎に調べ、変更された
+         オーバーレイはコンパイル結果を丸ごと置き換える。]
+    """
+    
+    # seconds between the checks of the files
+    # [ファイルを調べる間隔（秒）]
+    CHECK_INTERVAL = 0.005
+    
+    def __init__(self, paths):
+        """
+            load the overlay files, later ones take precedence
+            [オーバーレイのファイルを読み込む。後のものが優先する]
+        """
+        self.paths = tuple(paths)
+        self.lock = threading.Lock()
+        self.checked = time.monotonic()
+        self.stamps = self.fileStamps()
+        
+        # (pattern of the keys or None, {key: (rule id, value)}, characters of the keys)
+        # [（キーのパターンないしNone, {キー: (ルールID, 値)}, キーの文字）]
+        self.state = self.load()
+    
+    def fileStamps(self):
+        """
+            (modification time, size, inode) of each file, None if it is missing
+            [各ファイルの（更新時刻, サイズ, iノード）。無ければNone]
+        """
+        w_stamps = []
+        for w_path in self.paths:
+            try:
+                st = os.stat(w_path)
+            except OSError:
+                w_stamps.append(None)
+                continue
+            w_stamps.append((st.st_mtime_ns, st.st_size, st.st_ino))
+        return(tuple(w_stamps))
+    
+    def load(self):
+        """
+            parse and compile the files, raises OSError or ValueError
+            [ファイルを解析してコンパイルする。OSErrorないしValueErrorを送出する]
+        """
+        dct_entries = {}
+        for w_path in self.paths:
+            with open(w_path, encoding='utf-8') as f:
+                for (n, w_line) in enumerate(f, 1):
+                    w_line = w_line.rstrip('\r\n')
+                    if not w_line.strip() or w_line.lstrip().startswith('#'):
+                        continue
+                    (key, w_tab, value) = w_line.partition('\t')
+                    if not w_tab or not key:
+                        raise ValueError('{}:{}: expected a key and its replacement separated by a tab'
+                                         .format(w_path, n))
+                    
+                    # the sentence ends stay stop characters (see ToneConverter.isStop)
+                    # [文の終わりは区切り文字のままとする（ToneConverter.isStop参照）]
+                    for ch in IncrementalConverter.SEGMENT_ENDS:
+                        if ch in key:
+                            raise ValueError('{}:{}: {!r} in the key'.format(w_path, n, ch))
+                    dct_entries[key] = value
+        if not dct_entries:
+            return((None, {}, frozenset()))
         
-        # forcibly convert tones with a certain vocabulary pattern
-        if not self.cnvForced():
+        w_pattern = re.compile(ToneRules.trieRegex(dct_entries))
+        dct_rules = {key: (rule_id, dct_entries[key]) for (rule_id, key) in enumerate(dct_entries)}
+        return((w_pattern, dct_rules, frozenset(''.join(dct_entries))))
+    
+    def refresh(self):
+        """
+            reload the files if one has changed, returns whether reloaded
+            [ファイルが変更されていれば読み直し、読み直したかを返す]
+            
+            A file that can not be loaded keeps the previous overlay,
+            the error is reported once per change.
+            [読み込めないファイルは前のオーバーレイを残し、エラーは変更毎に一度報告する。]
+        """
+        w_now = time.monotonic()
+        if w_now - self.checked < self.CHECK_INTERVAL:
             return(False)
         
-        # convert a pattern following a specific letter into an assertion word
-        if not self.cnvCoditional():
+        # another thread is checking, the current overlay is used meanwhile
+        # [別のスレッドが調べている。その間は現在のオーバーレイを使う]
+        if not self.lock.acquire(blocking=False):
             return(False)
+        try:
+            self.checked = w_now
+            w_stamps = self.fileStamps()
+            if w_stamps == self.stamps:
+                return(False)
+            self.stamps = w_stamps
+            try:
+                self.state = self.load()
+            except (OSError, ValueError) as e:
+                print('{}, the previous overlay is kept'.format(e), file=sys.stderr)
+                return(False)
+            return(True)
+        finally:
+            self.lock.release()
+    
+    def current(self):
+        """
+            the compiled overlay, reloaded if a file has changed
+            [コンパイルしたオーバーレイ。ファイルが変更されていれば読み直す]
+        """
+        self.refresh()
+        return(self.state)
+
+
+class ToneConverter():
+    """
+        convert polite tone to assertive one, without the clipboard.
+        [クリップボードを使わずに、丁寧語調を断定語調に変換する。]
         
-        # past result of the tone conversion to clip board
-        self.clip_board.set(self.clip_str)
+        Build once, then call convert(text) many times. The converter holds 
+        only the shared rules, so calls are safe from multiple threads.
+        [一度構築し、convert(text)を何度も呼ぶ。変換器は共有ルールのみを保持するので、
+         複数スレッドから呼んでも安全である。]
+    """
+    
+    def __init__(self, rules=None, tracer=None, counter=None, metrics=None, cache=None, 
+                 overlay=None):
+        """
+            the shared rules are used if omitted, tracer is a Tracer or None, 
+            counter is a HitCounter of the same rules or None, metrics is a Metrics or None, 
+            cache is a SentenceCache or None, overlay is a UserOverlay or None
+            [ルールの指定が無ければ共有ルールを使う。tracerはTracerないしNone、
+             counterは同じルールのHitCounterないしNone、metricsはMetricsないしNone、
+             cacheはSentenceCacheないしNone、overlayはUserOverlayないしNone]
+        """
+        self.rules = rules.build() if rules is not None else ToneRules.shared()
+        self.tracer = tracer
+        self.counter = counter
+        self.metrics = metrics
+        self.cache = cache
+        self.overlay = overlay
+        
+        # converted field values of cnvRecords, cleared over VALUE_MEMO values 
+        # or when the overlay is reloaded
+        # [cnvRecordsの変換済みのフィールド値。VALUE_MEMO個を超えるか、オーバーレイを読み直すと消去する]
+        self.values = {}
+        self.values_overlay = None
+        if cache is not None:
+            for ch in IncrementalConverter.SEGMENT_ENDS:
+                if not self.isStop(ch):
+                    raise ValueError('sentence end is in a rule: {!r}'.format(ch))
+    
+    def convert(self, text, base=0, edits=None):
+        """
+            convert polite tone to assertive one, base is the offset of the text for the tracer, 
+            edits is an EditLog of the text that collects the edits, or None
+            [丁寧語（「です・ます」調）を断定語（「だ・である」調）に変換。baseはトレース用のテキストの位置、
+             editsは編集を集めるテキストのEditLog、ないしNone]
+        """
+        if self.overlay is not None:
+            (w_pattern, dct_rules, w_chars) = self.overlay.current()
+            if w_pattern is not None:
+                return(self.cnvOverlay(text, base, edits, w_pattern, dct_rules))
+        return(self.cnvRules(text, base, edits))
+    
+    def cnvRules(self, text, base=0, edits=None):
+        """
+            convert by the built-in rules only, as convert
+            [組み込みルールのみで変換する。convertと同様]
+        """
+        if edits is None and self.tracer is not None:
+            # the tracer maps its offsets to the source through the edits
+            # [トレーサーは編集を通して位置をソース上に対応付ける]
+            edits = EditLog(text)
+        if edits is not None:
+            return(self.cnvEdits(text, base, edits))
+        if self.cache is not None and self.tracer is None and self.counter is None:
+            return(self.cnvCached(text))
+        return(self.cnvCoditional(self.cnvForced(text, base), base))
+    
+    def cnvOverlay(self, text, base, edits, pattern, rules):
+        """
+            replace the keys of the user overlay, and convert the text between them 
+            by the built-in rules, pattern and rules are of UserOverlay.current()
+            [ユーザーオーバーレイのキーを置き換え、その間のテキストを組み込みルールで変換する。
+             patternとrulesはUserOverlay.current()のもの]
+            
+            The text between two keys converts on its own, as if the keys were 
+            stop characters (see isStop). The hits of the overlay are traced 
+            and edited as phase 'overlay', they are not counted.
+            [二つのキーの間のテキストは、キーが区切り文字であるかのように単独で変換する
+             （isStop参照）。オーバーレイの一致はフェーズ'overlay'としてトレースし、編集に
+             記録するが、数えない。]
+        """
+        w_matches = list(pattern.finditer(text))
+        if not w_matches:
+            return(self.cnvRules(text, base, edits))
+        
+        if self.tracer is not None:
+            # key : offsets, in the order of the rules
+            # [キー : 位置。ルールの順]
+            dct_hits = {}
+            for m in w_matches:
+                dct_hits.setdefault(m.group(), []).append(base + m.start())
+            for key in sorted(dct_hits, key=lambda k: rules[k][0]):
+                (rule_id, value) = rules[key]
+                self.tracer.rule('overlay', rule_id, key, value, dct_hits[key])
+        
+        w_parts = []
+        pos = 0
+        for m in w_matches + [None]:
+            end = m.start() if m is not None else len(text)
+            if end > pos:
+                # the text before the key
+                # [キーの前のテキスト]
+                w_gap = text[pos:end]
+                if edits is None:
+                    w_parts.append(self.cnvRules(w_gap, base + pos))
+                else:
+                    w_edits = EditLog(w_gap)
+                    w_parts.append(self.cnvRules(w_gap, base + pos, w_edits))
+                    edits.extend(w_edits, pos)
+            if m is None:
+                break
+            
+            key = m.group()
+            (rule_id, value) = rules[key]
+            w_parts.append(value)
+            if edits is not None and value != key:
+                w_edits = EditLog(key)
+                w_edits.apply(key, [(0, len(key), value, ('overlay', rule_id))])
+                edits.extend(w_edits, end)
+            pos = m.end()
+        return(''.join(w_parts))
+    
+    def cnvCached(self, text):
+        """
+            convert sentence by sentence through the SentenceCache
+            [SentenceCacheを通して文毎に変換する]
+            
+            The sentences end with stop characters (see isStop), so they convert 
+            independently. Without a tracer and a counter only, as the rules of 
+            the cached sentences do not fire.
+            [文は区切り文字（isStop参照）で終わるので独立に変換される。キャッシュした文の
+             ルールは適用されないので、トレーサーとカウンターが無い場合のみ。]
+        """
+        cache = self.cache
+        w_segments = cache.segment_re.findall(text)
+        w_hash = self.rules.ruleHash()
+        dct_found = cache.lookup(w_hash, {seg for seg in w_segments if len(seg) >= cache.MIN_LEN})
+        
+        w_parts = []
+        dct_new = {}
+        for seg in w_segments:
+            w_seg = dct_found.get(seg)
+            if w_seg is None:
+                w_seg = self.cnvCoditional(self.cnvForced(seg))
+                if len(seg) >= cache.MIN_LEN:
+                    dct_found[seg] = dct_new[seg] = w_seg
+            w_parts.append(w_seg)
+        cache.store(w_hash, dct_new)
+        return(''.join(w_parts))
+    
+    def cnvEdits(self, text, base, edits, piece_size=1 << 8):
+        """
+            convert and collect the edits into edits, piece by piece cut after stop characters
+            [変換し、編集をeditsに集める。区切り文字の後で切った断片毎に行う]
+            
+            EditLog.apply costs the number of edits so far per rule, so the text 
+            is converted in pieces (see isStop) of about piece_size characters.
+            [EditLog.applyはルール毎にそれまでの編集数の費用が掛かるので、テキストは
+             約piece_size文字の断片（isStop参照）毎に変換する。]
+        """
+        w_parts = []
+        start = 0
+        while start < len(text):
+            cut = min(start + piece_size, len(text))
+            while start < cut < len(text) and not self.isStop(text[cut - 1]):
+                cut -= 1
+            if cut == start:
+                cut = start + piece_size
+                while cut < len(text) and not self.isStop(text[cut - 1]):
+                    cut += 1
+            piece = text[start:cut]
+            w_edits = EditLog(piece)
+            w_parts.append(self.cnvCoditional(self.cnvForced(piece, base + start, w_edits), 
+                                              base + start, w_edits))
+            edits.extend(w_edits, start)
+            start = cut
+        return(''.join(w_parts))
+    
+    def cnvForced(self, text, base=0, edits=None):
+        """
+            forcibly convert tones with a certain vocabulary pattern
+            [一定の語彙パターンでトーンを強制的に変換する]
+            
+            No rule matches across a stop character (see isStop), so the rules 
+            are applied only to the pieces of the text around the polite markers 
+            (see cutPiece), and the text between them is copied as it is. 
+            With edits, the text is taken as one piece (see cnvEdits).
+            [ルールは区切り文字（isStop参照）を跨いで一致しないので、ルールは丁寧語の目印の
+             周りの断片（cutPiece参照）のみに適用し、その間のテキストはそのまま写す。
+             editsがあればテキストを一つの断片とする（cnvEdits参照）。]
+        """
+        w_mark = self.metrics.start() if self.metrics is not None else None
+        w_size = len(text)
+        
+        # rule id : replacements, for the counter
+        # [ルールID : 置換回数。カウンタ用]
+        w_hits = {} if self.counter is not None else None
+        
+        # window : keys of the windows scanned again, the same words recur over the pieces
+        # [再走査した窓 : そのキー。同じ語は断片を越えて繰り返す]
+        w_windows = {}
+        
+        if edits is not None:
+            text = self.cnvPiece(text, base, edits, w_hits, w_windows)
+        else:
+            w_parts = []
+            pos = 0
+            for m in self.rules.matcher.pattern.finditer(text):
+                if m.start() < pos:
+                    continue
+                (start, end) = self.cutPiece(text, pos, m.start(), m.end())
+                w_parts.append(text[pos:start])
+                w_parts.append(self.cnvPiece(text[start:end], base + start, None, w_hits, w_windows))
+                pos = end
+            w_parts.append(text[pos:])
+            text = ''.join(w_parts)
+        
+        if w_hits:
+            self.counter.add('forced', w_hits)
+        if w_mark is not None:
+            self.metrics.stop(w_mark, 'cnvForced', w_size)
+        return(text)
+    
+    def cutPiece(self, text, low, start, end, piece_size=1 << 10):
+        """
+            (start, end) of the piece of the text around text[start:end], cut after 
+            stop characters, not before low, of about piece_size characters
+            [text[start:end]の周りのテキストの断片の（開始, 終了）。区切り文字の後で切り、
+             lowより前にはせず、約piece_size文字とする]
+        """
+        while start > low and not self.isStop(text[start - 1]):
+            start -= 1
+        end = min(max(end, start + piece_size), len(text))
+        while end < len(text) and not self.isStop(text[end - 1]):
+            end += 1
+        return((start, end))
+    
+    # windows whose keys cnvForced keeps during a conversion
+    # [cnvForcedが一回の変換の間キーを保持する窓の数]
+    WINDOW_MEMO = 1 << 16
+    
+    def cnvPiece(self, text, base, edits, hits, windows):
+        """
+            apply the rules to a piece of the text in the order of the conversion dict, 
+            the same as replacing every key in turn, hits is {rule id: replacements} or None, 
+            windows is {window: keys} of the windows scanned again
+            [テキストの断片に変換dictの順にルールを適用する。全キーを順に置き換えた場合と
+             同じ結果となる。hitsは{ルールID: 置換回数}ないしNone、windowsは再走査した窓の{窓: キー}]
+            
+            Only the rules found by the matcher are applied. A replacement can 
+            create a key of a later rule, so the text around each inserted value 
+            is scanned again.
+            [照合器が見つけたルールのみを適用する。置換により後続ルールのキーが
+             生じ得るので、挿入した値の周辺を再走査する。]
+        """
+        rules = self.rules
+        matcher = rules.matcher
+        margin = matcher.max_len - 1
+        
+        # rule id : (key, value) of the rules found
+        # [ルールID : 見つけたルールの(キー, 値)]
+        found = {}
+        for key in matcher.findKeys(text):
+            w_rule = rules.resolve(key)
+            if w_rule is not None:
+                found[w_rule[0]] = (key, w_rule[1])
+        pending = list(found)
+        heapq.heapify(pending)
+        
+        while pending:
+            rule_id = heapq.heappop(pending)
+            (k, v) = found[rule_id]
+            parts = text.split(k)
+            if len(parts) == 1:
+                continue
+            if hits is not None:
+                hits[rule_id] = hits.get(rule_id, 0) + len(parts) - 1
+            
+            if self.tracer is not None or edits is not None:
+                w_offsets = []
+                pos = 0
+                for part in parts[:-1]:
+                    pos += len(part)
+                    w_offsets.append(pos)
+                    pos += len(k)
+                if self.tracer is not None:
+                    w_traced = edits.sourceOffsets(w_offsets) if edits is not None else w_offsets
+                    self.tracer.rule('forced', rule_id, k, v, [base + w for w in w_traced])
+                if edits is not None:
+                    w_rule = ('forced', rule_id)
+                    edits.apply(text, [(w, len(k), v, w_rule) for w in w_offsets])
+            
+            text = v.join(parts)
+            
+            # rules that the inserted values may have created
+            # [挿入した値により生じ得るルール]
+            scanned = set()
+            pos = 0
+            for part in parts[:-1]:
+                pos += len(part)
+                window = text[max(pos - margin, 0):pos + len(v) + margin]
+                pos += len(v)
+                if window in scanned:
+                    continue
+                scanned.add(window)
+                w_keys = windows.get(window)
+                if w_keys is None:
+                    if len(windows) >= self.WINDOW_MEMO:
+                        windows.clear()
+                    w_keys = windows[window] = matcher.findKeys(window)
+                for key in w_keys:
+                    w_rule = rules.resolve(key)
+                    if w_rule is not None and w_rule[0] > rule_id and w_rule[0] not in found:
+                        found[w_rule[0]] = (key, w_rule[1])
+                        heapq.heappush(pending, w_rule[0])
+        return(text)
+    
+    def cnvCoditional(self, text, base=0, edits=None):
+        """
+            # convert a pattern following a specific letter into an assertion word
+            # [特定の一字に続くパターンを断定語に変換する]
+        """
+        # pattern of particle following one word of kanji, compiled once
+        # [一語の漢字に続く助詞のパターン。一度だけコンパイルする]
+        w_pattern = self.rules.cond_pattern
+        if w_pattern is None:
+            return(text)
+        w_mark = self.metrics.start() if self.metrics is not None else None
+        w_size = len(text)
+        
+        # convert polite tone to assertive one by the pattern
+        # [丁寧語（「です・ます」調）を断定語（「だ・である」調）にパターンで変換]
+        dct_cnv2 = self.rules.dct_cnv2
+        
+        if self.tracer is None and self.counter is None and edits is None:
+            def cnvMatch(m):
+                (kanji, particle) = m.groups()
+                return(kanji + dct_cnv2[particle])
+        else:
+            # offsets of the matches by particle, and the matches for the edits
+            # [助詞毎の一致位置、及び編集用の一致]
+            dct_hits = {}
+            w_matches = []
+            dct_ids = {particle: rule_id for (rule_id, particle) in enumerate(dct_cnv2)}
+            
+            def cnvMatch(m):
+                (kanji, particle) = m.groups()
+                dct_hits.setdefault(particle, []).append(m.start())
+                w_matches.append((m.start(2), len(particle), dct_cnv2[particle], 
+                                  ('conditional', dct_ids[particle])))
+                return(kanji + dct_cnv2[particle])
+        
+        w_source = text
+        text = w_pattern.sub(cnvMatch, text)
+        
+        if self.tracer is not None:
+            for (rule_id, particle) in enumerate(dct_cnv2):
+                if particle in dct_hits:
+                    w_traced = dct_hits[particle]
+                    if edits is not None:
+                        w_traced = edits.sourceOffsets(w_traced)
+                    self.tracer.rule('conditional', rule_id, particle, 
+                                     dct_cnv2[particle], [base + w for w in w_traced])
+        if edits is not None and w_matches:
+            edits.apply(w_source, w_matches)
+        if self.counter is not None and dct_hits:
+            self.counter.add('conditional', {rule_id: len(dct_hits[particle]) 
+                                             for (rule_id, particle) in enumerate(dct_cnv2) 
+                                             if particle in dct_hits})
+        if w_mark is not None:
+            self.metrics.stop(w_mark, 'cnvCoditional', w_size)
+        
+        return(text)
+    
+    def isStop(self, ch):
+        """
+            whether no rule can match across this character
+            [この文字を跨いで一致するルールが無いか]
+            
+            A character that is in no key (of the rules or the overlay), nor in the 
+            kanji-conditional patterns, is never created nor removed by a conversion, 
+            so the text on either side of it converts independently.
+            [（ルールないしオーバーレイの）どのキーにも漢字条件パターンにも含まれない文字は
+             変換で生成も削除もされないので、
+             その前後のテキストは独立に変換される。]
+        """
+        return(ch not in self.rules.stop_chrs and not '\u4E00' <= ch <= '\u9FD0' 
+               and (self.overlay is None or ch not in self.overlay.state[2]))
+    
+    def cnvStream(self, f_in, f_out, chunk_size=1 << 16):
+        """
+            convert a text stream chunk by chunk, the result equals convert of the whole
+            [テキストストリームをチャンク毎に変換する。結果は全体をconvertした場合と等しい]
+            
+            Each chunk is cut after its last stop character (see isStop), 
+            the rest is carried over to the next chunk (see cutChunks for the limit).
+            [各チャンクは最後の区切り文字（isStop参照）の後で切り、残りを次のチャンクに持ち越す
+             （上限はcutChunks参照）。]
+        """
+        for (text, w_base) in self.cutChunks(f_in, chunk_size):
+            text = self.convert(text, w_base)
+            w_mark = self.metrics.start() if self.metrics is not None else None
+            f_out.write(text)
+            if w_mark is not None:
+                self.metrics.stop(w_mark, 'write', len(text))
+        return(True)
+    
+    def cutChunks(self, f_in, chunk_size, max_carry=1 << 24):
+        """
+            (text, offset) of the chunks of a text stream, each cut after its last stop character
+            [テキストストリームのチャンクの（テキスト、位置）。各チャンクは最後の区切り文字の後で切る]
+            
+            The chunks convert independently (see isStop), the last one may be empty.
+            The carry-over is at most max_carry characters: a text without a stop 
+            character that grows past it is cut there, and a rule matching across 
+            that cut is not applied, so only then the result differs from convert 
+            of the whole.
+            [チャンクは独立に変換される（isStop参照）。最後のチャンクは空の場合がある。
+             持ち越しは高々max_carry文字で、区切り文字の無いテキストがそれを超えればそこで切り、
+             その切れ目を跨いで一致するルールは適用しない。結果が全体をconvertした場合と
+             異なるのはその場合のみである。]
+        """
+        carry = ''
+        w_base = 0
+        while True:
+            w_mark = self.metrics.start() if self.metrics is not None else None
+            chunk = f_in.read(chunk_size)
+            if w_mark is not None:
+                self.metrics.stop(w_mark, 'read', len(chunk))
+            if not chunk:
+                break
+            text = carry + chunk
+            
+            # cut after the last stop character, the carry has none
+            # [最後の区切り文字の後で切る。持ち越し分には無い]
+            cut = len(text)
+            while cut > len(carry) and not self.isStop(text[cut - 1]):
+                cut -= 1
+            if cut == len(carry):
+                if len(text) < max_carry:
+                    carry = text
+                    continue
+                cut = len(text)
+            
+            yield((text[:cut], w_base))
+            carry = text[cut:]
+            w_base += cut
+        
+        yield((carry, w_base))
+    
+    def cnvParallel(self, f_in, f_out, jobs=None, chunk_size=1 << 20):
+        """
+            convert a text stream on jobs workers (default: all CPUs), the result equals convert of the whole
+            [テキストストリームをjobs個のワーカー（既定: 全CPU）で変換する。結果は全体をconvertした場合と等しい]
+            
+            The chunks of cutChunks are converted on a process pool, or on a 
+            thread pool when the GIL is disabled (free-threaded CPython) or the 
+            rules are not the shared ones, and written in order. At most two 
+            chunks per worker are read ahead.
+            [cutChunksのチャンクをプロセスプール（GILが無効（フリースレッドのCPython）、
+             ないしルールが共有ルールでない場合はスレッドプール）で変換し、順に書き出す。
+             先読みするのはワーカー毎に最大二チャンクとする。]
+        """
+        jobs = jobs or os.cpu_count() or 1
+        if jobs == 1:
+            return(self.cnvStream(f_in, f_out, chunk_size))
         
+        (pool, submit) = self.workerPool(jobs, self.convert, batchChunk)
+        with pool:
+            pending = collections.deque()
+            for (text, w_base) in self.cutChunks(f_in, chunk_size):
+                pending.append(submit(text, w_base))
+                if len(pending) >= 2 * jobs:
+                    f_out.write(self.mergeCounts(pending.popleft().get()))
+            while pending:
+                f_out.write(self.mergeCounts(pending.popleft().get()))
         return(True)
-
-
-if __name__ == '__main__':
-
-    cnv_tone = CnvTone()                                # convert tone
-    if cnv_tone.cnvTone():
-        exit(0)
-    else:
-        exit(1)
\ No newline at end of file
+    
+    def workerPool(self, jobs, local, remote):
+        """
+            (pool, submit) of jobs workers, submit(*args) calls local(*args) on a thread 
+            pool when the GIL is disabled (free-threaded CPython) or the rules are not 
+            the shared ones, otherwise remote((*args, source of the tracer)) on a 
+            process pool, and returns the AsyncResult of (result, batchCounts())
+            [jobs個のワーカーの（プール, submit）。submit(*args)は、GILが無効（フリースレッドの
+             CPython）ないしルールが共有ルールでない場合はスレッドプールでlocal(*args)を、
+             それ以外はプロセスプールでremote((*args, トレーサーのソース))を呼び、
+             （結果, batchCounts()）のAsyncResultを返す]
+        """
+        import multiprocessing.pool
+        
+        w_threads = (not getattr(sys, '_is_gil_enabled', lambda: True)() 
+                     or self.rules is not _shared_rules)
+        if w_threads:
+            pool = multiprocessing.pool.ThreadPool(jobs)
+            def submit(*args):
+                return(pool.apply_async(lambda: (local(*args), (None, None))))
+        else:
+            # the workers load the rules from the rule cache
+            # [ワーカーはルールキャッシュからルールを読み込む]
+            w_trace = self.tracer.path if self.tracer is not None else None
+            w_source = self.tracer.source if self.tracer is not None else None
+            w_cache = (self.cache.path, self.cache.max_bytes) if self.cache is not None else None
+            w_overlay = self.overlay.paths if self.overlay is not None else None
+            pool = multiprocessing.Pool(jobs, initializer=batchInit, 
+                                        initargs=(w_trace, self.counter is not None, 
+                                                  self.metrics is not None, w_cache, w_overlay))
+            def submit(*args):
+                return(pool.apply_async(remote, (args + (w_source,),)))
+        return((pool, submit))
+    
+    def mergeCounts(self, result):
+        """
+            add the counts of a worker to the counter and the metrics, returns its result
+            [ワーカーの計数をカウンターとメトリクスに加え、その結果を返す]
+        """
+        (w_result, (hits, metrics)) = result
+        if hits is not None:
+            self.counter.merge(hits)
+        if metrics is not None:
+            self.metrics.merge(metrics)
+        return(w_result)
+    
+    def cnvJsonl(self, f_in, f_out, fields, jobs=1, batch_size=1 << 20):
+        """
+            convert the fields of the records of a JSON Lines stream on jobs workers 
+            (0 or None: all CPUs), fields are paths of keys, e.g. [('text',), ('meta', 'title')]
+            [JSON Linesストリームのレコードのフィールドをjobs個のワーカー（0ないしNone: 全CPU）で変換する。
+             fieldsはキーのパス。例 [('text',), ('meta', 'title')]]
+            
+            The records are read in batches of about batch_size characters, 
+            converted by cnvRecords on the workers and written in order. 
+            At most two batches per worker are read ahead.
+            [レコードは約batch_size文字のバッチ毎に読み、ワーカーでcnvRecordsにより変換して
+             順に書き出す。先読みするのはワーカー毎に最大二バッチとする。]
+        """
+        jobs = jobs if jobs is not None and jobs >= 0 else 1
+        jobs = jobs or os.cpu_count() or 1
+        
+        def batches():
+            # batches of whole lines, with the number of their first line
+            # [行単位のバッチ、及びその最初の行番号]
+            w_line = 1
+            while True:
+                w_mark = self.metrics.start() if self.metrics is not None else None
+                lines = f_in.readlines(batch_size)
+                if w_mark is not None:
+                    self.metrics.stop(w_mark, 'read', sum(map(len, lines)))
+                if not lines:
+                    break
+                yield((lines, w_line))
+                w_line += len(lines)
+        
+        def write(lines):
+            w_mark = self.metrics.start() if self.metrics is not None else None
+            f_out.writelines(lines)
+            if w_mark is not None:
+                self.metrics.stop(w_mark, 'write', sum(map(len, lines)))
+        
+        if jobs == 1:
+            for (lines, w_line) in batches():
+                write(self.cnvRecords(lines, fields, w_line))
+            return(True)
+        
+        (pool, submit) = self.workerPool(jobs, self.cnvRecords, batchRecords)
+        with pool:
+            pending = collections.deque()
+            for (lines, w_line) in batches():
+                pending.append(submit(lines, fields, w_line))
+                if len(pending) >= 2 * jobs:
+                    write(self.mergeCounts(pending.popleft().get()))
+            while pending:
+                write(self.mergeCounts(pending.popleft().get()))
+        return(True)
+    
+    # field values kept converted by cnvRecords
+    # [cnvRecordsが変換済みで保持するフィールド値の数]
+    VALUE_MEMO = 1 << 16
+    
+    def cnvRecords(self, lines, fields, line=1):
+        """
+            convert the fields of JSON Lines records, returns the lines, 
+            line is the number of the first line for the errors
+            [JSON Linesのレコードのフィールドを変換し、行を返す。lineはエラー用の最初の行番号]
+            
+            The string values of the fields (or the strings of a list value) 
+            are converted one by one, the results of recent values are reused. 
+            A record whose values are unchanged is written as it was read, 
+            a changed one as compact JSON, without spaces after the separators. 
+            Blank lines are kept.
+            [フィールドの文字列値（ないしリスト値の文字列）は一つずつ変換し、最近の値の結果は
+             再利用する。値が変わらないレコードは読んだまま、変わったものは区切りの後に空白の無い
+             簡潔なJSONで書き出す。空行はそのまま残す。]
+        """
+        # (record, [(container, key), ...]) of the lines, None for blank lines
+        # [各行の（レコード, [(コンテナ, キー), ...]）。空行はNone]
+        w_records = []
+        w_values = []
+        w_decode = json.JSONDecoder().decode
+        for (n, w_text) in enumerate(lines):
+            if not w_text.strip():
+                w_records.append(None)
+                continue
+            try:
+                record = w_decode(w_text)
+            except ValueError as e:
+                raise ValueError('line {}: {}'.format(line + n, e)) from None
+            w_slots = []
+            for w_path in fields:
+                w_obj = record
+                for k in w_path[:-1]:
+                    w_obj = w_obj.get(k) if isinstance(w_obj, dict) else None
+                if not isinstance(w_obj, dict):
+                    continue
+                w_value = w_obj.get(w_path[-1])
+                if isinstance(w_value, str):
+                    w_slots.append((w_obj, w_path[-1]))
+                    w_values.append(w_value)
+                elif isinstance(w_value, list):
+                    for (i, w_item) in enumerate(w_value):
+                        if isinstance(w_item, str):
+                            w_slots.append((w_value, i))
+                            w_values.append(w_item)
+            w_records.append((record, w_slots))
+        
+        # a text joined from the values converts slower, as every rule found 
+        # splits the whole of it
+        # [値を繋いだテキストは見つけた各ルールがその全体を分割するので、変換が遅い]
+        # reused without a tracer and a counter only, as the rules of a reused value do not fire
+        # [再利用した値のルールは適用されないので、トレーサーとカウンターが無い場合のみ再利用する]
+        w_overlay = self.overlay.current() if self.overlay is not None else None
+        if self.tracer is not None or self.counter is not None:
+            dct_values = {}
+        elif len(self.values) > self.VALUE_MEMO or self.values_overlay is not w_overlay:
+            dct_values = self.values = {}
+            self.values_overlay = w_overlay
+        else:
+            dct_values = self.values
+        w_results = []
+        for w_value in w_values:
+            w_result = dct_values.get(w_value)
+            if w_result is None:
+                w_result = dct_values[w_value] = self.convert(w_value)
+            w_results.append(w_result)
+        
+        w_encode = json.JSONEncoder(ensure_ascii=False, separators=(',', ':')).encode
+        w_out = []
+        i = 0
+        for (w_text, w_record) in zip(lines, w_records):
+            if w_record is None:
+                w_out.append(w_text)
+                continue
+            (record, w_slots) = w_record
+            w_changed = False
+            for (w_obj, k) in w_slots:
+                if w_results[i] != w_values[i]:
+                    w_obj[k] = w_results[i]
+                    w_changed = True
+                i += 1
+            if w_changed:
+                w_end = w_text[len(w_text.rstrip('\r\n')):]
+                w_text = w_encode(record) + w_end
+            w_out.append(w_text)
+        return(w_out)
+    
+    # bytes decoded at a time, looking for a stop character in UTF-8 bytes
+    # [UTF-8バイト列で区切り文字を探す際に一度にデコードするバイト数]
+    STOP_BLOCK = 1 << 8
+    
+    @staticmethod
+    def charStart(data, pos):
+        """
+            pos, or the start of the next character when pos is inside one of the UTF-8 bytes
+            [pos、ないしposがUTF-8バイト列の文字の途中であれば次の文字の開始]
+        """
+        while pos < len(data) and data[pos] & 0xC0 == 0x80:
+            pos += 1
+        return(pos)
+    
+    def stopAfter(self, data, pos, limit):
+        """
+            offset after the first stop character in data[pos:limit] of UTF-8 bytes, or None, 
+            pos and limit are at the start of a character
+            [UTF-8バイト列data[pos:limit]の最初の区切り文字の後の位置、ないしNone。
+             posとlimitは文字の開始とする]
+        """
+        while pos < limit:
+            end = self.charStart(data, min(pos + self.STOP_BLOCK, limit))
+            text = data[pos:end].decode('utf-8')
+            for (i, ch) in enumerate(text):
+                if self.isStop(ch):
+                    return(pos + len(text[:i + 1].encode('utf-8')))
+            pos = end
+        return(None)
+    
+    def stopBefore(self, data, pos, limit):
+        """
+            offset after the last stop character in data[limit:pos] of UTF-8 bytes, or None, 
+            pos and limit are at the start of a character
+            [UTF-8バイト列data[limit:pos]の最後の区切り文字の後の位置、ないしNone。
+             posとlimitは文字の開始とする]
+        """
+        while pos > limit:
+            start = self.charStart(data, max(pos - self.STOP_BLOCK, limit))
+            text = data[start:pos].decode('utf-8')
+            for i in range(len(text) - 1, -1, -1):
+                if self.isStop(text[i]):
+                    return(start + len(text[:i + 1].encode('utf-8')))
+            pos = start
+        return(None)
+    
+    def cnvMarkup(self, f_in, f_out, kind='html', chunk_size=1 << 16, max_carry=1 << 24):
+        """
+            convert the text of an HTML or Markdown binary stream, the markup is written as it is
+            [HTMLないしMarkdownのバイナリストリームのテキストを変換する。マークアップはそのまま書き出す]
+            
+            The text between two pieces of markup (see MarkupScanner) is converted 
+            on its own, a long one in parts cut after 。 and newlines, or after 
+            the last stop character (see isStop) when it has neither, so no rule 
+            matches across a tag, an entity or code. A text without a stop 
+            character is cut at max_carry bytes, as in cutChunks.
+            [二つのマークアップ（MarkupScanner参照）の間のテキストは単独で、長いものは
+             「。」と改行の後で、いずれも無ければ最後の区切り文字（isStop参照）の後で切った
+             部分毎に変換するので、ルールはタグ、実体参照、コードを跨いで一致しない。
+             区切り文字の無いテキストはcutChunksと同様にmax_carryバイトで切る。]
+        """
+        for ch in IncrementalConverter.SEGMENT_ENDS:
+            if not self.isStop(ch):
+                raise ValueError('sentence end is in a rule: {!r}'.format(ch))
+        w_ends = [ch.encode('utf-8') for ch in IncrementalConverter.SEGMENT_ENDS]
+        pending = bytearray()
+        searched = 0            # bytes of pending without a stop character
+        w_chars = 0             # characters written, for the tracer
+        
+        def flush(end):
+            # convert the text pending up to end
+            # [endまでの保留中のテキストを変換する]
+            nonlocal w_chars, searched
+            searched = 0
+            text = pending[:end].decode('utf-8')
+            del pending[:end]
+            f_out.write(self.convert(text, w_chars).encode('utf-8'))
+            w_chars += len(text)
+        
+        for (w_text, piece) in MarkupScanner(kind).pieces(f_in, chunk_size):
+            if w_text:
+                pending += piece
+                if len(pending) > chunk_size:
+                    cut = 0
+                    for w in w_ends:
+                        i = pending.rfind(w)
+                        if i >= 0:
+                            cut = max(cut, i + len(w))
+                    if not cut:
+                        # the last character may be incomplete, it is not searched
+                        # [最後の文字は不完全な場合があるので探さない]
+                        end = len(pending) - 1
+                        while end > searched and pending[end] & 0xC0 == 0x80:
+                            end -= 1
+                        cut = self.stopBefore(pending, end, searched)
+                        if cut is None:
+                            (searched, cut) = (end, end if len(pending) > max_carry else 0)
+                    if cut:
+                        flush(cut)
+                continue
+            if pending:
+                flush(len(pending))
+            if self.tracer is not None:
+                w_chars += countChars(piece)
+            f_out.write(piece)
+        if pending:
+            flush(len(pending))
+        return(True)
+    
+    def cnvMapped(self, path, f_out, window=1 << 20, merge=1 << 10):
+        """
+            convert a UTF-8 file through a memory map, the result equals convert of the whole
+            [UTF-8ファイルをメモリマップ経由で変換する。結果は全体をconvertした場合と等しい]
+            
+            The map is searched for the UTF-8 bytes of the markers and particles 
+            (see ToneRules.makeHitPattern), only the lines with one, merged when 
+            closer than merge bytes up to window bytes, are decoded and converted. 
+            The other bytes are written from the map as they are, and the written 
+            pages are released, so the memory stays near one window.
+            [マップから目印と助詞のUTF-8バイト列を探し（ToneRules.makeHitPattern参照）、
+             それを含む行のみ（mergeバイトより近ければwindowバイトまでまとめて）をデコードして変換する。
+             その他のバイトはマップからそのまま書き出し、書き出したページは解放するので、
+             メモリは1ウィンドウ程度に留まる。]
+            
+            A line longer than window bytes is cut after the stop characters 
+            (see isStop) nearest to the hit instead. Only when there is none 
+            within window bytes, it is cut there, and a rule matching across 
+            that cut is not applied (as cutChunks).
+            [windowバイトより長い行は、代わりに一致に最も近い区切り文字（isStop参照）の後で切る。
+             windowバイト以内にそれが無い場合のみそこで切り、その切れ目を跨いで一致するルールは
+             適用しない（cutChunksと同様）。]
+        """
+        if not self.isStop('\n'):
+            raise ValueError('newline is in a rule')
+        if self.overlay is not None:
+            raise ValueError('the keys of the overlay are not searched in the map')
+        (w_pattern, overlap) = (self.rules.hit_pattern, self.rules.hit_len - 1)
+        window = max(window, 2 * self.rules.hit_len)
+        
+        with open(path, 'rb') as f:
+            w_size = os.fstat(f.fileno()).st_size
+            if w_size == 0:
+                return(True)
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                view = memoryview(mm)
+                done = 0            # bytes written
+                scan = 0            # bytes searched
+                w_chars = 0         # characters written, for the tracer
+                w_released = 0      # bytes released from the memory
+                
+                def release():
+                    # release the pages written, once per window
+                    # [書き出したページを1ウィンドウ毎に解放する]
+                    nonlocal w_released
+                    if done - w_released >= window and hasattr(mm, 'madvise'):
+                        w_release = done - done % mmap.PAGESIZE
+                        mm.madvise(mmap.MADV_DONTNEED, w_released, w_release - w_released)
+                        w_released = w_release
+                
+                def write(end):
+                    # copy the bytes up to end as they are
+                    # [endまでのバイトをそのまま書き出す]
+                    nonlocal done, w_chars
+                    if self.tracer is not None:
+                        w_chars += countChars(view[done:end])
+                    f_out.write(view[done:end])
+                    done = end
+                    release()
+                
+                def lineStart(pos):
+                    # start of the line of pos, not before done, or after a stop character 
+                    # when the line starts more than window bytes before
+                    # [posの行の開始。doneより前にはしない。行の開始がwindowバイトより前であれば
+                    #  区切り文字の後]
+                    lo = max(done, pos - window)
+                    start = mm.rfind(b'\n', lo, pos)
+                    if start >= 0:
+                        return(start + 1)
+                    if lo == done:
+                        return(done)
+                    lo = self.charStart(mm, lo)
+                    start = self.stopBefore(mm, pos, lo)
+                    return(lo if start is None else start)
+                
+                def lineEnd(pos):
+                    # end of the line of pos, after its newline, or after a stop character 
+                    # when the line ends more than window bytes after
+                    # [posの行の終わり。改行の後。行の終わりがwindowバイトより後であれば
+                    #  区切り文字の後]
+                    hi = min(pos + window, w_size)
+                    end = mm.find(b'\n', pos, hi)
+                    if end >= 0:
+                        return(end + 1)
+                    if hi == w_size:
+                        return(w_size)
+                    hi = self.charStart(mm, hi)
+                    end = self.stopAfter(mm, pos, hi)
+                    return(hi if end is None else end)
+                
+                while scan < w_size:
+                    m = w_pattern.search(mm, scan, min(scan + window, w_size))
+                    if m is None:
+                        # no rule here, write up to the last line end
+                        # [ここにはルールが無い。最後の行末まで書き出す]
+                        if scan + window >= w_size:
+                            break
+                        scan += window - overlap
+                        cut = mm.rfind(b'\n', done, scan) + 1
+                        if cut > done:
+                            write(cut)
+                        continue
+                    
+                    # the lines of the hit, and of the hits that follow closely
+                    # [一致の行、及び近くに続く一致の行]
+                    start = lineStart(m.start())
+                    end = lineEnd(m.end())
+                    while end < min(start + window, w_size):
+                        m = w_pattern.search(mm, end, min(end + merge, w_size))
+                        if m is None:
+                            break
+                        end = lineEnd(m.end())
+                    
+                    write(start)
+                    text = mm[start:end].decode('utf-8')
+                    f_out.write(self.convert(text, w_chars).encode('utf-8'))
+                    w_chars += len(text)
+                    done = scan = end
+                    release()
+                
+                write(w_size)
+                view.release()
+        return(True)
+    
+    def findPolite(self, text):
+        """
+            (offset, polite form) of the keys and the kanji-conditional particles in the text, 
+            in order, a form inside a longer one at the same place is not listed
+            [テキスト中のキーと漢字条件の助詞の（位置, 丁寧語形）。順に並べ、
+             同じ箇所のより長い形に含まれる形は挙げない]
+        """
+        rules = self.rules
+        w_hits = []
+        for key in rules.matcher.findKeys(text):
+            if rules.resolve(key) is None:
+                continue
+            pos = text.find(key)
+            while pos >= 0:
+                w_hits.append((pos, key))
+                pos = text.find(key, pos + 1)
+        if rules.cond_pattern is not None:
+            w_hits += [(m.start(2), m.group(2)) for m in rules.cond_pattern.finditer(text)]
+        
+        w_hits.sort(key=lambda w: (w[0], -len(w[1])))
+        w_forms = []
+        end = 0
+        for (pos, w_form) in w_hits:
+            if pos + len(w_form) > end:
+                w_forms.append((pos, w_form))
+                end = pos + len(w_form)
+        return(w_forms)
+    
+    def checkFile(self, path, count=False):
+        """
+            (line, column, polite form) of the polite forms of a UTF-8 file, from 1, 
+            the first one only unless count
+            [UTF-8ファイルの丁寧語形の（行, 桁, 丁寧語形）。1から。countでなければ最初のもののみ]
+            
+            Nothing is converted, the bytes are searched for the markers and 
+            particles (see ToneRules.makeHitPattern) and only the lines with 
+            one are decoded and matched (see findPolite).
+            [何も変換せず、バイト列から目印と助詞を探し（ToneRules.makeHitPattern参照）、
+             それを含む行のみをデコードして照合する（findPolite参照）。]
+        """
+        if not self.isStop('\n'):
+            raise ValueError('newline is in a rule')
+        w_pattern = self.rules.hit_pattern
+        with open(path, 'rb') as f:
+            data = f.read()
+        
+        w_forms = []
+        w_line = 1          # line number at w_pos
+        w_pos = 0
+        scan = 0
+        while True:
+            m = w_pattern.search(data, scan)
+            if m is None:
+                break
+            start = data.rfind(b'\n', 0, m.start()) + 1
+            end = data.find(b'\n', m.end())
+            end = len(data) if end < 0 else end + 1
+            w_line += data.count(b'\n', w_pos, start)
+            w_pos = start
+            for (pos, w_form) in self.findPolite(data[start:end].decode('utf-8')):
+                w_forms.append((w_line, pos + 1, w_form))
+                if not count:
+                    return(w_forms)
+            scan = end
+        return(w_forms)
+
+
+class IncrementalConverter():
+    """
+        re-convert only the sentences changed since the previous text.
+        [前回のテキストから変更された文のみを再変換する。]
+        
+        The text is split into segments after 。 and newlines, the result of 
+        each segment is kept in a bounded LRU cache keyed by its text. 
+        The parts before and after the edited region are taken over from the 
+        previous result as they are, so only the segments around the edit are 
+        looked up, and only the changed ones are converted.
+        [テキストは「。」と改行の後で分割し、各分割の結果をそのテキストをキーとする
+         有界LRUキャッシュに保持する。編集箇所の前後は前回の結果をそのまま引き継ぐので、
+         編集箇所の周りの分割のみを参照し、変更されたもののみを変換する。]
+    """
+    
+    # segments end after these characters
+    # [分割はこれらの文字の後で終わる]
+    SEGMENT_ENDS = '。\n'
+    
+    # characters between the offsets kept of the previous text
+    # [保持する前回のテキストのオフセットの間隔（文字数）]
+    MARK_SPAN = 1 << 10
+    
+    def __init__(self, converter=None, max_segments=1 << 16):
+        """
+            converter (default: ToneConverter with the shared rules) and 
+            the number of segments cached
+            [変換器（既定: 共有ルールのToneConverter）とキャッシュする分割の数]
+        """
+        self.converter = converter or ToneConverter()
+        for ch in self.SEGMENT_ENDS:
+            if not self.converter.isStop(ch):
+                raise ValueError('segment end is in a rule: {!r}'.format(ch))
+        self.segment_re = re.compile('[^{0}]*[{0}]|[^{0}]+'.format(self.SEGMENT_ENDS))
+        self.max_segments = max_segments
+        self.segments = collections.OrderedDict()
+        
+        # previous text, its result, and offsets of segment starts in both
+        # [前回のテキスト、その結果、及び両者での分割の開始オフセット]
+        self.prev_text = ''
+        self.prev_result = ''
+        self.marks_in = [0]
+        self.marks_out = [0]
+        self.lock = threading.Lock()
+        
+        # overlay of the cached results, they are dropped when it is reloaded
+        # [キャッシュした結果のオーバーレイ。読み直されると結果は破棄する]
+        self.overlay = None
+    
+    @staticmethod
+    def commonPrefix(a, b, block=1 << 16):
+        """
+            length of the common prefix of a and b, compared block by block
+            [aとbの共通接頭部の長さ。ブロック毎に比較する]
+        """
+        n = min(len(a), len(b))
+        lo = 0
+        while lo < n and a[lo:lo + block] == b[lo:lo + block]:
+            lo += block
+        if lo >= n:
+            return(n)
+        
+        # bisect in the first block that differs
+        # [最初に異なるブロック内を二分探索する]
+        w_base = lo
+        hi = min(lo + block, n)
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            if a[w_base:mid] == b[w_base:mid]:
+                lo = mid
+            else:
+                hi = mid - 1
+        return(lo)
+    
+    @staticmethod
+    def commonSuffix(a, b, limit, block=1 << 16):
+        """
+            length of the common suffix of a and b, up to limit
+            [aとbの共通接尾部の長さ。limitまで]
+        """
+        (la, lb) = (len(a), len(b))
+        lo = 0
+        while lo < limit:
+            w_len = min(block, limit - lo)
+            if a[la - lo - w_len:la - lo] != b[lb - lo - w_len:lb - lo]:
+                break
+            lo += w_len
+        else:
+            return(limit)
+        
+        w_base = lo
+        hi = min(lo + block, limit)
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            if a[la - mid:la - w_base] == b[lb - mid:lb - w_base]:
+                lo = mid
+            else:
+                hi = mid - 1
+        return(lo)
+    
+    def cnvSegments(self, text, base=0):
+        """
+            convert whole segments through the cache, 
+            returns the result and the offsets of some segment starts in both (after 0)
+            [分割単位でキャッシュを通して変換する。結果と、両者での分割の開始オフセット（0の後）を返す]
+        """
+        w_parts = []
+        marks_in = []
+        marks_out = []
+        (w_in, w_out, w_mark) = (0, 0, 0)
+        for seg in self.segment_re.findall(text):
+            if w_in - w_mark >= self.MARK_SPAN:
+                marks_in.append(w_in)
+                marks_out.append(w_out)
+                w_mark = w_in
+            w_seg = self.segments.get(seg)
+            if w_seg is None:
+                w_seg = self.converter.convert(seg, base + w_in)
+                self.segments[seg] = w_seg
+                if len(self.segments) > self.max_segments:
+                    self.segments.popitem(last=False)
+            else:
+                self.segments.move_to_end(seg)
+            w_parts.append(w_seg)
+            w_in += len(seg)
+            w_out += len(w_seg)
+        return(''.join(w_parts), marks_in, marks_out)
+    
+    def convert(self, text):
+        """
+            convert the text, reusing the previous result and the cached segments
+            [前回の結果とキャッシュした分割を再利用してテキストを変換する]
+        """
+        with self.lock:
+            if self.converter.overlay is not None:
+                w_overlay = self.converter.overlay.current()
+                if w_overlay is not self.overlay:
+                    self.segments.clear()
+                    (self.prev_text, self.prev_result) = ('', '')
+                    (self.marks_in, self.marks_out) = ([0], [0])
+                    self.overlay = w_overlay
+            prev = self.prev_text
+            if text == prev:
+                return(self.prev_result)
+            w_delta = len(text) - len(prev)
+            w_prefix = self.commonPrefix(prev, text)
+            w_suffix = self.commonSuffix(prev, text, min(len(prev), len(text)) - w_prefix)
+            
+            # widen the edit to the kept offsets, the segment end before each 
+            # offset must be outside of the edit
+            # [編集箇所を保持したオフセットまで広げる。各オフセットの前の分割の終わりは編集箇所の外であること]
+            i = bisect.bisect_right(self.marks_in, w_prefix) - 1
+            j = bisect.bisect_left(self.marks_in, len(prev) - w_suffix + 1)
+            (in_a, out_a) = (self.marks_in[i], self.marks_out[i])
+            if j < len(self.marks_in):
+                (in_b, out_b) = (self.marks_in[j], self.marks_out[j])
+            else:
+                (in_b, out_b) = (len(prev), len(self.prev_result))
+            
+            (w_mid, marks_in, marks_out) = self.cnvSegments(text[in_a:in_b + w_delta], in_a)
+            w_result = self.prev_result[:out_a] + w_mid + self.prev_result[out_b:]
+            w_shift = len(w_result) - len(self.prev_result)
+            
+            self.marks_in = (self.marks_in[:i + 1] + [w + in_a for w in marks_in]
+                             + [w + w_delta for w in self.marks_in[j:]])
+            self.marks_out = (self.marks_out[:i + 1] + [w + out_a for w in marks_out]
+                              + [w + w_shift for w in self.marks_out[j:]])
+            self.prev_text = text
+            self.prev_result = w_result
+            return(w_result)
+
+
+class MarkupScanner():
+    """
+        incremental tokenizer of HTML or Markdown into text and markup, without a tree.
+        [HTMLないしMarkdownをテキストとマークアップに分ける逐次的なトークナイザ。木は作らない。]
+        
+        The input is read as UTF-8 bytes chunk by chunk. Tags with their 
+        attributes, comments, CDATA, entities and the contents of RAW_ELEMENTS 
+        are markup, in Markdown also the code spans, the fenced and indented 
+        code blocks and the link destinations. The markup is given as memoryview 
+        slices of the chunk, the contents of comments and code are passed on as 
+        they are read. A tag, entity or code span not closed within MAX_TOKEN 
+        bytes is taken as text, so the memory stays within a chunk and MAX_TOKEN.
+        [入力はUTF-8バイト列としてチャンク毎に読む。属性を含むタグ、コメント、CDATA、実体参照、
+         及びRAW_ELEMENTSの内容はマークアップとし、Markdownではコードスパン、フェンス及び
+         インデントのコードブロック、リンク先もマークアップとする。マークアップはチャンクの
+         memoryviewのスライスとして渡し、コメントとコードの内容は読むそばから渡す。
+         MAX_TOKENバイト以内に閉じないタグ、実体参照、コードスパンはテキストとするので、
+         メモリはチャンクとMAX_TOKENの範囲に留まる。]
+    """
+    
+    # elements whose contents are markup
+    # [内容をマークアップとする要素]
+    RAW_ELEMENTS = (b'script', b'style', b'pre', b'code', b'textarea')
+    
+    # longest tag, entity or code span
+    # [最長のタグ、実体参照、コードスパン]
+    MAX_TOKEN = 1 << 16
+    
+    # bytes kept at the end of a chunk, for a construct or an end split by the chunk
+    # [チャンクで分かれた構文や終わりのため、チャンクの末尾に残すバイト数]
+    KEEP = 64
+    
+    TAG_RE = re.compile(rb'</?([A-Za-z][A-Za-z0-9:-]*)(?:[^>"\']|"[^"]*"|\'[^\']*\')*>|<[!?][^>]*>')
+    ENTITY_RE = re.compile(rb'&(?:#[0-9]{1,7}|#[xX][0-9a-fA-F]{1,6}|[A-Za-z][A-Za-z0-9]{1,31});')
+    LINK_RE = re.compile(rb'[^)\n]*\)')
+    PARAGRAPH_RE = re.compile(rb'\n[ \t]*\r?\n')
+    
+    def __init__(self, kind='html'):
+        """
+            kind of the markup, 'html' or 'markdown'
+            [マークアップの種類。'html'ないし'markdown']
+        """
+        w_starts = [rb'(?P<tag><[A-Za-z/!?])', rb'(?P<entity>&)']
+        if kind == 'markdown':
+            w_starts += [rb'(?P<fence>(?<=\n)[ ]{0,3}(?:`{3,}|~{3,}))', rb'(?P<code>`+)', 
+                         rb'(?P<indent>(?:(?<=\n\n)|(?<=\n\r\n))(?: {4}|\t))', rb'(?P<link>\]\()']
+        elif kind != 'html':
+            raise ValueError('unknown markup: {}'.format(kind))
+        self.start_re = re.compile(b'|'.join(w_starts))
+    
+    def pieces(self, f_in, chunk_size=1 << 16):
+        """
+            (is text, memoryview) of the binary stream in order, 
+            a view is valid until the next piece is taken
+            [バイナリストリームの（テキストか, memoryview）を順に。ビューは次の断片を取るまで有効]
+        """
+        w_raw = None                # (end of the raw contents, end included) or None
+        carry = b''
+        prefix = b'\n\n'            # the two bytes before carry, for the lookbehinds
+        final = False
+        while not final:
+            chunk = f_in.read(chunk_size)
+            final = not chunk
+            data = prefix + carry + chunk
+            view = memoryview(data)
+            pos = 2
+            size = len(data)
+            while pos < size:
+                if w_raw is not None:
+                    # contents up to the end, or up to the bytes kept
+                    # [終わりまで、ないし残すバイトまでの内容]
+                    m = w_raw[0].search(data, pos)
+                    if m is not None:
+                        end = m.end() if w_raw[1] else m.start()
+                        w_raw = None
+                    elif final:
+                        end = size
+                    else:
+                        end = max(pos, size - self.KEEP)
+                    if end > pos:
+                        yield((False, view[pos:end]))
+                    if end == pos and w_raw is not None:
+                        break
+                    pos = end
+                    continue
+                
+                m = self.start_re.search(data, pos)
+                if m is None:
+                    end = size if final else max(pos, size - self.KEEP)
+                    if end > pos:
+                        yield((True, view[pos:end]))
+                    pos = end
+                    break
+                start = m.start()
+                if start > pos:
+                    yield((True, view[pos:start]))
+                    pos = start
+                if m.end() == size and not final:
+                    # a run of backticks may go on in the next chunk
+                    # [バッククォートの連続は次のチャンクに続き得る]
+                    break
+                
+                w_token = self.token(data, m, final)
+                if w_token is None:
+                    # not complete in this chunk
+                    # [このチャンクでは完結しない]
+                    break
+                (end, w_markup, w_raw) = w_token
+                yield((not w_markup, view[pos:end]))
+                pos = end
+            
+            prefix = data[pos - 2:pos]
+            carry = data[pos:]
+            view.release()
+    
+    def token(self, data, m, final):
+        """
+            (end, is markup, raw end or None) of the construct started by m, 
+            None if it needs more data
+            [mで始まる構文の（終わり, マークアップか, 生の内容の終わりないしNone）。
+             更にデータが要ればNone]
+        """
+        start = m.start()
+        w_rest = len(data) - start
+        w_more = not final and w_rest < self.MAX_TOKEN
+        w_kind = m.lastgroup
+        if w_kind == 'tag':
+            for (w_open, w_close) in ((b'<!--', rb'-->'), (b'<![CDATA[', rb'\]\]>')):
+                if data.startswith(w_open, start):
+                    return((start + len(w_open), True, (re.compile(w_close), True)))
+                if w_rest < len(w_open) and w_open.startswith(data[start:]) and not final:
+                    return(None)
+            t = self.TAG_RE.match(data, start)
+            if t is None:
+                return(None if w_more else (start + 1, False, None))
+            w_name = (t.group(1) or b'').lower()
+            if (w_name in self.RAW_ELEMENTS and data[start + 1:start + 2] != b'/' 
+                    and not t.group().endswith(b'/>')):
+                return((t.end(), True, (re.compile(b'</' + re.escape(w_name) + rb'\b', re.I), False)))
+            return((t.end(), True, None))
+        if w_kind == 'entity':
+            t = self.ENTITY_RE.match(data, start)
+            if t is None:
+                return(None if not final and w_rest < 40 else (start + 1, False, None))
+            return((t.end(), True, None))
+        if w_kind == 'fence':
+            w_fence = m.group().lstrip(b' ')
+            return((m.end(), True, (re.compile(rb'\n[ ]{0,3}' + re.escape(w_fence[:1]) 
+                                               + b'{' + str(len(w_fence)).encode() + b',}'), True)))
+        if w_kind == 'indent':
+            return((m.end(), True, (re.compile(rb'\n(?=[^ \t\r\n])'), True)))
+        if w_kind == 'code':
+            # a code span ends with the same number of backticks, within the paragraph
+            # [コードスパンは段落内の同じ数のバッククォートで終わる]
+            w_len = m.end() - start
+            t = re.compile(rb'(?<!`)`{' + str(w_len).encode() + rb'}(?!`)').search(data, m.end())
+            w_par = self.PARAGRAPH_RE.search(data, m.end())
+            if t is not None and (w_par is None or t.start() < w_par.start()) and (final or t.end() < len(data)):
+                return((t.end(), True, None))
+            if w_par is not None or not w_more:
+                return((m.end(), False, None))
+            return(None)
+        
+        # link destination
+        # [リンク先]
+        t = self.LINK_RE.match(data, m.end())
+        if t is not None:
+            return((t.end(), True, None))
+        if data.find(b'\n', m.end()) >= 0 or not w_more:
+            return((m.end(), False, None))
+        return(None)
+
+
+class SentenceCache():
+    """
+        converted sentences on disk, shared by the runs and the processes.
+        [変換済みの文をディスクに保持し、実行間及びプロセス間で共有する。]
+        
+        The sentences (split after 。 and newlines, as IncrementalConverter) 
+        are keyed by a hash of the rule definitions and the sentence in an 
+        SQLite database in WAL mode, so the workers of a batch read while one 
+        of them writes. The rows of other rule definitions are deleted when 
+        the database is opened, and the least recently used quarters while it 
+        is over max_bytes. The lookups of a text are one query, the new 
+        sentences and the uses are written in one transaction after it. 
+        A database that can not be read or written only costs the conversion.
+        [文（IncrementalConverterと同様に「。」と改行の後で分割）はルール定義と文の
+         ハッシュ値をキーとしてWALモードのSQLiteデータベースに保持するので、バッチの
+         ワーカーは一つが書く間も読める。他のルール定義の行はデータベースを開く時に削除し、
+         max_bytesを超える間は最も使われていない四分の一ずつを削除する。テキストの参照は一回の
+         問い合わせで、新しい文と使用はその後に一つのトランザクションで書く。
+         読み書きできないデータベースは変換の時間が掛かるのみ。]
+    """
+    
+    # sentences shorter than this convert faster than they are looked up
+    # [これより短い文は参照するより変換する方が速い]
+    MIN_LEN = 8
+    
+    # keys per query, below the limit of the parameters of old SQLite
+    # [一回の問い合わせのキー数。古いSQLiteのパラメータ数の上限未満]
+    QUERY_KEYS = 500
+    
+    # uses kept in memory before they are written
+    # [書き込むまでメモリに保持する使用の数]
+    TOUCH_LIMIT = 1 << 10
+    
+    def __init__(self, path=None, max_bytes=1 << 28):
+        """
+            database file (default: SENTENCE_CACHE_FILE) and its size limit in bytes
+            [データベースファイル（既定: SENTENCE_CACHE_FILE）とその大きさの上限（バイト）]
+        """
+        self.path = path or SENTENCE_CACHE_FILE
+        self.max_bytes = max_bytes
+        self.segment_re = re.compile('[^{0}]*[{0}]|[^{0}]+'.format(
+            IncrementalConverter.SEGMENT_ENDS))
+        self.lock = threading.Lock()
+        
+        # connection of this process and its rule hash, None if the database failed
+        # [このプロセスの接続とそのルールのハッシュ値。データベースが失敗すればNone]
+        self.db = None
+        self.pid = None
+        self.rule_hash = None
+        self.hasher = None
+        
+        # sentences and uses not yet written, key : result, keys
+        # [未だ書き込んでいない文と使用。キー : 結果、キー]
+        self.added = {}
+        self.touched = set()
+    
+    def connect(self, rule_hash):
+        """
+            the connection of this process, opened on the first use and after a fork
+            [このプロセスの接続。最初の使用時及びfork後に開く]
+        """
+        if self.pid == os.getpid() and self.rule_hash == rule_hash:
+            return(self.db)
+        import sqlite3
+        
+        self.pid = os.getpid()
+        self.rule_hash = rule_hash
+        self.hasher = hashlib.blake2b(rule_hash.encode('utf-8') + b'\0', digest_size=16)
+        self.added = {}
+        self.touched = set()
+        self.db = None
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            db = sqlite3.connect(self.path, timeout=30.0, isolation_level=None, 
+                                 check_same_thread=False)
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+            db.execute('BEGIN IMMEDIATE')
+            try:
+                db.execute('CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)')
+                db.execute('CREATE TABLE IF NOT EXISTS sentences (key BLOB PRIMARY KEY, '
+                           'result TEXT NOT NULL, used INTEGER NOT NULL) WITHOUT ROWID')
+                db.execute('CREATE INDEX IF NOT EXISTS sentences_used ON sentences (used)')
+                
+                # the rules have changed since the sentences were written
+                # [文の書き込み後にルールが変更された]
+                w_row = db.execute("SELECT value FROM meta WHERE name = 'rules'").fetchone()
+                if w_row is None or w_row[0] != rule_hash:
+                    db.execute('DELETE FROM sentences')
+                    db.execute("INSERT OR REPLACE INTO meta VALUES ('rules', ?)", (rule_hash,))
+                db.execute('COMMIT')
+            except BaseException:
+                db.execute('ROLLBACK')
+                raise
+        except (OSError, sqlite3.Error):
+            return(None)
+        self.db = db
+        return(db)
+    
+    def key(self, sentence):
+        """
+            key of the sentence under the rules of connect
+            [connectのルールでの文のキー]
+        """
+        w_hash = self.hasher.copy()
+        w_hash.update(sentence.encode('utf-8'))
+        return(w_hash.digest())
+    
+    def lookup(self, rule_hash, sentences):
+        """
+            sentence : result of the sentences found in the database
+            [データベースにあった文の文 : 結果]
+        """
+        import sqlite3
+        
+        dct_found = {}
+        with self.lock:
+            db = self.connect(rule_hash)
+            if db is None:
+                return(dct_found)
+            dct_keys = {self.key(sentence): sentence for sentence in sentences}
+            w_keys = []
+            for (k, sentence) in dct_keys.items():
+                if k in self.added:
+                    dct_found[sentence] = self.added[k]
+                else:
+                    w_keys.append(k)
+            try:
+                for i in range(0, len(w_keys), self.QUERY_KEYS):
+                    w_part = w_keys[i:i + self.QUERY_KEYS]
+                    for (k, w_result) in db.execute(
+                            'SELECT key, result FROM sentences WHERE key IN ({})'.format(
+                                ','.join('?' * len(w_part))), w_part):
+                        dct_found[dct_keys[k]] = w_result
+                        self.touched.add(k)
+            except sqlite3.Error:
+                pass
+        return(dct_found)
+    
+    def store(self, rule_hash, results):
+        """
+            add the results of the sentences (sentence : result), and write them with the uses
+            [文の結果（文 : 結果）を加え、使用と共に書き込む]
+        """
+        with self.lock:
+            if self.connect(rule_hash) is None:
+                return(False)
+            for (sentence, w_result) in results.items():
+                self.added[self.key(sentence)] = w_result
+            if self.added or len(self.touched) >= self.TOUCH_LIMIT:
+                return(self.write())
+        return(True)
+    
+    def write(self):
+        """
+            write the sentences and the uses, evict if the database is over max_bytes
+            [文と使用を書き込む。データベースがmax_bytesを超えていれば追い出す]
+        """
+        import sqlite3
+        
+        (w_added, self.added) = (self.added, {})
+        (w_touched, self.touched) = (self.touched, set())
+        w_now = int(time.time())
+        db = self.db
+        try:
+            db.execute('BEGIN IMMEDIATE')
+            try:
+                db.executemany('INSERT OR REPLACE INTO sentences VALUES (?, ?, ?)', 
+                               ((k, v, w_now) for (k, v) in w_added.items()))
+                db.executemany('UPDATE sentences SET used = ? WHERE key = ?', 
+                               ((w_now, k) for k in w_touched))
+                
+                # bytes in use, the free pages are reused by the next inserts
+                # [使用中のバイト数。空きページは次の挿入で再利用する]
+                (w_page_size,) = db.execute('PRAGMA page_size').fetchone()
+                while True:
+                    (w_pages,) = db.execute('PRAGMA page_count').fetchone()
+                    (w_free,) = db.execute('PRAGMA freelist_count').fetchone()
+                    if (w_pages - w_free) * w_page_size <= self.max_bytes:
+                        break
+                    if db.execute('DELETE FROM sentences WHERE key IN (SELECT key FROM sentences '
+                                  'ORDER BY used LIMIT (SELECT count(*) / 4 + 1 FROM sentences))'
+                                  ).rowcount <= 0:
+                        break
+                db.execute('COMMIT')
+            except BaseException:
+                db.execute('ROLLBACK')
+                raise
+        except sqlite3.Error:
+            # the sentences are only converted again
+            # [文は再度変換されるのみ]
+            return(False)
+        return(True)
+    
+    def close(self):
+        """
+            write the uses kept in memory and close the database
+            [メモリに保持した使用を書き込み、データベースを閉じる]
+        """
+        with self.lock:
+            if self.db is not None and self.pid == os.getpid():
+                if self.added or self.touched:
+                    self.write()
+                self.db.close()
+            self.db = None
+            self.pid = None
+        return(True)
+
+
+def countChars(data):
+    """
+        number of characters of UTF-8 bytes, counted 1 MB at a time
+        [UTF-8バイト列の文字数。1 MBずつ数える]
+    """
+    w_count = 0
+    for i in range(0, len(data), 1 << 20):
+        w_count += len(bytes(data[i:i + (1 << 20)]).translate(None, UTF8_CONTINUATION))
+    return(w_count)
+
+
+def convert(text):
+    """
+        convert polite tone of the text to assertive one with the shared rules
+        [共有ルールでテキストの丁寧語調を断定語調に変換する]
+    """
+    return(ToneConverter().convert(text))
+
+
+class CnvTone():
+    """
+        convert tone of the clipboard.
+        [クリップボードの語調変換を行う。]
+    """
+    
+    def __init__(self, clip_str=None, tracer=None, metrics=None, diff=False, cache=None, 
+                 overlay=None):
+        """
+            the text is read from the clipboard if omitted, metrics is a Metrics or None, 
+            the edits are collected into self.edits (EditLog) if diff, cache is a SentenceCache or None, 
+            overlay is a UserOverlay or None
+            [テキストの指定が無ければクリップボードから読む。metricsはMetricsないしNone、
+             diffなら編集をself.edits（EditLog）に集める。cacheはSentenceCacheないしNone、
+             overlayはUserOverlayないしNone]
+        """
+        # used class
+        self.clip_board = ClipBoard()
+        self.tracer = tracer
+        self.metrics = metrics
+        self.cache = cache
+        self.overlay = overlay
+        self.converter = None
+        self.edits = None
+        
+        # read clipping content of machine translation result at startup
+        if clip_str is None:
+            w_mark = self.metrics.start() if self.metrics is not None else None
+            clip_str = self.clip_board.get()
+            if w_mark is not None:
+                self.metrics.stop(w_mark, 'read', len(clip_str))
+        self.clip_str = clip_str
+        if diff:
+            self.edits = EditLog(clip_str)
+    
+    def getConverter(self):
+        """
+            converter with the shared rules, None if the rules are invalid
+            [共有ルールの変換器。ルールが不正ならNone]
+        """
+        if self.converter is None:
+            w_mark = self.metrics.start() if self.metrics is not None else None
+            try:
+                self.converter = ToneConverter(tracer=self.tracer, metrics=self.metrics, 
+                                               cache=self.cache, overlay=self.overlay)
+            except ValueError:
+                return(None)
+            if w_mark is not None:
+                self.metrics.stop(w_mark, 'rules')
+        return(self.converter)
+    
+    def cnvForced(self):
+        """
+            forcibly convert tones with a certain vocabulary pattern
+            [一定の語彙パターンでトーンを強制的に変換する]
+        """
+        if self.getConverter() is None:
+            return(False)
+        self.clip_str = self.converter.cnvForced(self.clip_str, edits=self.edits)
+        return(True)
+    
+    def cnvCoditional(self):
+        """
+            # convert a pattern following a specific letter into an assertion word
+            # [特定の一字に続くパターンを断定語に変換する]
+        """
+        if self.getConverter() is None:
+            return(False)
+        self.clip_str = self.converter.cnvCoditional(self.clip_str, edits=self.edits)
+        return(True)
+    
+    def cnvTone(self):
+        """
+            convert polite tone to assertive one
+            [丁寧語（「です・ます」調）を断定語（「だ・である」調）に変換]
+        """
+        
+        # the overlay, then cnvForced and cnvCoditional, through the cache if any
+        # [オーバーレイ、次にcnvForcedとcnvCoditional。キャッシュがあればそれを通して]
+        if self.getConverter() is None:
+            return(False)
+        self.clip_str = self.converter.convert(self.clip_str, edits=self.edits)
+        
+        # past result of the tone conversion to clip board
+        w_mark = self.metrics.start() if self.metrics is not None else None
+        self.clip_board.set(self.clip_str)
+        if w_mark is not None:
+            self.metrics.stop(w_mark, 'write', len(self.clip_str))
+        
+        return(True)
+
+
+# converter of a batch worker process, loaded once by batchInit
+# [バッチのワーカープロセスの変換器。batchInitで一度だけ読み込む]
+_batch_converter = None
+
+
+def batchInit(trace_path=None, count=False, measure=False, cache=None, overlay=None):
+    """
+        load the rules once in a batch worker process, 
+        count the hits if count, record the phases if measure, 
+        cache is (path, max_bytes) of a SentenceCache or None, 
+        overlay is the files of a UserOverlay or None
+        [バッチのワーカープロセスでルールを一度だけ読み込む。
+         countなら一致数を数え、measureならフェーズを記録する。
+         cacheはSentenceCacheの（パス, max_bytes）ないしNone、
+         overlayはUserOverlayのファイルないしNone]
+    """
+    global _batch_converter
+    _batch_converter = ToneConverter(tracer=Tracer(trace_path) if trace_path else None, 
+                                     cache=SentenceCache(*cache) if cache else None, 
+                                     overlay=UserOverlay(overlay) if overlay else None)
+    if count:
+        _batch_converter.counter = HitCounter(_batch_converter.rules)
+    if measure:
+        _batch_converter.metrics = Metrics()
+
+
+def batchCounts():
+    """
+        (hits, metrics) recorded by the worker since the previous call, 
+        each None if not recorded (see HitCounter.take and Metrics.take)
+        [前回の呼び出し以降にワーカーが記録した（一致数、メトリクス）。
+         記録しなければ各々None（HitCounter.take及びMetrics.take参照）]
+    """
+    return((_batch_converter.counter.take() if _batch_converter.counter is not None else None, 
+            _batch_converter.metrics.take() if _batch_converter.metrics is not None else None))
+
+
+def batchFile(job):
+    """
+        convert one file of a batch, the output file is replaced atomically
+        [バッチの一ファイルを変換する。出力ファイルは不可分に置き換える]
+        
+        returns (input file, size in bytes, seconds, error message or None, batchCounts())
+    """
+    (src, dst) = job
+    w_start = time.perf_counter()
+    if _batch_converter.tracer is not None:
+        _batch_converter.tracer.source = src
+    try:
+        w_dir = os.path.dirname(dst) or '.'
+        os.makedirs(w_dir, exist_ok=True)
+        (fd, w_tmp) = tempfile.mkstemp(dir=w_dir, prefix='.' + os.path.basename(dst) + '.')
+        try:
+            with open(src, encoding='utf-8', newline='') as f_in, \
+                    os.fdopen(fd, 'w', encoding='utf-8', newline='') as f_out:
+                _batch_converter.cnvStream(f_in, f_out)
+            shutil.copymode(src, w_tmp)
+            os.replace(w_tmp, dst)
+        except BaseException:
+            os.unlink(w_tmp)
+            raise
+    except (OSError, ValueError) as e:
+        return((src, 0, time.perf_counter() - w_start, str(e), batchCounts()))
+    return((src, os.path.getsize(src), time.perf_counter() - w_start, None, batchCounts()))
+
+
+def batchChunk(job):
+    """
+        convert one chunk of ToneConverter.cnvParallel
+        [ToneConverter.cnvParallelの一チャンクを変換する]
+        
+        job is (text, offset in the source, source of the tracer), 
+        returns (converted text, batchCounts())
+    """
+    (text, w_base, w_source) = job
+    if _batch_converter.tracer is not None:
+        _batch_converter.tracer.source = w_source
+    return((_batch_converter.convert(text, w_base), batchCounts()))
+
+
+def batchRecords(job):
+    """
+        convert one batch of ToneConverter.cnvJsonl
+        [ToneConverter.cnvJsonlの一バッチを変換する]
+        
+        job is (lines, fields, number of the first line, source of the tracer), 
+        returns (converted lines, batchCounts())
+    """
+    (lines, fields, w_line, w_source) = job
+    if _batch_converter.tracer is not None:
+        _batch_converter.tracer.source = w_source
+    return((_batch_converter.cnvRecords(lines, fields, w_line), batchCounts()))
+
+
+def batchCheck(job):
+    """
+        check one file of cmdCheck
+        [cmdCheckの一ファイルを検査する]
+        
+        job is (input file, count all), 
+        returns (input file, [(line, column, polite form), ...], error message or None)
+    """
+    (src, count) = job
+    try:
+        return((src, _batch_converter.checkFile(src, count), None))
+    except (OSError, ValueError) as e:
+        return((src, [], str(e)))
+
+
+def batchSources(paths, pattern):
+    """
+        (root, input file) of the directories, globs and files, 
+        the root is the directory or the fixed part of the glob
+        [ディレクトリ、グロブ、及びファイルの（ルート, 入力ファイル）。
+         ルートはディレクトリ、ないしグロブの固定部分]
+    """
+    for w_path in paths:
+        if os.path.isdir(w_path):
+            w_root = w_path
+            w_srcs = []
+            for (w_dir, w_subdirs, w_files) in os.walk(w_path):
+                w_subdirs.sort()
+                w_srcs += [os.path.join(w_dir, w_file) for w_file in sorted(w_files)
+                           if fnmatch.fnmatch(w_file, pattern)]
+        elif os.path.isfile(w_path) or not re.search(r'[*?[]', w_path):
+            # a missing file is reported by its worker
+            # [存在しないファイルはワーカーが報告する]
+            w_root = os.path.dirname(w_path)
+            w_srcs = [w_path]
+        else:
+            w_parts = re.split(r'[*?[]', w_path, 1)[0]
+            w_root = os.path.dirname(w_parts)
+            w_srcs = sorted(w for w in glob.glob(w_path, recursive=True) if os.path.isfile(w))
+        
+        for src in w_srcs:
+            yield((w_root, src))
+
+
+def batchJobs(paths, pattern, out_dir, suffix):
+    """
+        (input file, output file) of the directories, globs and files
+        [ディレクトリ、グロブ、及びファイルの（入力ファイル, 出力ファイル）]
+        
+        The tree under a directory, or under the fixed part of a glob, 
+        is mirrored into out_dir. Without out_dir the output is written 
+        next to the input, with the suffix before the extension.
+        [ディレクトリ、ないしグロブの固定部分の配下はout_dirに同じ構成で出力する。
+         out_dirが無ければ、拡張子の前に接尾辞を付けて入力の隣に出力する。]
+    """
+    for (w_root, src) in batchSources(paths, pattern):
+        if out_dir:
+            dst = os.path.join(out_dir, os.path.relpath(src, w_root or '.'))
+        else:
+            (w_base, w_ext) = os.path.splitext(src)
+            
+            # skip the output of an earlier run
+            # [以前の実行の出力は飛ばす]
+            if w_base.endswith(suffix):
+                continue
+            dst = w_base + suffix + w_ext
+        yield((src, dst))
+
+
+def cmdBatch(args):
+    """
+        convert files on a process pool and report the timing
+        [プロセスプールでファイルを変換し、所要時間を報告する]
+    """
+    import multiprocessing
+    
+    jobs = list(batchJobs(args.paths, args.pattern, args.output_dir, args.suffix))
+    
+    # write the rule cache before the workers read it
+    # [ワーカーが読み込む前にルールキャッシュを書き込む]
+    ToneRules.shared()
+    
+    w_start = time.perf_counter()
+    w_cache = (args.cache, args.cache_size << 20) if args.cache else None
+    with multiprocessing.Pool(args.jobs, initializer=batchInit, 
+                              initargs=(args.trace, args.hits is not None, 
+                                        args.metrics is not None, w_cache, args.overlay)) as pool:
+        w_chunk = max(1, len(jobs) // (4 * (args.jobs or os.cpu_count() or 1)))
+        results = list(pool.imap(batchFile, jobs, w_chunk))
+    w_elapsed = time.perf_counter() - w_start
+    
+    w_total = 0
+    w_errors = 0
+    counter = HitCounter(ToneRules.shared()) if args.hits else None
+    metrics = Metrics(args.metrics) if args.metrics else None
+    for (src, w_size, w_secs, w_error, (w_hits, w_metrics)) in results:
+        if counter is not None:
+            counter.merge(w_hits)
+        if metrics is not None:
+            metrics.merge(w_metrics)
+        if w_error:
+            w_errors += 1
+            print('{}: {}'.format(src, w_error), file=sys.stderr)
+            continue
+        w_total += w_size
+        print('{:8.3f}s {:12,d} B  {}'.format(w_secs, w_size, src))
+    
+    print('{} files, {:.1f} MB in {:.2f} s ({:.1f} MB/s), {} failed'.format(
+        len(results) - w_errors, w_total / 1e6, w_elapsed,
+        w_total / 1e6 / w_elapsed if w_elapsed else 0.0, w_errors))
+    if counter is not None:
+        counter.write(args.hits)
+    if metrics is not None:
+        metrics.write()
+    return(1 if w_errors else 0)
+
+
+def cmdCheck(args):
+    """
+        report the polite forms left in files, on a process pool
+        [ファイルに残る丁寧語形をプロセスプールで報告する]
+        
+        Each hit is reported as file:line:column: form, the exit code is 0 
+        when no polite form is left, 1 when some are, and 2 when a file 
+        could not be read.
+        [各一致はファイル:行:桁: 形として報告する。終了コードは丁寧語形が残っていなければ0、
+         残っていれば1、読めないファイルがあれば2とする。]
+    """
+    import multiprocessing
+    
+    jobs = [(src, args.all) for (w_root, src) in batchSources(args.paths, args.pattern)]
+    w_jobs = args.jobs or os.cpu_count() or 1
+    
+    w_start = time.perf_counter()
+    if w_jobs == 1 or len(jobs) <= 1:
+        batchInit()
+        results = map(batchCheck, jobs)
+        pool = None
+    else:
+        # write the rule cache before the workers read it
+        # [ワーカーが読み込む前にルールキャッシュを書き込む]
+        ToneRules.shared()
+        pool = multiprocessing.Pool(w_jobs, initializer=batchInit)
+        results = pool.imap(batchCheck, jobs, max(1, min(256, len(jobs) // (4 * w_jobs))))
+    
+    (w_files, w_hits, w_errors) = (0, 0, 0)
+    try:
+        for (src, w_forms, w_error) in results:
+            if w_error:
+                w_errors += 1
+                print('{}: {}'.format(src, w_error), file=sys.stderr)
+                continue
+            if w_forms:
+                w_files += 1
+                w_hits += len(w_forms)
+            for (w_line, w_col, w_form) in w_forms:
+                print('{}:{}:{}: {}'.format(src, w_line, w_col, w_form))
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    
+    print('{} files checked in {:.2f} s, {} with polite forms{}, {} failed'.format(
+        len(jobs) - w_errors, time.perf_counter() - w_start, w_files, 
+        ' ({} hits)'.format(w_hits) if args.all else '', w_errors), file=sys.stderr)
+    return(2 if w_errors else 1 if w_files else 0)
+
+
+def serverSocket():
+    """
+        default socket of the server mode
+        [サーバーモードの既定のソケット]
+    """
+    return(os.environ.get('POLITE_TO_ASSERTIVE_SOCKET') or os.path.join(
+        os.environ.get('XDG_RUNTIME_DIR') or tempfile.gettempdir(),
+        'politeWordToAssertiveOne-{}.sock'.format(getattr(os, 'getuid', lambda: 0)())))
+
+
+class ToneServer():
+    """
+        serve conversions over a Unix domain socket, the rules are loaded once.
+        [Unixドメインソケットで変換を提供する。ルールは一度だけ読み込む。]
+        
+        A request is a 4 byte big-endian length and the UTF-8 text, 
+        the response is the converted text in the same framing. 
+        A connection may send any number of requests.
+        [要求は4バイトのビッグエンディアンの長さとUTF-8テキスト、応答は同じ形式の変換結果。
+         一つの接続で幾つでも要求を送ってよい。]
+    """
+    
+    # texts up to this size are converted on the event loop, larger ones on a thread
+    # [この大きさまでのテキストはイベントループ上で、より大きいものはスレッドで変換する]
+    INLINE_SIZE = 1 << 16
+    
+    def __init__(self, path, converter, metrics=None):
+        """
+            socket path, converter, and the Metrics flushed after the requests or None
+            [ソケットのパス、変換器、及び要求の後にflushするMetricsないしNone]
+        """
+        self.path = path
+        self.converter = converter
+        self.metrics = metrics
+    
+    async def handle(self, reader, writer):
+        """
+            answer the requests of one connection
+            [一つの接続の要求に応答する]
+        """
+        import asyncio
+        import struct
+        
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                (w_len,) = struct.unpack('>I', await reader.readexactly(4))
+                text = (await reader.readexactly(w_len)).decode('utf-8')
+                if w_len <= self.INLINE_SIZE:
+                    w_text = self.converter.convert(text)
+                else:
+                    w_text = await loop.run_in_executor(None, self.converter.convert, text)
+                w_data = w_text.encode('utf-8')
+                writer.write(struct.pack('>I', len(w_data)) + w_data)
+                await writer.drain()
+                if self.metrics is not None:
+                    self.metrics.flush()
+        except (asyncio.IncompleteReadError, ConnectionError, UnicodeDecodeError):
+            pass
+        finally:
+            writer.close()
+    
+    async def serve(self):
+        """
+            accept connections until SIGINT or SIGTERM
+            [SIGINTないしSIGTERMまで接続を受け付ける]
+        """
+        import asyncio
+        import signal
+        
+        loop = asyncio.get_running_loop()
+        for w_signal in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(w_signal, asyncio.current_task().cancel)
+        
+        w_umask = os.umask(0o077)
+        try:
+            server = await asyncio.start_unix_server(self.handle, path=self.path)
+        finally:
+            os.umask(w_umask)
+        async with server:
+            await server.serve_forever()
+    
+    def run(self):
+        """
+            serve until interrupted, the socket file is removed at exit
+            [中断されるまで提供する。終了時にソケットファイルを削除する]
+        """
+        import asyncio
+        import socket
+        
+        if os.path.exists(self.path):
+            # refuse to replace a server that is still running
+            # [動作中のサーバーは置き換えない]
+            try:
+                with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                    sock.connect(self.path)
+                print('already serving: {}'.format(self.path), file=sys.stderr)
+                return(False)
+            except OSError:
+                os.unlink(self.path)
+        try:
+            asyncio.run(self.serve())
+        except (KeyboardInterrupt, asyncio.CancelledError):
+            pass
+        finally:
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+        return(True)
+
+
+class SpoolWorker():
+    """
+        convert the files of a spool directory shared by the workers of several machines.
+        [複数のマシンのワーカーが共有するスプールディレクトリのファイルを変換する。]
+        
+        The input files are moved into new/ (written elsewhere on the same file
+        system first, names starting with . are skipped). A worker claims a file
+        by renaming it into its own directory work/<host>.<pid>/, only one rename
+        of a file succeeds, so no central service is needed. The output is
+        written to the output directory (default: out/) by a rename, then the
+        done marker <name>.done (a JSON line), then the input is moved to done/,
+        or to failed/ if it can not be converted.
+        [入力ファイルはnew/に移す（先に同じファイルシステムの別の場所に書く。.で始まる名前は
+         飛ばす）。ワーカーはファイルを自身のディレクトリwork/<ホスト>.<pid>/に名前変更して確保する。
+         あるファイルの名前変更は一つのみ成功するので、中央のサービスは要らない。出力は名前変更で
+         出力ディレクトリ（既定: out/）に書き、次に完了の目印<名前>.done（JSONの一行）を書き、
+         次に入力をdone/に、変換できなければfailed/に移す。]
+        
+        A worker touches its directory every stale / 4 seconds. The claims of a
+        directory untouched for stale seconds, or of a dead process of the same
+        host, are moved back to new/ by any worker and converted again.
+        [ワーカーはstale / 4秒毎に自身のディレクトリを更新する。stale秒更新されていない、
+         ないし同じホストの終了したプロセスのディレクトリの確保は、いずれかのワーカーが
+         new/に戻し、再び変換する。]
+    """
+    
+    def __init__(self, spool, out_dir=None, stale=300.0, poll=1.0, counter=None, metrics=None):
+        """
+            spool directory, output directory, seconds until a claim is stale,
+            seconds between the looks at an empty new/, and the HitCounter and 
+            the Metrics that the counts of the files are added to, or None
+            [スプールディレクトリ、出力ディレクトリ、確保が古くなるまでの秒数、
+             空のnew/を見る間隔の秒数、及びファイルの計数を加えるHitCounterとMetrics、ないしNone]
+        """
+        import socket
+        
+        self.spool = spool
+        self.out_dir = out_dir or os.path.join(spool, 'out')
+        self.stale = stale
+        self.poll = poll
+        self.counter = counter
+        self.metrics = metrics
+        for w_name in ('new', 'work', 'done', 'failed'):
+            os.makedirs(os.path.join(spool, w_name), exist_ok=True)
+        os.makedirs(self.out_dir, exist_ok=True)
+        self.host = socket.gethostname()
+        self.owner = '{}.{}'.format(self.host, os.getpid())
+        self.work_dir = os.path.join(spool, 'work', self.owner)
+        self.stopped = threading.Event()
+    
+    def claim(self):
+        """
+            claim a file of new/, returns its name, None if there is none
+            [new/のファイルを確保し、その名前を返す。無ければNone]
+        """
+        # our directory may have been taken as stale
+        # [自身のディレクトリが古いとして回収された場合がある]
+        os.makedirs(self.work_dir, exist_ok=True)
+        
+        # the workers start at different names, to rename different files
+        # [ワーカー毎に異なる名前から始め、異なるファイルを名前変更する]
+        w_names = sorted(w for w in os.listdir(os.path.join(self.spool, 'new')) if not w.startswith('.'))
+        if not w_names:
+            return(None)
+        k = os.getpid() % len(w_names)
+        for w_name in w_names[k:] + w_names[:k]:
+            try:
+                os.rename(os.path.join(self.spool, 'new', w_name), os.path.join(self.work_dir, w_name))
+            except FileNotFoundError:
+                # claimed by another worker
+                # [別のワーカーが確保した]
+                continue
+            return(w_name)
+        return(None)
+    
+    def convert(self, name):
+        """
+            convert a claimed file, write the output and the done marker, returns whether converted
+            [確保したファイルを変換し、出力と完了の目印を書く。変換したかを返す]
+        """
+        src = os.path.join(self.work_dir, name)
+        (src, w_size, w_secs, w_error, (w_hits, w_metrics)) = batchFile(
+            (src, os.path.join(self.out_dir, name)))
+        if self.counter is not None and w_hits is not None:
+            self.counter.merge(w_hits)
+        if self.metrics is not None and w_metrics is not None:
+            self.metrics.merge(w_metrics)
+        if w_error is None:
+            w_line = json.dumps({'source': name, 'bytes': w_size, 'seconds': round(w_secs, 6),
+                                 'worker': self.owner}, ensure_ascii=False) + '\n'
+            (fd, w_tmp) = tempfile.mkstemp(dir=self.out_dir, prefix='.' + name + '.done.')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(w_line)
+            os.replace(w_tmp, os.path.join(self.out_dir, name + '.done'))
+        else:
+            print('{}: {}'.format(name, w_error), file=sys.stderr)
+        try:
+            os.rename(src, os.path.join(self.spool, 'done' if w_error is None else 'failed', name))
+        except FileNotFoundError:
+            # taken back as stale, it is converted again
+            # [古いとして戻された。再び変換される]
+            pass
+        return(w_error is None)
+    
+    @staticmethod
+    def isAlive(pid):
+        """
+            whether the process of this host is running
+            [このホストのプロセスが動いているか]
+        """
+        if os.name != 'posix':
+            # os.kill terminates the process on Windows
+            # [Windowsではos.killはプロセスを終了させる]
+            return(True)
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return(False)
+        except PermissionError:
+            pass
+        return(True)
+    
+    def recover(self):
+        """
+            move the claims of stale or dead workers back to new/, returns their number
+            [古い、ないし終了したワーカーの確保をnew/に戻し、その数を返す]
+        """
+        w_now = time.time()
+        w_count = 0
+        for w_owner in os.listdir(os.path.join(self.spool, 'work')):
+            if w_owner == self.owner:
+                continue
+            w_dir = os.path.join(self.spool, 'work', w_owner)
+            (w_host, w_dot, w_pid) = w_owner.rpartition('.')
+            try:
+                w_stale = w_now - os.stat(w_dir).st_mtime > self.stale
+                if not w_stale and w_host == self.host and w_pid.isdigit():
+                    w_stale = not self.isAlive(int(w_pid))
+                if not w_stale:
+                    continue
+                w_names = os.listdir(w_dir)
+            except FileNotFoundError:
+                continue
+            for w_name in w_names:
+                try:
+                    os.rename(os.path.join(w_dir, w_name), os.path.join(self.spool, 'new', w_name))
+                    w_count += 1
+                except FileNotFoundError:
+                    # recovered by another worker
+                    # [別のワーカーが戻した]
+                    pass
+            try:
+                os.rmdir(w_dir)
+            except OSError:
+                pass
+        return(w_count)
+    
+    def beat(self):
+        """
+            touch the directory of this worker until stopped
+            [停止するまでこのワーカーのディレクトリを更新する]
+        """
+        while not self.stopped.wait(self.stale / 4):
+            try:
+                os.utime(self.work_dir)
+            except OSError:
+                pass
+    
+    def run(self, once=False):
+        """
+            convert the files until interrupted (SIGINT or SIGTERM), or until new/
+            is empty if once, returns (files converted, files failed)
+            [中断される（SIGINTないしSIGTERM）まで、onceならnew/が空になるまでファイルを変換する。
+             （変換したファイル数, 失敗したファイル数）を返す]
+        """
+        import signal
+        
+        w_handler = None
+        if threading.current_thread() is threading.main_thread():
+            w_handler = signal.signal(signal.SIGTERM, signal.default_int_handler)
+        os.makedirs(self.work_dir, exist_ok=True)
+        threading.Thread(target=self.beat, daemon=True).start()
+        (w_done, w_failed) = (0, 0)
+        try:
+            while True:
+                w_name = self.claim()
+                if w_name is None:
+                    if self.recover():
+                        continue
+                    if once:
+                        break
+                    time.sleep(self.poll)
+                    continue
+                if self.convert(w_name):
+                    w_done += 1
+                else:
+                    w_failed += 1
+        except KeyboardInterrupt:
+            pass
+        finally:
+            # the claims left by an interruption go back to new/
+            # [中断で残った確保はnew/に戻す]
+            self.stopped.set()
+            try:
+                w_names = os.listdir(self.work_dir)
+            except FileNotFoundError:
+                # taken as stale, another worker put the claims back
+                # [古いとして回収された。別のワーカーが確保を戻した]
+                w_names = []
+            for w_name in w_names:
+                try:
+                    os.rename(os.path.join(self.work_dir, w_name), os.path.join(self.spool, 'new', w_name))
+                except FileNotFoundError:
+                    pass
+            try:
+                os.rmdir(self.work_dir)
+            except OSError:
+                pass
+            if w_handler is not None:
+                signal.signal(signal.SIGTERM, w_handler)
+        return((w_done, w_failed))
+
+
+def spoolWork(job):
+    """
+        run a SpoolWorker in this process, 
+        returns (files converted, files failed, (hits, metrics) as batchCounts())
+        [このプロセスでSpoolWorkerを動かし、
+         （変換したファイル数, 失敗したファイル数, batchCounts()と同様の（一致数、メトリクス））を返す]
+    """
+    (spool, out_dir, stale, poll, once, trace_path, count, measure, cache, overlay) = job
+    batchInit(trace_path, count, measure, cache, overlay)
+    worker = SpoolWorker(spool, out_dir, stale, poll, 
+                         HitCounter(_batch_converter.rules) if count else None, 
+                         Metrics() if measure else None)
+    (w_done, w_failed) = worker.run(once)
+    print('{}: {} converted, {} failed'.format(worker.owner, w_done, w_failed))
+    return((w_done, w_failed, 
+            (worker.counter.take() if worker.counter is not None else None, 
+             worker.metrics.take() if worker.metrics is not None else None)))
+
+
+def spoolProcess(job, queue=None):
+    """
+        spoolWork in a child process, the counts are put on queue (if any) at the end, 
+        the exit code is 1 if a file failed
+        [子プロセスでのspoolWork。計数は終了時にqueue（あれば）に置く。
+         ファイルが失敗すれば終了コードは1]
+    """
+    import signal
+    
+    # stopped by the parent only, so that the claims are put back once
+    # [確保を一度だけ戻すよう、親のみが停止させる]
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    (w_done, w_failed, w_counts) = spoolWork(job)
+    if queue is not None:
+        queue.put(w_counts)
+    sys.exit(1 if w_failed else 0)
+
+
+def cmdSpool(args):
+    """
+        run spool workers in child processes, they are stopped by SIGINT or SIGTERM, 
+        the hits and the metrics of all the workers are written when they end
+        [子プロセスでスプールのワーカーを動かす。SIGINTないしSIGTERMで停止する。
+         全ワーカーの一致数とメトリクスはその終了時に書き出す]
+    """
+    import multiprocessing
+    import queue
+    import signal
+    
+    # write the rule cache before the workers read it
+    # [ワーカーが読み込む前にルールキャッシュを書き込む]
+    ToneRules.shared()
+    
+    w_jobs = args.jobs or os.cpu_count() or 1
+    w_cache = (args.cache, args.cache_size << 20) if args.cache else None
+    job = (args.spool, args.output_dir, args.stale, args.poll, args.once,
+           args.trace, args.hits is not None, args.metrics is not None, w_cache, args.overlay)
+    counter = HitCounter(ToneRules.shared()) if args.hits else None
+    metrics = Metrics(args.metrics) if args.metrics else None
+    
+    def mergeCounts(counts):
+        # add the counts of a worker
+        # [ワーカーの計数を加える]
+        (w_hits, w_metrics) = counts
+        if counter is not None:
+            counter.merge(w_hits)
+        if metrics is not None:
+            metrics.merge(w_metrics)
+    
+    def writeCounts():
+        # write the counts of all the workers
+        # [全ワーカーの計数を書き出す]
+        if counter is not None:
+            counter.write(args.hits)
+        if metrics is not None:
+            metrics.write()
+    
+    if w_jobs == 1:
+        (w_done, w_failed, w_counts) = spoolWork(job)
+        mergeCounts(w_counts)
+        writeCounts()
+        return(1 if w_failed else 0)
+    
+    # the workers put their counts on the queue when they end, it is read 
+    # while they run, as a worker ends only once its counts are read
+    # [ワーカーは終了時に計数をキューに置く。ワーカーは計数が読まれて初めて終了するので、
+    #  動作中にキューを読む]
+    w_queue = multiprocessing.Queue() if counter is not None or metrics is not None else None
+    
+    def joinAll():
+        # wait for the workers to end, reading their counts
+        # [計数を読みながら、ワーカーの終了を待つ]
+        while w_queue is not None:
+            w_alive = any(w_proc.is_alive() for w_proc in w_procs)
+            try:
+                mergeCounts(w_queue.get(timeout=1.0 if w_alive else 0.1))
+            except queue.Empty:
+                if not w_alive:
+                    break
+        for w_proc in w_procs:
+            w_proc.join()
+    
+    # SIGTERM as SIGINT, the workers are terminated and put their claims back
+    # [SIGTERMはSIGINTと同様。ワーカーを終了させ、ワーカーは確保を戻す]
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    w_procs = [multiprocessing.Process(target=spoolProcess, args=(job, w_queue)) 
+               for i in range(w_jobs)]
+    for w_proc in w_procs:
+        w_proc.start()
+    try:
+        joinAll()
+    except KeyboardInterrupt:
+        for w_proc in w_procs:
+            w_proc.terminate()
+        joinAll()
+        writeCounts()
+        return(1)
+    writeCounts()
+    return(1 if any(w_proc.exitcode for w_proc in w_procs) else 0)
+
+
+def writeDiff(args, edits, names):
+    """
+        write the edits of the conversion to args.diff, side by side if args.side_by_side
+        [変換の編集をargs.diffに書き出す。args.side_by_sideなら左右に並べる]
+    """
+    if args.side_by_side:
+        w_lines = edits.sideBySide()
+    else:
+        w_lines = edits.unified(names)
+    if args.diff == '-':
+        f_diff = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', newline='')
+        f_diff.writelines(w_lines)
+        f_diff.flush()
+        f_diff.detach()
+    else:
+        with open(args.diff, 'w', encoding='utf-8', newline='') as f_diff:
+            f_diff.writelines(w_lines)
+    return(True)
+
+
+def main(argv=None):
+    """
+        command line, the clipboard is converted when no file is given
+        [コマンドライン。ファイルの指定が無ければクリップボードを変換する]
+    """
+    parser = argparse.ArgumentParser(
+        description='convert polite word to assertive one')
+    parser.add_argument('-i', '--input', 
+                        help='input file, - for stdin (default: clipboard)')
+    parser.add_argument('-o', '--output', 
+                        help='output file, - for stdout (default: clipboard)')
+    parser.add_argument('--trace', metavar='FILE', 
+                        help='append the rules that fired to FILE as JSON lines')
+    parser.add_argument('--mmap', action='store_true', 
+                        help='memory-map the input file, for very large files')
+    parser.add_argument('-j', '--jobs', type=int, default=1, 
+                        help='convert the input on JOBS workers, 0: all CPUs (default: %(default)s)')
+    parser.add_argument('--hits', metavar='FILE', 
+                        help='count the hits of each rule, write the hot and the dead rules to FILE as JSON')
+    parser.add_argument('--metrics', metavar='FILE', 
+                        help='record the phase latency and memory into the OpenMetrics textfile FILE')
+    parser.add_argument('--diff', metavar='FILE', 
+                        help='write the changes of the conversion to FILE as a unified diff, - for stdout')
+    parser.add_argument('--side-by-side', action='store_true', 
+                        help='write the --diff changes before and after side by side')
+    parser.add_argument('--jsonl', metavar='FIELD', action='append', 
+                        help='the input is JSON Lines, convert FIELD of each record '
+                             '(repeatable, a.b for nested keys)')
+    parser.add_argument('--markup', choices=('html', 'markdown'), 
+                        help='the input is HTML or Markdown, convert only the text outside the markup')
+    parser.add_argument('--overlay', metavar='FILE', action='append', 
+                        help='user dictionary of tab separated key and replacement over the built-in rules, '
+                             'reloaded when changed (repeatable, later files take precedence)')
+    parser.add_argument('--cache', action='store_true', 
+                        help='keep the converted sentences for the next runs in a SQLite database')
+    parser.add_argument('--cache-file', metavar='FILE', 
+                        help='database of --cache, and turn it on (default: {})'.format(SENTENCE_CACHE_FILE))
+    parser.add_argument('--cache-size', metavar='MB', type=int, default=256, 
+                        help='evict the least recently used sentences over MB (default: %(default)s)')
+    subparsers = parser.add_subparsers(dest='command')
+    
+    w_parser = subparsers.add_parser(
+        'batch', help='convert directory trees on a process pool')
+    w_parser.add_argument('paths', nargs='+', 
+                          help='directories, globs (** for subdirectories) or files')
+    w_parser.add_argument('-o', '--output-dir', 
+                          help='output tree (default: next to each input)')
+    w_parser.add_argument('-s', '--suffix', default='.assertive', 
+                          help='suffix of outputs next to the input (default: %(default)s)')
+    w_parser.add_argument('-p', '--pattern', default='*.txt', 
+                          help='file names taken from directories (default: %(default)s)')
+    w_parser.add_argument('-j', '--jobs', type=int, 
+                          help='worker processes (default: CPU count)')
+    
+    w_parser = subparsers.add_parser(
+        'check', help='report the polite forms left in files, without converting')
+    w_parser.add_argument('paths', nargs='+', 
+                          help='directories, globs (** for subdirectories) or files')
+    w_parser.add_argument('-p', '--pattern', default='*.txt', 
+                          help='file names taken from directories (default: %(default)s)')
+    w_parser.add_argument('-a', '--all', action='store_true', 
+                          help='report every polite form, not only the first of each file')
+    w_parser.add_argument('-j', '--jobs', type=int, 
+                          help='worker processes (default: CPU count)')
+    
+    w_parser = subparsers.add_parser(
+        'spool', help='convert the files of a spool directory shared by workers on several machines')
+    w_parser.add_argument('spool', 
+                          help='spool directory, the inputs are moved into its new/')
+    w_parser.add_argument('-o', '--output-dir', 
+                          help='output directory (default: out/ of the spool)')
+    w_parser.add_argument('-j', '--jobs', type=int, 
+                          help='worker processes (default: CPU count)')
+    w_parser.add_argument('--stale', metavar='SECONDS', type=float, default=300.0, 
+                          help='claims of a worker silent for SECONDS are converted again (default: %(default)s)')
+    w_parser.add_argument('--poll', metavar='SECONDS', type=float, default=1.0, 
+                          help='seconds between the looks at an empty new/ (default: %(default)s)')
+    w_parser.add_argument('--once', action='store_true', 
+                          help='exit when new/ is empty instead of waiting for more files')
+    
+    w_parser = subparsers.add_parser(
+        'serve', help='serve conversions on a Unix domain socket')
+    w_parser.add_argument('--socket', default=serverSocket(), 
+                          help='socket path (default: %(default)s)')
+    w_parser.add_argument('--incremental', action='store_true', 
+                          help='re-convert only the sentences changed since the previous request')
+    
+    args = parser.parse_args(argv)
+    
+    # path of the sentence cache, or None
+    # [文キャッシュのパス、ないしNone]
+    args.cache = args.cache_file or SENTENCE_CACHE_FILE if args.cache or args.cache_file else None
+    
+    # the overlay is checked here, before the workers load it
+    # [ワーカーが読み込む前に、ここでオーバーレイを検査する]
+    try:
+        overlay = UserOverlay(args.overlay) if args.overlay else None
+    except (OSError, ValueError) as e:
+        print(e, file=sys.stderr)
+        return(1)
+    if args.command == 'batch':
+        return(cmdBatch(args))
+    if args.command == 'spool':
+        return(cmdSpool(args))
+    if args.command == 'check':
+        if args.overlay:
+            print('check reports the forms of the built-in rules, use it without --overlay', 
+                  file=sys.stderr)
+            return(1)
+        return(cmdCheck(args))
+    metrics = Metrics(args.metrics) if args.metrics else None
+    cache = SentenceCache(args.cache, args.cache_size << 20) if args.cache else None
+    if args.command == 'serve':
+        w_mark = metrics.start() if metrics is not None else None
+        converter = ToneConverter(tracer=Tracer(args.trace) if args.trace else None, 
+                                  metrics=metrics, cache=cache, overlay=overlay)
+        if w_mark is not None:
+            metrics.stop(w_mark, 'rules')
+        if args.hits:
+            converter.counter = HitCounter(converter.rules)
+        w_ok = ToneServer(args.socket, IncrementalConverter(converter) 
+                          if args.incremental else converter, metrics).run()
+        if cache is not None:
+            cache.close()
+        if converter.counter is not None:
+            converter.counter.write(args.hits)
+        if metrics is not None:
+            metrics.write()
+        return(0 if w_ok else 1)
+    
+    # clipboard
+    # [クリップボード]
+    if args.input is None and args.output is None:
+        tracer = Tracer(args.trace) if args.trace else None
+        if tracer is not None:
+            tracer.source = '<clipboard>'
+        try:
+            cnv_tone = CnvTone(tracer=tracer, metrics=metrics, diff=bool(args.diff),     # convert tone
+                               cache=cache, overlay=overlay)
+        except ImportError as e:
+            print('{}, the clipboard needs it: pip install pyperclip'.format(e), file=sys.stderr)
+            return(1)
+        if args.hits and cnv_tone.getConverter() is not None:
+            cnv_tone.converter.counter = HitCounter(cnv_tone.converter.rules)
+        w_ok = cnv_tone.cnvTone()
+        if cache is not None:
+            cache.close()
+        if args.hits and cnv_tone.converter is not None:
+            cnv_tone.converter.counter.write(args.hits)
+        if metrics is not None:
+            metrics.write()
+        if args.diff and w_ok:
+            writeDiff(args, cnv_tone.edits, ('<clipboard>', '<clipboard>'))
+        return(0 if w_ok else 1)
+    
+    # files or pipes, read and written as they are (no newline translation)
+    # [ファイル、ないしパイプ。改行変換せずにそのまま読み書きする]
+    w_mark = metrics.start() if metrics is not None else None
+    try:
+        converter = ToneConverter(tracer=Tracer(args.trace) if args.trace else None, 
+                                  metrics=metrics, cache=cache, overlay=overlay)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return(1)
+    if w_mark is not None:
+        metrics.stop(w_mark, 'rules')
+    if converter.tracer is not None:
+        converter.tracer.source = args.input if args.input not in (None, '-') else '<stdin>'
+    if args.hits:
+        converter.counter = HitCounter(converter.rules)
+    
+    if args.diff and (args.mmap or args.jobs != 1 or args.jsonl):
+        print('--diff converts the whole input at once, use it without --mmap, --jobs and --jsonl', 
+              file=sys.stderr)
+        return(1)
+    if args.diff == '-' and args.output in (None, '-'):
+        print('--diff - writes the diff to stdout, give the converted text -o FILE', file=sys.stderr)
+        return(1)
+    if args.jsonl and args.mmap:
+        print('--jsonl reads the records as text, use it without --mmap', file=sys.stderr)
+        return(1)
+    if args.markup and (args.mmap or args.jobs != 1 or args.jsonl or args.diff):
+        print('--markup streams the input on one worker, use it without --mmap, --jobs, --jsonl and --diff', 
+              file=sys.stderr)
+        return(1)
+    
+    if args.overlay and args.mmap:
+        print('--mmap searches the built-in rules only, use --overlay without it', file=sys.stderr)
+        return(1)
+    
+    if args.mmap:
+        # very large file, memory-mapped and converted as bytes
+        # [非常に大きいファイル。メモリマップしてバイト列として変換する]
+        if args.jobs != 1:
+            print('--mmap converts on one worker, use --jobs without it', file=sys.stderr)
+            return(1)
+        if args.input in (None, '-'):
+            print('--mmap needs an input file', file=sys.stderr)
+            return(1)
+        if args.output in (None, '-'):
+            f_out = sys.stdout.buffer
+        else:
+            f_out = open(args.output, 'wb', buffering=1 << 20)
+        with f_out:
+            w_ok = converter.cnvMapped(args.input, f_out)
+    elif args.markup:
+        # text between the markup, as bytes
+        # [マークアップの間のテキスト。バイト列として]
+        if args.input in (None, '-'):
+            f_in = sys.stdin.buffer
+        else:
+            f_in = open(args.input, 'rb')
+        if args.output in (None, '-'):
+            f_out = sys.stdout.buffer
+        else:
+            f_out = open(args.output, 'wb', buffering=1 << 20)
+        with f_in, f_out:
+            w_ok = converter.cnvMarkup(f_in, f_out, args.markup)
+    else:
+        if args.input in (None, '-'):
+            f_in = io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8', newline='')
+        else:
+            f_in = open(args.input, encoding='utf-8', newline='')
+        if args.output in (None, '-'):
+            f_out = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', newline='')
+        else:
+            f_out = open(args.output, 'w', encoding='utf-8', newline='')
+        
+        with f_in, f_out:
+            if args.diff:
+                # the whole input, for the context lines of the diff
+                # [差分のcontext行のため入力全体]
+                text = f_in.read()
+                edits = EditLog(text)
+                f_out.write(converter.convert(text, edits=edits))
+                w_ok = True
+            elif args.jsonl:
+                try:
+                    w_ok = converter.cnvJsonl(f_in, f_out, [tuple(w.split('.')) for w in args.jsonl], 
+                                              args.jobs)
+                except ValueError as e:
+                    print('{}: {}'.format(args.input if args.input not in (None, '-') else '<stdin>', e), 
+                          file=sys.stderr)
+                    w_ok = False
+            elif args.jobs != 1:
+                w_ok = converter.cnvParallel(f_in, f_out, args.jobs)
+            else:
+                w_ok = converter.cnvStream(f_in, f_out)
+        if args.diff:
+            writeDiff(args, edits, (args.input if args.input not in (None, '-') else '<stdin>', 
+                                    args.output if args.output not in (None, '-') else '<stdout>'))
+    
+    if cache is not None:
+        cache.close()
+    if converter.counter is not None:
+        converter.counter.write(args.hits)
+    if metrics is not None:
+        metrics.write()
+    return(0 if w_ok else 1)
+
+
+if __name__ == '__main__':
+    
+    exit(main())
\ No newline at end of file
@@ -0,0 +1,673 @@
+# -*- coding:utf-8 -*-
+# test_politeWordToAssertiveOne.py
+
+"""
+    Compatibility of ToneConverter with the original str.replace loop, 
+    the conversion modes against convert, and the startup of the module.
+    [ToneConverterと元のstr.replaceのループとの互換性、各変換モードとconvertとの一致、
+     及びモジュールの起動。]
+    
+    Usage,
+        python -m unittest test_politeWordToAssertiveOne
+"""
+
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import random
+import re
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+import unittest.mock
+
+import politeWordToAssertiveOne
+
+
+# milliseconds allowed for the import and the first conversion of a one-line input
+# [インポートと一行の入力の最初の変換に許すミリ秒]
+STARTUP_BUDGET = 150
+
+# fresh interpreter of the startup test, prints the seconds of the import and 
+# the first conversion, and whether pyperclip was imported
+# [起動のテスト用の新しいインタープリタ。インポートと最初の変換の秒数、
+#  及びpyperclipをインポートしたかを出力する]
+STARTUP_CODE = '''
+import sys, time
+w_start = time.perf_counter()
+import politeWordToAssertiveOne
+politeWordToAssertiveOne.convert('この設定を確認して下さい。')
+print(time.perf_counter() - w_start, 'pyperclip' in sys.modules)
+'''
+
+
+def readSample(name):
+    """
+        text of a sample file next to this one, with its line ends
+        [このファイルの隣のサンプルファイルのテキスト。行末はそのまま]
+    """
+    w_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), name)
+    with open(w_path, encoding='utf-8', newline='') as f:
+        return(f.read())
+
+
+def legacyConvert(rules, text):
+    """
+        convert as the original CnvTone.cnvForced and CnvTone.cnvCoditional
+        [元のCnvTone.cnvForced及びCnvTone.cnvCoditionalと同様に変換する]
+    """
+    # expanded conversion dict, replaced key by key in order
+    # [展開した変換dict。キー毎に順に置き換える]
+    dct_cnv = {}
+    for k_fchg in rules.dct_fchg:
+        dct_cnv[k_fchg] = rules.dct_fchg[k_fchg]
+    for k_wgrp in rules.dct_wgrp1:
+        w_schg = rules.dct_wgrp1[k_wgrp]['語変']
+        endp_dct = rules.dct_wchg[rules.dct_wgrp1[k_wgrp]['変化']]
+        for w_stem in rules.dct_wgrp1[k_wgrp]['語幹']:
+            for polite_end in endp_dct:
+                if '変語幹' in rules.dct_wgrp1[k_wgrp]:
+                    dct_cnv[w_stem + w_schg + polite_end] = endp_dct[polite_end]
+                else:
+                    dct_cnv[w_stem + w_schg + polite_end] = w_stem + endp_dct[polite_end]
+    for k_tail in rules.dct_tail:
+        dct_cnv[k_tail] = rules.dct_tail[k_tail]
+    for k in dct_cnv:
+        text = text.replace(k, dct_cnv[k])
+    
+    # kanji-conditional particles, found and replaced group by group
+    # [漢字条件の助詞。グループ毎に見つけて置き換える]
+    dct_cnv2 = {}
+    for k_wgrp in rules.dct_wgrp2:
+        w_schg = rules.dct_wgrp2[k_wgrp]['語変']
+        endp_dct = rules.dct_wchg[rules.dct_wgrp2[k_wgrp]['変化']]
+        endp_dct2 = rules.dct_wchg[rules.dct_wgrp2[k_wgrp]['漢字']['変化']]
+        for w_stem in rules.dct_wgrp2[k_wgrp]['語幹']:
+            for polite_end in endp_dct:
+                w_pattern = re.compile('([\u4E00-\u9FD0])' + '(' + w_stem + w_schg + polite_end + ')')
+                for (kanji, particle) in re.findall(w_pattern, text):
+                    dct_cnv2[kanji + particle] = kanji + endp_dct2[polite_end]
+        for k in dct_cnv2:
+            text = text.replace(k, dct_cnv2[k])
+    return(text)
+
+
+class CompatibilityTest(unittest.TestCase):
+    """
+        ToneConverter.convert gives the same text as the original loop
+        [ToneConverter.convertは元のループと同じテキストを返す]
+    """
+    
+    @classmethod
+    def setUpClass(cls):
+        cls.converter = politeWordToAssertiveOne.ToneConverter()
+        cls.rules = cls.converter.rules
+    
+    def assertSame(self, text):
+        self.assertEqual(self.converter.convert(text), legacyConvert(self.rules, text))
+    
+    def test_polite(self):
+        self.assertSame(readSample('polite.txt'))
+    
+    def test_assertive(self):
+        self.assertSame(readSample('assertive.txt'))
+    
+    def test_dense(self):
+        # every line holds several keys, so many rules fire on each piece
+        # [全ての行がキーを複数含むので、各断片で多くのルールが適用される]
+        rules = self.rules
+        w_stems = []
+        for k_wgrp in rules.dct_wgrp1:
+            w_schg = rules.dct_wgrp1[k_wgrp]['語変']
+            w_ends = list(rules.dct_wchg[rules.dct_wgrp1[k_wgrp]['変化']])
+            w_stems += [w_stem + w_schg + w_end
+                        for w_stem in rules.dct_wgrp1[k_wgrp]['語幹'] for w_end in w_ends]
+        w_others = list(rules.dct_fchg) + list(rules.dct_tail)
+        rnd = random.Random(2)
+        self.assertSame(''.join('説明の通り{}。{}と{}\n'.format(
+            rnd.choice(w_stems), rnd.choice(w_stems), rnd.choice(w_others)) for i in range(5000)))
+    
+    def test_keys(self):
+        # texts built from the keys of the rules, their pieces, kanji and separators,
+        # so that keys overlap and replacements create later keys
+        # [ルールのキー、その断片、漢字と区切りから作るテキスト。キーが重なり、
+        #  置換が後のキーを生じるように]
+        rules = self.rules
+        w_keys = list(rules.dct_fchg) + list(rules.dct_tail) + list(rules.dct_cnv2)
+        for k_wgrp in rules.dct_wgrp1:
+            w_schg = rules.dct_wgrp1[k_wgrp]['語変']
+            w_ends = list(rules.dct_wchg[rules.dct_wgrp1[k_wgrp]['変化']])
+            w_keys += [w_stem + w_schg + w_end
+                       for w_stem in rules.dct_wgrp1[k_wgrp]['語幹'] for w_end in w_ends]
+        w_values = list(rules.dct_fchg.values()) + list(rules.dct_tail.values())
+        w_extra = ['確認', '漢字', '説明', '。', '\n', '、', 'て', 'し', 'ます', 'です', 'abc']
+        
+        rnd = random.Random(1)
+        for i in range(2000):
+            w_parts = []
+            for j in range(rnd.randint(1, 12)):
+                w_pick = rnd.random()
+                if w_pick < 0.5:
+                    w_part = rnd.choice(w_keys)
+                elif w_pick < 0.7:
+                    w_part = rnd.choice(w_values)
+                else:
+                    w_part = rnd.choice(w_extra)
+                if rnd.random() < 0.2:
+                    w_part = w_part[rnd.randint(0, len(w_part)):]
+                w_parts.append(w_part)
+            with self.subTest(text=''.join(w_parts)):
+                self.assertSame(''.join(w_parts))
+
+
+class StreamTest(unittest.TestCase):
+    """
+        the conversion modes give the same text as convert of the whole
+        [各変換モードは全体をconvertした場合と同じテキストを返す]
+    """
+    
+    @classmethod
+    def setUpClass(cls):
+        cls.converter = politeWordToAssertiveOne.ToneConverter()
+        
+        # CRLF line ends, and characters of three and four UTF-8 bytes
+        # [CRLFの行末、及びUTF-8で3バイトと4バイトの文字]
+        cls.text = readSample('polite.txt') + '𠮷野家の説明です。\r\n確認して下さい\r\n\r\n𠮷'
+        cls.expect = cls.converter.convert(cls.text)
+    
+    def test_stream(self):
+        # the bytes are decoded as they are read, so the chunks end anywhere
+        # [バイト列は読みながらデコードするので、チャンクはどこででも終わる]
+        w_data = self.text.encode('utf-8')
+        for chunk_size in (1, 3, 7):
+            with self.subTest(chunk_size=chunk_size):
+                f_in = io.TextIOWrapper(io.BytesIO(w_data), encoding='utf-8', newline='')
+                f_out = io.StringIO(newline='')
+                self.converter.cnvStream(f_in, f_out, chunk_size)
+                self.assertEqual(f_out.getvalue(), self.expect)
+    
+    def test_chunks(self):
+        # every chunk but the last ends after a stop character
+        # [最後以外の全てのチャンクは区切り文字の後で終わる]
+        for chunk_size in (1, 3, 7):
+            w_chunks = list(self.converter.cutChunks(io.StringIO(self.text, newline=''), chunk_size))
+            self.assertEqual(''.join(text for (text, w_base) in w_chunks), self.text)
+            for (text, w_base) in w_chunks[:-1]:
+                self.assertEqual(self.text[w_base:w_base + len(text)], text)
+                self.assertTrue(self.converter.isStop(text[-1]))
+    
+    def test_parallel(self):
+        # small chunks, so that every worker converts several
+        # [小さなチャンク。各ワーカーが複数を変換するように]
+        f_out = io.StringIO(newline='')
+        self.converter.cnvParallel(io.StringIO(self.text, newline=''), f_out, 2, 64)
+        self.assertEqual(f_out.getvalue(), self.expect)
+        
+        # -j N of the command line
+        # [コマンドラインの-j N]
+        with tempfile.TemporaryDirectory() as w_dir:
+            (w_in, w_out) = (os.path.join(w_dir, 'in.txt'), os.path.join(w_dir, 'out.txt'))
+            with open(w_in, 'w', encoding='utf-8', newline='') as f:
+                f.write(self.text)
+            self.assertEqual(politeWordToAssertiveOne.main(['-i', w_in, '-o', w_out, '-j', '2']), 0)
+            with open(w_out, encoding='utf-8', newline='') as f:
+                self.assertEqual(f.read(), self.expect)
+    
+    def test_mapped(self):
+        # the sample, and a text without newlines, on small windows too
+        # [サンプル、及び改行の無いテキスト。小さなウィンドウでも]
+        w_flat = self.text.replace('\r\n', '') * 50
+        converter = politeWordToAssertiveOne.ToneConverter()
+        w_sizes = []
+        
+        def convert(text, base=0):
+            w_sizes.append(len(text))
+            return(politeWordToAssertiveOne.ToneConverter.convert(converter, text, base))
+        converter.convert = convert
+        
+        with tempfile.TemporaryDirectory() as w_dir:
+            w_path = os.path.join(w_dir, 'in.txt')
+            for (text, window) in ((self.text, 1 << 20), (self.text, 64), (w_flat, 1 << 20), (w_flat, 64)):
+                with self.subTest(flat=text is w_flat, window=window):
+                    with open(w_path, 'w', encoding='utf-8', newline='') as f:
+                        f.write(text)
+                    f_out = io.BytesIO()
+                    del w_sizes[:]
+                    converter.cnvMapped(w_path, f_out, window)
+                    self.assertEqual(f_out.getvalue().decode('utf-8'), self.converter.convert(text))
+                    
+                    # the decoded regions stay near the window, with or without newlines
+                    # [デコードする範囲は改行の有無に依らずウィンドウ程度に留まる]
+                    self.assertLessEqual(max(w_sizes), 2 * window + 1024)
+    
+    def test_edits(self):
+        # the edits, applied to the source, give the converted text
+        # [編集を元テキストに適用すると変換結果となる]
+        for text in (self.text, self.text * 3, '', 'です'):
+            edits = politeWordToAssertiveOne.EditLog(text)
+            w_result = self.converter.convert(text, edits=edits)
+            self.assertEqual(w_result, self.converter.convert(text))
+            
+            w_parts = []
+            pos = 0
+            for (offset, original, replacement, w_rules) in edits.edits():
+                self.assertGreaterEqual(offset, pos)
+                self.assertEqual(text[offset:offset + len(original)], original)
+                self.assertTrue(w_rules)
+                w_parts += [text[pos:offset], replacement]
+                pos = offset + len(original)
+            w_parts.append(text[pos:])
+            self.assertEqual(''.join(w_parts), w_result)
+    
+    def test_incremental(self):
+        # edits inserting, deleting and replacing text, across the segment ends too
+        # [テキストを挿入・削除・置換する編集。分割の終わりを跨ぐものも]
+        incremental = politeWordToAssertiveOne.IncrementalConverter(self.converter)
+        w_inserts = ['です', 'ます。', '下さい', '\r\n', '確認して', '𠮷', '']
+        rnd = random.Random(4)
+        text = self.text
+        self.assertEqual(incremental.convert(text), self.expect)
+        for i in range(200):
+            start = rnd.randint(0, len(text))
+            end = min(start + rnd.choice([0, 0, 1, 2, 5, 30]), len(text))
+            text = text[:start] + rnd.choice(w_inserts) + text[end:]
+            with self.subTest(edit=i):
+                self.assertEqual(incremental.convert(text), self.converter.convert(text))
+
+
+class RecordTest(unittest.TestCase):
+    """
+        cnvJsonl converts only the given fields, and keeps the rest of the records
+        [cnvJsonlは指定のフィールドのみを変換し、レコードの残りは保つ]
+    """
+    
+    @classmethod
+    def setUpClass(cls):
+        cls.converter = politeWordToAssertiveOne.ToneConverter()
+    
+    def test_records(self):
+        w_quote = lambda w: json.dumps(w, ensure_ascii=False)
+        w_values = ['説明です。', '確認して下さい', 'します']
+        w_record = '{{"id":1,"text":{},"meta":{{"title":{},"tags":[{},"x",3]}},"other":"です"}}\r\n'
+        w_lines = [
+            w_record.format(*map(w_quote, w_values)),
+            '\n',
+            # unchanged records, with spaces and escapes, and without the fields
+            # [変わらないレコード。空白とエスケープを含むもの、フィールドの無いもの]
+            '{"id": 2, "text": "abc \\u3042\\u308b", "meta": {"title": ["x"]}}\n',
+            '{"id":3,"other":"です","meta":"します"}\n',
+            '{"id":4,"text":"確認します"}']
+        w_expect = list(w_lines)
+        w_expect[0] = w_record.format(*(w_quote(self.converter.convert(w)) for w in w_values))
+        w_expect[4] = '{"id":4,"text":' + w_quote(self.converter.convert('確認します')) + '}'
+        
+        w_fields = [('text',), ('meta', 'title'), ('meta', 'tags')]
+        self.assertEqual(self.converter.cnvRecords(w_lines, w_fields), w_expect)
+        
+        # in batches of a few records, on workers too
+        # [数レコードのバッチで。ワーカーでも]
+        for jobs in (1, 2):
+            with self.subTest(jobs=jobs):
+                f_out = io.StringIO(newline='')
+                self.converter.cnvJsonl(io.StringIO('\n'.join([''.join(w_lines)] * 50), newline=''),
+                                        f_out, w_fields, jobs, 64)
+                self.assertEqual(f_out.getvalue(), '\n'.join([''.join(w_expect)] * 50))
+
+
+class MarkupTest(unittest.TestCase):
+    """
+        the markup passes through cnvMarkup byte for byte, and only the text is converted
+        [マークアップはcnvMarkupをバイト単位でそのまま通過し、テキストのみ変換する]
+    """
+    
+    @classmethod
+    def setUpClass(cls):
+        cls.converter = politeWordToAssertiveOne.ToneConverter()
+    
+    def assertMarkup(self, kind, pieces, chunk_sizes=(7, 256, 1 << 16)):
+        # pieces are (is text, str), the text between two pieces of markup converts on its own
+        # [piecesは（テキストか, str）。二つのマークアップの間のテキストは単独で変換する]
+        w_data = ''.join(piece for (w_text, piece) in pieces).encode('utf-8')
+        w_expect = ''.join(self.converter.convert(piece) if w_text else piece
+                           for (w_text, piece) in pieces)
+        for chunk_size in chunk_sizes:
+            with self.subTest(kind=kind, chunk_size=chunk_size):
+                f_out = io.BytesIO()
+                self.converter.cnvMarkup(io.BytesIO(w_data), f_out, kind, chunk_size)
+                self.assertEqual(f_out.getvalue().decode('utf-8'), w_expect)
+    
+    def test_html(self):
+        self.assertMarkup('html', [
+            (False, '<p title="説明です" data-x=\'します\'>'), (True, '𠮷野家の説明です。\r\n確認して下さい'),
+            (False, '</p><!-- 確認して下さい -->'), (True, '\r\n'),
+            (False, '<script>var s = "<b>します</b>";</script>'), (True, '使用します'),
+            (False, '&amp;'), (True, 'です。'), (False, '<pre>\r\nします\r\n</pre>')])
+    
+    def test_markdown(self):
+        self.assertMarkup('markdown', [
+            (True, '# 説明です\n\n'), (False, '`します`'), (True, 'と確認して下さい。['),
+            (False, '](https://example.com/します)'), (True, '\n\n'),
+            (False, '```\nです。\nします\n```\n'), (True, '\n使用します\n\n'),
+            (False, '    インデントです\n'), (True, '\n以上です。\n')])
+    
+    def test_minified(self):
+        # text without 。 and newlines is converted in parts cut after stop characters
+        # [「。」と改行の無いテキストは区切り文字の後で切った部分毎に変換する]
+        converter = politeWordToAssertiveOne.ToneConverter()
+        w_sizes = []
+        
+        def convert(text, base=0):
+            w_sizes.append(len(text.encode('utf-8')))
+            return(politeWordToAssertiveOne.ToneConverter.convert(converter, text, base))
+        converter.convert = convert
+        
+        text = '設定を確認して下さい、変更します、' * 3000
+        w_data = ('<html><body><p class="x">' + text + '</p></body></html>').encode('utf-8')
+        f_out = io.BytesIO()
+        converter.cnvMarkup(io.BytesIO(w_data), f_out, 'html', 256)
+        self.assertEqual(f_out.getvalue().decode('utf-8'),
+                         '<html><body><p class="x">' + self.converter.convert(text) + '</p></body></html>')
+        self.assertLessEqual(max(w_sizes), 2 * 256)
+
+
+class OverlayTest(unittest.TestCase):
+    """
+        the user overlay takes precedence over the built-in rules, and is reloaded when changed
+        [ユーザーオーバーレイは組み込みルールに優先し、変更されれば読み直す]
+    """
+    
+    def setUp(self):
+        w_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(w_dir.cleanup)
+        self.paths = [os.path.join(w_dir.name, name) for name in ('a.tsv', 'b.tsv')]
+        self.write(0, '説明です\tA\nします\tB\n')
+        self.write(1, '説明です\tC\n# コメント\n確認して下さい\t確認して下さい\n')
+        self.plain = politeWordToAssertiveOne.ToneConverter()
+    
+    def write(self, i, text):
+        with open(self.paths[i], 'w', encoding='utf-8', newline='') as f:
+            f.write(text)
+    
+    def expect(self, pieces):
+        # pieces are (is a key, str), the text between the keys converts on its own
+        # [piecesは（キーか, str）。キーの間のテキストは単独で変換する]
+        return(''.join(piece if w_key else self.plain.convert(piece) for (w_key, piece) in pieces))
+    
+    def test_overlay(self):
+        converter = politeWordToAssertiveOne.ToneConverter(
+            overlay=politeWordToAssertiveOne.UserOverlay(self.paths))
+        incremental = politeWordToAssertiveOne.IncrementalConverter(converter)
+        text = 'この説明です。確認して下さい。使用します。設定を変更して下さい。\n'
+        w_expect = self.expect([(False, 'この'), (True, 'C'), (False, '。'), (True, '確認して下さい'),
+                                (False, '。使用'), (True, 'B'), (False, '。設定を変更して下さい。\n')])
+        self.assertEqual(converter.convert(text), w_expect)
+        self.assertEqual(incremental.convert(text), w_expect)
+        
+        # a changed file is reloaded, and the cached segments are dropped
+        # [変更されたファイルは読み直し、キャッシュした分割は破棄する]
+        time.sleep(2 * politeWordToAssertiveOne.UserOverlay.CHECK_INTERVAL)
+        self.write(1, '説明です\tD\n')
+        time.sleep(2 * politeWordToAssertiveOne.UserOverlay.CHECK_INTERVAL)
+        w_expect = self.expect([(False, 'この'), (True, 'D'), (False, '。確認して下さい。使用'),
+                                (True, 'B'), (False, '。設定を変更して下さい。\n')])
+        self.assertEqual(converter.convert(text), w_expect)
+        self.assertEqual(incremental.convert(text), w_expect)
+        
+        # a file that can not be loaded keeps the previous overlay
+        # [読み込めないファイルは前のオーバーレイを残す]
+        self.write(1, 'タブの無い行\n')
+        time.sleep(2 * politeWordToAssertiveOne.UserOverlay.CHECK_INTERVAL)
+        with contextlib.redirect_stderr(io.StringIO()) as w_err:
+            self.assertEqual(converter.convert(text), w_expect)
+        self.assertIn('the previous overlay is kept', w_err.getvalue())
+
+
+class CacheTest(unittest.TestCase):
+    """
+        the sentences are taken from the SentenceCache, until the rules change
+        [文はSentenceCacheから取る。ルールが変わるまで]
+    """
+    
+    def setUp(self):
+        w_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(w_dir.cleanup)
+        self.path = os.path.join(w_dir.name, 'sentences.sqlite3')
+        
+        # the rule cache of the changed rules is written here
+        # [変更したルールのルールキャッシュはここに書き込む]
+        w_patch = unittest.mock.patch.object(politeWordToAssertiveOne, 'RULE_CACHE_FILE',
+                                             os.path.join(w_dir.name, 'rules.marshal'))
+        w_patch.start()
+        self.addCleanup(w_patch.stop)
+    
+    def convert(self, text, rules=None):
+        cache = politeWordToAssertiveOne.SentenceCache(self.path)
+        try:
+            return(politeWordToAssertiveOne.ToneConverter(rules, cache=cache).convert(text))
+        finally:
+            cache.close()
+    
+    def test_cache(self):
+        text = readSample('polite.txt')
+        sentence = 'manはシステムの手動ページャです。'
+        converter = politeWordToAssertiveOne.ToneConverter()
+        self.assertEqual(self.convert(text), converter.convert(text))
+        
+        # a sentence found is not converted again
+        # [見つかった文は再度変換しない]
+        with contextlib.closing(sqlite3.connect(self.path)) as db:
+            with db:
+                db.execute('UPDATE sentences SET result = ?', ('cached',))
+        self.assertEqual(self.convert(sentence + '\n'), 'cached\n')
+        
+        # the sentences of other rules are deleted
+        # [他のルールの文は削除する]
+        rules = politeWordToAssertiveOne.ToneRules()
+        rules.dct_tail = dict(rules.dct_tail, でございます='である')
+        self.assertEqual(self.convert(sentence + '\n', rules),
+                         politeWordToAssertiveOne.ToneConverter(rules).convert(sentence + '\n'))
+        self.assertEqual(self.convert(sentence + '\n'), converter.convert(sentence + '\n'))
+    
+    def test_command(self):
+        # the switch does not take the subcommand for its file, check finds the polite forms
+        # [スイッチはサブコマンドをそのファイルとしない。checkは丁寧語形を見つける]
+        w_out = io.StringIO()
+        with contextlib.redirect_stdout(w_out), contextlib.redirect_stderr(io.StringIO()):
+            self.assertEqual(politeWordToAssertiveOne.main(
+                ['--cache', 'check', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'polite.txt')]), 1)
+        self.assertIn('polite.txt:1:', w_out.getvalue())
+        
+        w_in = os.path.join(os.path.dirname(self.path), 'in.txt')
+        w_path = os.path.join(os.path.dirname(self.path), 'out.txt')
+        with open(w_in, 'w', encoding='utf-8', newline='') as f:
+            f.write(readSample('polite.txt'))
+        for i in range(2):
+            self.assertEqual(politeWordToAssertiveOne.main(
+                ['--cache-file', self.path, '-i', w_in, '-o', w_path]), 0)
+            with open(w_path, encoding='utf-8', newline='') as f:
+                self.assertEqual(f.read(), politeWordToAssertiveOne.convert(readSample('polite.txt')))
+        self.assertTrue(os.path.exists(self.path))
+
+
+class CheckTest(unittest.TestCase):
+    """
+        the check subcommand reports the polite forms left as file:line:column: form
+        [checkサブコマンドは残った丁寧語形をファイル:行:桁: 形として報告する]
+    """
+    
+    def setUp(self):
+        w_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(w_dir.cleanup)
+        self.dir = w_dir.name
+        for name in ('polite.txt', 'assertive.txt'):
+            with open(os.path.join(self.dir, name), 'w', encoding='utf-8', newline='') as f:
+                f.write(readSample(name))
+        with open(os.path.join(self.dir, 'converted.txt'), 'w', encoding='utf-8', newline='') as f:
+            f.write(politeWordToAssertiveOne.convert(readSample('polite.txt')))
+    
+    def check(self, *argv):
+        # exit code and the lines written to stdout, the paths are relative to the directory
+        # [終了コードと標準出力に書いた行。パスはディレクトリからの相対とする]
+        w_out = io.StringIO()
+        with contextlib.redirect_stdout(w_out), contextlib.redirect_stderr(io.StringIO()):
+            w_code = politeWordToAssertiveOne.main(
+                ['check'] + [os.path.join(self.dir, w) if w.endswith('.txt') else w for w in argv])
+        return((w_code, w_out.getvalue().replace(self.dir + os.sep, '').splitlines()))
+    
+    def test_check(self):
+        self.assertEqual(self.check('polite.txt'), (1, ['polite.txt:1:16: です']))
+        self.assertEqual(self.check('-a', 'polite.txt'), (1, [
+            'polite.txt:1:16: です', 'polite.txt:2:39: です', 'polite.txt:3:34: されます',
+            'polite.txt:4:43: 指示します', 'polite.txt:5:211: 表示します']))
+        
+        # the sample assertive.txt keeps the polite forms of its first lines
+        # [サンプルのassertive.txtは最初の行の丁寧語形を残している]
+        self.assertEqual(self.check('-a', 'assertive.txt'),
+                         (1, ['assertive.txt:1:16: です', 'assertive.txt:2:39: です']))
+        self.assertEqual(self.check('converted.txt'), (0, []))
+        
+        # on workers, and with a file that can not be read
+        # [ワーカーで、及び読めないファイルと共に]
+        self.assertEqual(self.check('-j', '2', 'converted.txt', 'polite.txt'),
+                         (1, ['polite.txt:1:16: です']))
+        self.assertEqual(self.check('missing.txt', 'converted.txt'), (2, []))
+
+
+class SpoolTest(unittest.TestCase):
+    """
+        the files of a spool are claimed by one worker, recovered when stale, and converted once
+        [スプールのファイルは一つのワーカーが確保し、古くなれば戻し、一度だけ変換する]
+    """
+    
+    def setUp(self):
+        w_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(w_dir.cleanup)
+        self.spool = w_dir.name
+        os.makedirs(os.path.join(self.spool, 'new'))
+        politeWordToAssertiveOne.batchInit()
+    
+    def put(self, name, data):
+        # written elsewhere first, then moved into new/
+        # [先に別の場所に書き、次にnew/に移す]
+        w_tmp = os.path.join(self.spool, '.' + name)
+        with open(w_tmp, 'wb') as f:
+            f.write(data)
+        os.rename(w_tmp, os.path.join(self.spool, 'new', name))
+    
+    def listDir(self, *names):
+        return(sorted(os.listdir(os.path.join(self.spool, *names))))
+    
+    def test_claim(self):
+        worker = politeWordToAssertiveOne.SpoolWorker(self.spool)
+        w_other = politeWordToAssertiveOne.SpoolWorker(self.spool)
+        w_other.work_dir = os.path.join(self.spool, 'work', w_other.host + '.other')
+        text = readSample('polite.txt')
+        self.put('a.txt', text.encode('utf-8'))
+        self.put('b.txt', b'\xff\xfe\xe3\x81\xa7\xe3\x81\x99')
+        
+        # one claim of a file succeeds
+        # [あるファイルの確保は一つのみ成功する]
+        (w_first, w_second) = (worker.claim(), w_other.claim())
+        self.assertEqual(sorted([w_first, w_second]), ['a.txt', 'b.txt'])
+        self.assertIsNone(worker.claim())
+        self.assertIsNone(w_other.claim())
+        self.assertEqual(self.listDir('new'), [])
+        
+        self.assertTrue((worker if w_first == 'a.txt' else w_other).convert('a.txt'))
+        with contextlib.redirect_stderr(io.StringIO()):
+            self.assertFalse((worker if w_first == 'b.txt' else w_other).convert('b.txt'))
+        with open(os.path.join(self.spool, 'out', 'a.txt'), encoding='utf-8', newline='') as f:
+            self.assertEqual(f.read(), politeWordToAssertiveOne.convert(text))
+        with open(os.path.join(self.spool, 'out', 'a.txt.done'), encoding='utf-8') as f:
+            self.assertEqual(json.loads(f.read())['source'], 'a.txt')
+        self.assertEqual(self.listDir('out'), ['a.txt', 'a.txt.done'])
+        self.assertEqual(self.listDir('done'), ['a.txt'])
+        self.assertEqual(self.listDir('failed'), ['b.txt'])
+    
+    def test_recover(self):
+        worker = politeWordToAssertiveOne.SpoolWorker(self.spool, stale=60.0)
+        
+        # a dead process of this host, a stale directory of another host, 
+        # and a live process of this host
+        # [このホストの終了したプロセス、他のホストの古いディレクトリ、及び
+        #  このホストの動いているプロセス]
+        w_proc = subprocess.run([sys.executable, '-c', 'import os; print(os.getpid())'],
+                                capture_output=True, encoding='utf-8', check=True)
+        w_owners = {'dead': '{}.{}'.format(worker.host, w_proc.stdout.strip()),
+                    'stale': 'elsewhere.example.1',
+                    'live': '{}.{}'.format(worker.host, os.getppid())}
+        for (w_kind, w_owner) in w_owners.items():
+            os.makedirs(os.path.join(self.spool, 'work', w_owner))
+            with open(os.path.join(self.spool, 'work', w_owner, w_kind + '.txt'), 'w') as f:
+                f.write('です。')
+        os.utime(os.path.join(self.spool, 'work', w_owners['stale']), (0, 0))
+        
+        self.assertEqual(worker.recover(), 2)
+        self.assertEqual(self.listDir('new'), ['dead.txt', 'stale.txt'])
+        self.assertEqual(self.listDir('work'), [w_owners['live']])
+        
+        # once converts the recovered files, the claims of the live one stay
+        # [onceは戻したファイルを変換し、動いているものの確保は残る]
+        self.assertEqual(worker.run(once=True), (2, 0))
+        self.assertEqual(self.listDir('out'), ['dead.txt', 'dead.txt.done', 'stale.txt', 'stale.txt.done'])
+        self.assertEqual(self.listDir('work'), [w_owners['live']])
+    
+    def test_processes(self):
+        # every file is converted by exactly one of the workers
+        # [各ファイルはいずれか一つのワーカーがちょうど一度変換する]
+        w_names = ['{:03d}.txt'.format(i) for i in range(60)]
+        for (i, w_name) in enumerate(w_names):
+            self.put(w_name, '{}番目の説明です。確認して下さい。\n'.format(i).encode('utf-8'))
+        job = (self.spool, None, 300.0, 0.01, True, None, False, False, None, None)
+        with contextlib.redirect_stdout(io.StringIO()):
+            with multiprocessing.Pool(3) as pool:
+                w_results = pool.map(politeWordToAssertiveOne.spoolWork, [job] * 3, 1)
+        
+        self.assertEqual(sum(w_done for (w_done, w_failed, w_counts) in w_results), len(w_names))
+        self.assertEqual(sum(w_failed for (w_done, w_failed, w_counts) in w_results), 0)
+        self.assertEqual(self.listDir('new'), [])
+        self.assertEqual(self.listDir('work'), [])
+        self.assertEqual(self.listDir('done'), w_names)
+        self.assertEqual(self.listDir('out'), sorted(w_names + [w + '.done' for w in w_names]))
+        for (i, w_name) in enumerate(w_names):
+            with open(os.path.join(self.spool, 'out', w_name), encoding='utf-8') as f:
+                self.assertEqual(f.read(), politeWordToAssertiveOne.convert(
+                    '{}番目の説明です。確認して下さい。\n'.format(i)))
+
+
+class StartupTest(unittest.TestCase):
+    """
+        the module starts within the budget, and without the clipboard
+        [モジュールは予算内に、クリップボード無しで起動する]
+    """
+    
+    def runStartup(self, env):
+        w_proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', STARTUP_CODE],
+                                cwd=os.path.dirname(os.path.abspath(__file__)), env=env,
+                                capture_output=True, encoding='utf-8', check=True)
+        (w_secs, w_clip) = w_proc.stdout.split()
+        self.assertRegex(w_proc.stderr, r'(?m)^import time:.*\| politeWordToAssertiveOne$')
+        return((float(w_secs), w_clip == 'True'))
+    
+    def test_startup(self):
+        with tempfile.TemporaryDirectory() as w_dir:
+            # the first run writes the rule cache, and is not counted
+            # [初回はルールキャッシュを書き込むので数えない]
+            w_env = dict(os.environ, POLITE_TO_ASSERTIVE_CACHE=os.path.join(w_dir, 'rules.marshal'))
+            self.runStartup(w_env)
+            w_runs = [self.runStartup(w_env) for i in range(3)]
+        
+        # the conversion path must not touch the clipboard
+        # [変換の経路ではクリップボードに触れないこと]
+        self.assertFalse(any(w_clip for (w_secs, w_clip) in w_runs), 'pyperclip is imported')
+        self.assertLess(min(w_secs for (w_secs, w_clip) in w_runs) * 1000, STARTUP_BUDGET)
+
+
+if __name__ == '__main__':
+    
+    unittest.main()